@@ -7,19 +7,20 @@ def get_dashboard_stats(predictions_df, cost_fn, cost_fp):
     """
     Computes high-level stats for the dashboard.
     Args:
-        predictions_df (pd.DataFrame): Must contain 'y_prob' and 'sla_breach' (if available).
+        predictions_df (pd.DataFrame or dict of arrays): Must contain 'y_prob' and 'sla_breach' (if available).
         cost_fn, cost_fp: Costs.
     Returns:
         dict: Aggregated stats.
     """
-    total_deliveries = len(predictions_df)
+    y_prob = np.asarray(predictions_df['y_prob'])
+    total_deliveries = len(y_prob)
     
     # Assume default threshold 0.5 for dashboard view
     threshold = 0.5
-    y_prob = predictions_df['y_prob']
     y_pred = (y_prob >= threshold).astype(int)
     
-    risk_exposure = np.sum(y_prob * cost_fn)
+    # Accumulate in float64: stored probabilities may be float32
+    risk_exposure = np.sum(y_prob, dtype=np.float64) * cost_fn
     
     high_risk_count = np.sum(y_prob >= 0.7)
     medium_risk_count = np.sum((y_prob >= 0.3) & (y_prob < 0.7))
@@ -1,42 +1,173 @@
-
-from fastapi import FastAPI, HTTPException, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-import pandas as pd
-import numpy as np
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field
+import hmac
 import logging
-from typing import List, Optional
-
-from inference import InferenceEngine
-from what_if import SimulationEngine
-from analytics import get_dashboard_stats
-from cost_evaluation import estimate_risk_exposure
-# We'll use a globally loaded dataframe for the 'dataset' view and stats
-from data_loader import load_lade_data
+import os
+import threading
+from typing import List, Literal, Optional
 
-app = FastAPI(title="LaDe Analytics Platform")
+# Heavy modules (pandas, sklearn, datasets, the model itself) are imported
+# inside the resource factories below, so workers start serving health and
+# static traffic immediately and load artifacts in the background.
+from batching import PredictionBatcher
+from decision_policy import RISK_LEVELS, apply_decision_policy_batch, summarize_decisions
+from json_response import FastJSONResponse, BINARY_MEDIA_TYPE, wants_binary, float32_bytes, records_to_columns, dumps, loads
+from lazy import LazyResource, warm_up
+from model_registry import ArtifactReloader
+from result_cache import ResultCache
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # --- Global State ---
-model_engine = InferenceEngine() # Loads model
-simulation_engine = SimulationEngine() # Loads validation preds
 
-# Cache a sample of data for the 'Dataset' page
-try:
+# Set by the parent process in multi-worker mode (see __main__): workers
+# memory-map the exported arrays instead of loading their own copies
+SHARED_DIR = os.environ.get("SHARED_ARTIFACTS_DIR")
+
+# Versioned artifacts (see model_registry.py); without a registry the working directory is served
+REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", "artifacts")
+
+def _load_model_engine(artifact_dir=None):
+    from inference import InferenceEngine
+    # Hot reloads pass the new version's directory and load a private copy;
+    # shared arrays are only exported for the version served at startup
+    shared_dir = SHARED_DIR if artifact_dir is None else None
+    artifact_dir = artifact_dir or reloader.active_dir()
+    # PREDICT_LOOKUP_TABLE=1 answers predictions from a precomputed probability table
+    return InferenceEngine(
+        model_path=os.path.join(artifact_dir, "model.pkl"),
+        encoder_path=os.path.join(artifact_dir, "encoders.pkl"),
+        pipeline_path=os.path.join(artifact_dir, "pipeline.pkl"),
+        forest_path=os.path.join(artifact_dir, "forest.npz"),
+        model_meta_path=os.path.join(artifact_dir, "model_meta.json"),
+        use_lookup_table=os.environ.get("PREDICT_LOOKUP_TABLE", "0") == "1",
+        lookup_grid_points=int(os.environ.get("PREDICT_LOOKUP_GRID_POINTS", 256)),
+        shared_dir=shared_dir
+    ) # Loads model
+
+def _load_simulation_engine(artifact_dir=None):
+    from what_if import SimulationEngine
+    shared_dir = SHARED_DIR if artifact_dir is None else None
+    artifact_dir = artifact_dir or reloader.active_dir()
+    engine = SimulationEngine(
+        validation_data_path=os.path.join(artifact_dir, "validation_preds"),
+        legacy_csv_path=os.path.join(artifact_dir, "validation_preds.csv"),
+        model_path=os.path.join(artifact_dir, "model_meta.json"),
+        shared_dir=shared_dir
+    )
+    engine.load_data() # Loads validation preds
+    return engine
+
+# A typical order, scored by a freshly loaded model before it is swapped in
+WARM_UP_RECORDS = [
+    {"accept_time": "2024-06-01 18:30:00", "distance": 5.2, "weather": "Rainy", "vehicle_type": "Motorcycle"},
+    {"accept_time": "2024-06-03 09:00:00", "distance": 0.8, "weather": "Sunny", "vehicle_type": "Van"}
+]
+
+def _warm_model_engine(engine):
+    from tree_scorer import random_feature_matrix
+    engine.predict(WARM_UP_RECORDS)
+    # Full batch through whichever scorer serves it (compiled forest, booster, lookup table)
+    engine.predict_matrix(random_feature_matrix(256, len(engine.pipeline.feature_names)))
+
+def _warm_simulation_engine(engine):
+    engine.run_simulation(0.5, 50000, 10000)
+    engine.generate_curves(50000, 10000)
+
+def _convert_legacy_predictions(artifact_dir):
+    # Engines only read predictions; a legacy CSV is converted once, at
+    # server start in the parent process (registry versions at publish)
+    from prediction_store import PredictionStore, convert_csv
+    csv_path = os.path.join(artifact_dir, "validation_preds.csv")
+    out_path = os.path.join(artifact_dir, "validation_preds")
+    if os.path.exists(csv_path) and not PredictionStore.exists(out_path):
+        logger.info(f"Converting legacy {csv_path} to {out_path}")
+        convert_csv(csv_path, out_path)
+
+def _load_data_sample():
+    if SHARED_DIR:
+        from shared_artifacts import attach_data_sample
+        return attach_data_sample(SHARED_DIR)
+    # We'll use a loaded dataframe for the 'dataset' view
+    from data_loader import load_lade_data
     # Use cached parquet if available for speed
     # We re-use load_lade_data logic which checks cache
     # We just need a sample for display
-    DATA_SAMPLE = load_lade_data(sample_size=100)
+    # Never refresh the cache from here: a missing one is bootstrapped from a
+    # bounded slice of the source, full ingestion is left to training / the CLI
+    sample = load_lade_data(sample_size=100, refresh=False,
+                            max_points=int(os.environ.get("DATA_SAMPLE_MAX_POINTS", 100_000)))
     # Convert timestamps to string for JSON serialization
-    for col in DATA_SAMPLE.select_dtypes(include=['datetime64[ns]']).columns:
-        DATA_SAMPLE[col] = DATA_SAMPLE[col].astype(str)
-except Exception as e:
-    logger.error(f"Failed to load data sample: {e}")
-    DATA_SAMPLE = pd.DataFrame()
+    for col in sample.select_dtypes(include=['datetime', 'datetimetz']).columns:
+        sample[col] = sample[col].astype(str)
+    return sample
+
+def _load_order_index():
+    # Footer-only index over the order cache for /api/data paging
+    from data_loader import OrderPageIndex
+    index = OrderPageIndex()
+    index.refresh()
+    return index
+
+def _load_gps_stream():
+    # Imported here: streaming pulls in pandas and the data loader
+    from streaming import StreamScorer
+    # Scores with whatever model is current, so hot reloads apply to live routes too
+    return StreamScorer(
+        lambda: model_engine.get(),
+        min_log_change=float(os.environ.get("STREAM_MIN_LOG_CHANGE", 0.02)),
+        queue_max_pending_points=int(os.environ.get("STREAM_QUEUE_MAX_POINTS", 500_000))
+    )
+
+model_engine = LazyResource("model", _load_model_engine)
+simulation_engine = LazyResource("simulation", _load_simulation_engine)
+data_sample = LazyResource("data_sample", _load_data_sample)
+RESOURCES = [model_engine, simulation_engine, data_sample]
+
+# Loads a new registry version in the background, warms it and swaps the engines
+reloader = ArtifactReloader(
+    [(model_engine, _load_model_engine, _warm_model_engine),
+     (simulation_engine, _load_simulation_engine, _warm_simulation_engine)],
+    registry_dir=REGISTRY_DIR,
+    poll_seconds=float(os.environ.get("MODEL_RELOAD_POLL_SECONDS", 10))
+)
+# Built on the first /api/data call; not part of readiness
+order_index = LazyResource("order_index", _load_order_index)
+# Live route state for the GPS stream endpoints; created on first use
+gps_stream = LazyResource("gps_stream", _load_gps_stream)
+
+# Coalesces concurrent /api/predict calls into one model call
+predict_batcher = PredictionBatcher(
+    lambda records: model_engine.get().predict(records),
+    max_batch_rows=int(os.environ.get("PREDICT_BATCH_MAX_ROWS", 256)),
+    max_wait_ms=float(os.environ.get("PREDICT_BATCH_MAX_WAIT_MS", 5))
+)
+
+# Memoized /api/simulate and /api/stats results, dropped when the predictions change
+simulation_cache = ResultCache(
+    max_entries=int(os.environ.get("SIM_CACHE_MAX_ENTRIES", 1024)),
+    ttl_seconds=float(os.environ.get("SIM_CACHE_TTL_SECONDS", 300))
+)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up in the background; requests that need an artifact before then load it on demand
+    if os.environ.get("WARMUP_ON_STARTUP", "1") == "1":
+        threading.Thread(target=warm_up, args=(RESOURCES,), name="warm-up", daemon=True).start()
+    # Picks up versions published to the registry while serving
+    reloader.start_watching()
+    yield
+
+app = FastAPI(title="LaDe Analytics Platform", lifespan=lifespan, default_response_class=FastJSONResponse)
+# Compress large JSON payloads (curves, segment tables, data pages); small ones aren't worth it
+app.add_middleware(GZipMiddleware, minimum_size=int(os.environ.get("GZIP_MIN_BYTES", 1024)))
 
 # --- Pydantic Models ---
 
@@ -48,61 +179,410 @@ class SimulationRequest(BaseModel):
     threshold: float
     cost_fn: float
     cost_fp: float
+    # Resolution of the returned trade-off curves
+    curve_points: int = Field(20, ge=2, le=2000)
+    # > 0 adds bootstrap confidence intervals to the impact
+    bootstrap_resamples: int = Field(0, ge=0, le=100_000)
+    confidence: float = Field(0.95, gt=0, lt=1)
+    # Policy savings are measured against; > 1 = no intervention
+    baseline_threshold: float = Field(0.5, ge=0)
+
+class DecisionRequest(BaseModel):
+    # Raw order features to score, or probabilities that were already scored
+    features: Optional[List[dict]] = None
+    probabilities: Optional[List[float]] = None
+    t1: float = 0.3
+    t2: float = 0.7
+
+class SegmentSimulationRequest(BaseModel):
+    segment: str
+    cost_fn: float
+    cost_fp: float
+    thresholds: Optional[List[float]] = None
+    points: int = 20
+    min_count: int = 1
+
+class CostPair(BaseModel):
+    cost_fn: float
+    cost_fp: float
+
+class OptimalThresholdRequest(BaseModel):
+    # Either a single pair or a batch for a cost-sensitivity table
+    cost_fn: Optional[float] = None
+    cost_fp: Optional[float] = None
+    pairs: Optional[List[CostPair]] = None
+
+class ReloadRequest(BaseModel):
+    # Registry version to load (default: the registry's CURRENT); made CURRENT once loaded
+    version: Optional[str] = None
+    # Block until the swap is done instead of returning 202 immediately
+    wait: bool = False
 
 # --- API Endpoints ---
 
+@app.get("/healthz")
+def healthz():
+    # Liveness only: the process is up and serving
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    components = {r.name: r.status() for r in RESOURCES}
+    ready = all(r.state == "ready" for r in RESOURCES)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "components": components}
+    )
+
 @app.get("/api/data/sample")
 def get_data_sample():
-    if DATA_SAMPLE.empty:
+    try:
+        sample = data_sample.get()
+    except RuntimeError:
+        sample = None
+    if sample is None or sample.empty:
         return {"error": "Data not available"}
-    # Convert to records
-    return DATA_SAMPLE.to_dict(orient="records")
+    # Columnar: one array per column instead of repeating keys on every row
+    return FastJSONResponse(records_to_columns(sample))
+
+def _csv_param(value):
+    # "a,b,c" -> ["a", "b", "c"]; None stays None
+    if value is None:
+        return None
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+@app.get("/api/data")
+def browse_data(columns: Optional[str] = None, ds: Optional[str] = None,
+                ds_min: Optional[str] = None, ds_max: Optional[str] = None,
+                courier: Optional[str] = None,
+                distance_min: Optional[float] = None, distance_max: Optional[float] = None,
+                cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=5000)):
+    """
+    Cursor-paginated orders from the cache. List parameters are comma-separated;
+    pass `next_cursor` back (with the same filters) for the following page.
+    """
+    try:
+        couriers = _csv_param(courier)
+        table, next_cursor = order_index.get().page(
+            columns=_csv_param(columns),
+            ds=_csv_param(ds),
+            ds_range=(ds_min, ds_max) if ds_min is not None or ds_max is not None else None,
+            couriers=[int(c) for c in couriers] if couriers is not None else None,
+            distance_range=(distance_min, distance_max) if distance_min is not None or distance_max is not None else None,
+            cursor=cursor,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Data page error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    page = table.to_pandas()
+    for col in page.select_dtypes(include=['datetime', 'datetimetz']).columns:
+        page[col] = page[col].astype(str)
+    payload = records_to_columns(page)
+    payload["rows"] = len(page)
+    payload["next_cursor"] = next_cursor
+    return FastJSONResponse(payload)
 
 @app.post("/api/predict")
-def predict(req: PredictionRequest):
+async def predict(req: PredictionRequest, request: Request):
+    from feature_engineering import InvalidFeaturesError
     try:
-        probs = model_engine.predict(req.features)
-        return {"probabilities": probs}
+        probs = await predict_batcher.submit(req.features)
+        if wants_binary(request):
+            # Accept: application/octet-stream -> raw little-endian float32, 4 bytes per row
+            return Response(content=float32_bytes(probs), media_type=BINARY_MEDIA_TYPE)
+        return FastJSONResponse({"probabilities": probs})
+    except InvalidFeaturesError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/decide")
+def decide(req: DecisionRequest):
+    if req.probabilities is None and req.features is None:
+        raise HTTPException(status_code=400, detail="Provide features or probabilities.")
+    if not req.t1 <= req.t2:
+        raise HTTPException(status_code=400, detail=f"t1 must not exceed t2 (got t1={req.t1}, t2={req.t2})")
+    from feature_engineering import InvalidFeaturesError
+    try:
+        # Large batches go straight to the engine; micro-batching is for small concurrent calls
+        probs = req.probabilities if req.probabilities is not None else model_engine.get().predict(req.features)
+        codes = apply_decision_policy_batch(probs, req.t1, req.t2)
+        return {
+            "levels": RISK_LEVELS,
+            "codes": codes.tolist(),
+            "counts": summarize_decisions(codes)
+        }
+    except InvalidFeaturesError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Decision error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/metrics/batching")
+def get_batching_metrics():
+    return predict_batcher.stats()
+
+@app.get("/api/metrics/cache")
+def get_cache_metrics():
+    return simulation_cache.stats()
+
+@app.websocket("/ws/gps")
+async def gps_websocket(websocket: WebSocket):
+    """
+    Live GPS feed. Each message is a point, {"points": [...]} or point
+    columns (postman_id, gps_time in epoch seconds, lat, lng); the reply
+    lists the couriers whose risk was re-scored by that message.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                from streaming import points_to_columns
+                columns = points_to_columns(loads(message))
+                scorer = await run_in_threadpool(gps_stream.get)
+                updates = await run_in_threadpool(scorer.ingest, columns)
+                await websocket.send_text(dumps({"updates": updates}).decode())
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                # Bad messages are reported; the connection stays open
+                await websocket.send_text(dumps({"error": str(e)}).decode())
+    except WebSocketDisconnect:
+        pass
+
+@app.post("/api/stream/gps", status_code=202)
+async def enqueue_gps(request: Request):
+    """
+    Queues GPS points (same formats as /ws/gps) and returns at once; they are
+    scored in the background in coalesced batches. 429 when the queue is full.
+    """
+    from streaming import points_to_columns, GpsQueueFull
+    try:
+        columns = points_to_columns(loads(await request.body()))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    scorer = await run_in_threadpool(gps_stream.get)
+    try:
+        scorer.queue.submit(columns)
+    except GpsQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    return {"queued": len(columns["postman_id"]), "pending": scorer.queue.queued_points}
+
+@app.get("/api/stream/couriers")
+def get_stream_couriers(ids: Optional[str] = None, top: int = Query(50, ge=1, le=10_000)):
+    """
+    Live route state: the given couriers (comma-separated ids), else the `top` highest-risk routes.
+    """
+    postman_ids = _csv_param(ids)
+    if postman_ids is not None:
+        # Feeds usually send numeric ids
+        postman_ids = [int(i) if i.lstrip("-").isdigit() else i for i in postman_ids]
+    return FastJSONResponse(gps_stream.get().snapshot(postman_ids=postman_ids, top=top))
+
+@app.get("/api/metrics/stream")
+def get_stream_metrics():
+    return gps_stream.get().stats()
+
+def _check_admin(request):
+    # The admin API can swap (and roll back) the model for every worker, so
+    # it is off unless ADMIN_TOKEN is set, and then needs it as X-Admin-Token
+    token = os.environ.get("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=403, detail="Admin API disabled; set ADMIN_TOKEN to enable it")
+    sent = request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(sent.encode("utf-8"), token.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/api/admin/artifacts")
+def get_artifacts(request: Request):
+    _check_admin(request)
+    return reloader.status()
+
+@app.post("/api/admin/reload")
+def reload_artifacts(req: ReloadRequest, request: Request):
+    _check_admin(request)
+    if not req.wait:
+        # The new version loads and warms in the background; current engines keep serving
+        try:
+            started = reloader.reload_async(req.version)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        return JSONResponse(status_code=202, content={"started": started, **reloader.status()})
+    try:
+        swapped = reloader.reload(req.version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed, previous version still serving: {e}")
+    return {"swapped": swapped, **reloader.status()}
+
+@app.get("/api/model/info")
+def get_model_info():
+    engine = model_engine.get()
+    table = engine.lookup_table
+    return {
+        "features": engine.pipeline.feature_names,
+        "backend": engine.model.name if engine.model is not None else "compiled",
+        "compiled_scorer": engine.forest is not None,
+        "lookup_table": table.report if table is not None else None
+    }
+
 @app.post("/api/simulate")
 def simulate(req: SimulationRequest):
     try:
+        engine = simulation_engine.get()
         # 1. Run Impact Calculation
-        impact = simulation_engine.run_simulation(req.threshold, req.cost_fn, req.cost_fp)
+        impact = simulation_cache.get_or_compute(
+            ("impact", req.threshold, req.cost_fn, req.cost_fp, req.bootstrap_resamples, req.confidence,
+             req.baseline_threshold),
+            lambda: engine.run_simulation(
+                req.threshold, req.cost_fn, req.cost_fp,
+                bootstrap_resamples=req.bootstrap_resamples, confidence=req.confidence,
+                baseline_threshold=req.baseline_threshold
+            ),
+            version=engine.version
+        )
         
-        # 2. Generate Trade-off Curves (Cost vs Threshold)
-        curves = simulation_engine.generate_curves(req.cost_fn, req.cost_fp)
+        # 2. Generate Trade-off Curves (Cost vs Threshold); independent of the threshold
+        curves = simulation_cache.get_or_compute(
+            ("curves", req.cost_fn, req.cost_fp, req.curve_points),
+            lambda: engine.generate_curves(req.cost_fn, req.cost_fp, points=req.curve_points),
+            version=engine.version
+        )
         
-        return {
+        return FastJSONResponse({
             "impact": impact,
             "curves": curves
-        }
+        })
     except Exception as e:
         logger.error(f"Simulation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/simulate/segments")
+def list_segments():
+    # Segment keys stored with the validation predictions, and their group counts
+    return {"segments": simulation_engine.get().segment_names()}
+
+@app.post("/api/simulate/segments")
+def simulate_segments(req: SegmentSimulationRequest):
+    engine = simulation_engine.get()
+    if req.segment not in engine.segment_names():
+        raise HTTPException(status_code=400, detail=f"Unknown segment '{req.segment}'. Available: {sorted(engine.segment_names())}")
+    try:
+        result = simulation_cache.get_or_compute(
+            ("segments", req.segment, req.cost_fn, req.cost_fp,
+             tuple(req.thresholds) if req.thresholds is not None else None, req.points, req.min_count),
+            lambda: engine.simulate_segments(
+                req.segment, req.cost_fn, req.cost_fp,
+                thresholds=req.thresholds, points=req.points, min_count=req.min_count
+            ),
+            version=engine.version
+        )
+        # Already plain lists/floats; skip FastAPI's per-element encoder (slow for 10k+ segments)
+        return FastJSONResponse(result)
+    except Exception as e:
+        logger.error(f"Segment simulation error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/simulate/optimal")
+def simulate_optimal(req: OptimalThresholdRequest):
+    pairs = [(p.cost_fn, p.cost_fp) for p in req.pairs or []]
+    if req.cost_fn is not None and req.cost_fp is not None:
+        pairs.insert(0, (req.cost_fn, req.cost_fp))
+    if not pairs:
+        raise HTTPException(status_code=400, detail="Provide cost_fn/cost_fp or a list of pairs.")
+    try:
+        return {"results": simulation_engine.get().find_optimal(pairs)}
+    except Exception as e:
+        logger.error(f"Optimal threshold error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/stats")
 def get_stats():
     # Use validation predictions to show "Current System Status" mock
     try:
-        if simulation_engine.df is None:
-            simulation_engine.load_data()
-            
-        stats = get_dashboard_stats(simulation_engine.df, cost_fn=50000, cost_fp=10000) # Default costs
+        from analytics import get_dashboard_stats
+        engine = simulation_engine.get()
+        stats = simulation_cache.get_or_compute(
+            ("stats", 50000, 10000),
+            lambda: get_dashboard_stats({"y_prob": engine.y_prob}, cost_fn=50000, cost_fp=10000), # Default costs
+            version=engine.version
+        )
         return stats
     except Exception as e:
         logger.error(f"Stats error: {e}")
         return {"error": "Stats unavailable"}
 
+@app.get("/api/stats/regions")
+def get_region_stats(bbox: Optional[str] = None, source: Literal["validation", "live"] = "validation",
+                     cell: Literal["start_cell", "end_cell"] = "start_cell",
+                     resolution: int = Query(1, ge=1, le=1000), cost_fn: float = Query(50000, ge=0),
+                     top: int = Query(500, ge=1, le=100_000), min_count: int = Query(1, ge=1),
+                     active_seconds: float = Query(3600, gt=0)):
+    """
+    Risk per grid region: route count, breach rate, mean risk and exposure
+    (sum of y_prob * cost_fn), highest exposure first.
+
+    `bbox` is lat_min,lng_min,lat_max,lng_max; `resolution` merges N x N
+    grid cells. `source=validation` aggregates the validation routes by
+    `cell` (start_cell or end_cell); `source=live` aggregates routes in
+    progress by the cell of their last GPS fix, overdue ones as breaches.
+    """
+    try:
+        box = [float(v) for v in _csv_param(bbox)] if bbox is not None else None
+        if box is not None and len(box) != 4:
+            raise ValueError("bbox must be lat_min,lng_min,lat_max,lng_max")
+        box = tuple(box) if box is not None else None
+        query = lambda index: index.query(bbox=box, resolution=resolution, cost_fn=cost_fn,
+                                          min_count=min_count, top=top)
+        if source == "live":
+            result = query(gps_stream.get().region_index(active_seconds=active_seconds))
+        else:
+            engine = simulation_engine.get()
+            result = simulation_cache.get_or_compute(
+                ("regions", cell, box, resolution, cost_fn, min_count, top),
+                lambda: query(engine.region_index(cell)),
+                version=engine.version
+            )
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=e.args[0] if isinstance(e, KeyError) else str(e))
+    return FastJSONResponse({**result, "source": source})
+
 # --- Static Files ---
 # Serve frontend from ../frontend
-import os
 frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
 app.mount("/", StaticFiles(directory=frontend_path, html=True), name="frontend")
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 1)))
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--shared-dir", default="data_cache/shared")
+    args = parser.parse_args()
+
+    if reloader.active_version is None:
+        _convert_legacy_predictions(".")
+    if args.workers > 1:
+        # Load everything once here, export the arrays, then let each worker attach to them
+        from shared_artifacts import prepare_shared_artifacts, SHARED_DIR_ENV
+        SHARED_DIR = None # The parent builds from the original artifacts
+        try:
+            sample = _load_data_sample()
+        except Exception as e:
+            logger.warning(f"Data sample unavailable: {e}")
+            sample = None
+        os.environ[SHARED_DIR_ENV] = prepare_shared_artifacts(
+            args.shared_dir, _load_model_engine(), _load_simulation_engine(), data_sample=sample
+        )
+        del sample
+        uvicorn.run("app:app", host="0.0.0.0", port=args.port, workers=args.workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=args.port)
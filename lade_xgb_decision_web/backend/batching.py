@@ -0,0 +1,132 @@
+
+import asyncio
+import bisect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Histogram:
+    """
+    Fixed-bucket histogram. `counts[i]` holds observations <= `buckets[i]`
+    (and above the previous bucket); the last slot counts overflow.
+    """
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def to_dict(self):
+        labels = [f"<={b}" for b in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.total,
+            "mean": self.sum / self.total if self.total else 0.0
+        }
+
+class PredictionBatcher:
+    """
+    Coalesces concurrent `/api/predict` calls into one model call.
+
+    Requests are queued; a single worker task gathers them until the batch
+    holds `max_batch_rows` rows or `max_wait_ms` has passed since the first
+    one arrived, scores the concatenated rows with one `predict_fn` call
+    (e.g. `InferenceEngine.predict`) in a worker thread, and scatters the
+    probabilities back per request.
+    """
+    def __init__(self, predict_fn, max_batch_rows=256, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = None
+        self.worker = None
+        self.batch_size_hist = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024])
+        self.queue_wait_hist = Histogram([0.5, 1, 2, 5, 10, 20, 50, 100]) # ms
+
+    def _ensure_worker(self):
+        # Started lazily so the queue binds to the serving event loop
+        if self.worker is None or self.worker.done():
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, records):
+        """
+        Args:
+            records (list of dicts): Raw input features for one request.
+        Returns:
+            list: Probabilities, in the same order as `records`.
+        """
+        if not records:
+            return []
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((records, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            rows = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+
+            # Keep gathering until the batch is full or the window closes
+            while rows < self.max_batch_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                rows += len(item[0])
+
+            await self._score(batch, rows)
+
+    async def _score(self, batch, rows):
+        now = time.perf_counter()
+        for _, _, enqueued in batch:
+            self.queue_wait_hist.observe((now - enqueued) * 1000.0)
+        self.batch_size_hist.observe(rows)
+
+        records = [r for recs, _, _ in batch for r in recs]
+        loop = asyncio.get_running_loop()
+        try:
+            probs = await loop.run_in_executor(None, self.predict_fn, records)
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][1].cancelled():
+                    batch[0][1].set_exception(e)
+                return
+            # Don't let one bad request fail its neighbours: rescore individually
+            logger.warning(f"Batched prediction failed ({e}); rescoring {len(batch)} requests one by one.")
+            for recs, future, _ in batch:
+                if future.cancelled():
+                    continue
+                try:
+                    future.set_result(await loop.run_in_executor(None, self.predict_fn, recs))
+                except Exception as single_error:
+                    future.set_exception(single_error)
+            return
+
+        # Scatter results back in submission order
+        offset = 0
+        for recs, future, _ in batch:
+            if not future.cancelled():
+                future.set_result(probs[offset:offset + len(recs)])
+            offset += len(recs)
+
+    def stats(self):
+        return {
+            "max_batch_rows": self.max_batch_rows,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batch_size_rows": self.batch_size_hist.to_dict(),
+            "queue_wait_ms": self.queue_wait_hist.to_dict()
+        }
@@ -0,0 +1,72 @@
+import os
+import time
+import numpy as np
+from sklearn.metrics import roc_auc_score
+from model_backend import make_classifier, wrap_fitted, XGBoostBackend
+from tree_scorer import CompiledForest, random_feature_matrix
+
+# Benchmarks scoring throughput of the model backends on the same data:
+# the RandomForest baseline (sklearn predict_proba and the compiled NumPy
+# forest) against XGBoost hist via inplace_predict, single- and multi-threaded.
+# Both models are trained on a synthetic breach target over the feature layout.
+
+N_FEATURES = 6
+N_TRAIN = 200_000
+BATCH_SIZES = (1, 100, 10_000, 100_000)
+
+def synthetic_target(X, rng):
+    # Late hours, longer distance and weekends raise the breach rate
+    hour, weekend, log_dist = np.nan_to_num(X[:, 0]), np.nan_to_num(X[:, 2]), np.nan_to_num(X[:, 3])
+    logit = -3.0 + 0.08 * hour + 0.6 * weekend + 0.9 * log_dist + 0.3 * (np.nan_to_num(X[:, 4]) == 1)
+    return (rng.random(len(X)) < 1 / (1 + np.exp(-logit))).astype(np.int64)
+
+def timed(fn, X, budget_s=1.0):
+    fn(X) # warm-up
+    reps, start = 0, time.perf_counter()
+    while True:
+        fn(X)
+        reps += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget_s or reps >= 1000:
+            return elapsed / reps
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    X = random_feature_matrix(N_TRAIN, N_FEATURES, seed=0)
+    y = synthetic_target(X, rng)
+    X_test = random_feature_matrix(max(BATCH_SIZES), N_FEATURES, seed=1)
+    y_test = synthetic_target(X_test, rng)
+    scale_weight = (y == 0).sum() / max((y == 1).sum(), 1)
+
+    models = {}
+    for backend in ("sklearn", "xgboost"):
+        start = time.perf_counter()
+        model = make_classifier(backend, scale_pos_weight=scale_weight)
+        model.fit(X, y)
+        print(f"train {backend:<8}: {time.perf_counter() - start:6.2f} s")
+        models[backend] = model
+
+    forest_model = models["sklearn"]
+    forest_model.n_jobs = None
+    rf = wrap_fitted(forest_model)
+    compiled = CompiledForest.from_sklearn(forest_model)
+    booster = models["xgboost"].get_booster()
+    xgb_all = XGBoostBackend(booster.copy(), n_threads=os.cpu_count())
+    xgb_one = XGBoostBackend(booster.copy(), n_threads=1)
+
+    scorers = {
+        "rf sklearn": rf.predict_proba,
+        "rf compiled": compiled.predict_proba,
+        "xgb inplace (1 thread)": xgb_one.predict_proba
+    }
+    if (os.cpu_count() or 1) > 1:
+        scorers[f"xgb inplace ({os.cpu_count()} threads)"] = xgb_all.predict_proba
+    for name, fn in scorers.items():
+        print(f"{name:<26} test AUC {roc_auc_score(y_test, fn(X_test)):.4f}")
+
+    print(f"\n{'scorer':<26} | {'rows':>8} | {'us/call':>12} | {'rows/s':>14}")
+    for n_rows in BATCH_SIZES:
+        batch = X_test[:n_rows]
+        for name, fn in scorers.items():
+            elapsed = timed(fn, batch)
+            print(f"{name:<26} | {n_rows:>8,} | {elapsed * 1e6:>12,.0f} | {n_rows / elapsed:>14,.0f}")
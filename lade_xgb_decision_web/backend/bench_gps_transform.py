@@ -0,0 +1,63 @@
+
+import sys
+import time
+import logging
+import numpy as np
+import pandas as pd
+from data_loader import haversine_np, process_gps_to_orders
+
+# Benchmarks process_gps_to_orders on synthetic trajectories.
+# The previous groupby loop is timed on a smaller slice (it is far too slow at 10M).
+
+N_POINTS = 10_000_000
+N_LEGACY_POINTS = 200_000
+N_COURIERS = 20_000
+N_DAYS = 10
+
+def synthetic_trajectories(n_points, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'ds': rng.integers(300, 300 + N_DAYS, n_points),
+        'postman_id': rng.integers(0, N_COURIERS, n_points),
+        'gps_time': rng.integers(1_600_000_000, 1_600_000_000 + 86_400, n_points).astype(np.float64),
+        'lat': rng.uniform(30.0, 31.0, n_points),
+        'lng': rng.uniform(120.0, 121.0, n_points)
+    })
+
+def legacy_process_gps_to_orders(df):
+    # Previous implementation: Python loop over every (postman_id, ds) group
+    df = df.sort_values(by=['postman_id', 'ds', 'gps_time'])
+    processed_rows = []
+    for (pid, ds), group in df.groupby(['postman_id', 'ds']):
+        if len(group) < 2:
+            continue
+        lats = group['lat'].values
+        lngs = group['lng'].values
+        processed_rows.append({
+            'courier_id': int(pid),
+            'ds': ds,
+            'accept_time': pd.to_datetime(group['gps_time'].min(), unit='s'),
+            'finish_time': pd.to_datetime(group['gps_time'].max(), unit='s'),
+            'distance': np.sum(haversine_np(lngs[:-1], lats[:-1], lngs[1:], lats[1:]))
+        })
+    return pd.DataFrame(processed_rows)
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    n_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+
+    small = synthetic_trajectories(N_LEGACY_POINTS)
+    _, t = timed(legacy_process_gps_to_orders, small)
+    print(f"{'legacy groupby':<18}| {N_LEGACY_POINTS:>11,} points | {t:>7.2f} s | {N_LEGACY_POINTS / t:>12,.0f} points/s")
+
+    big = synthetic_trajectories(N_POINTS)
+    orders, t = timed(process_gps_to_orders, big)
+    print(f"{'vectorized':<18}| {N_POINTS:>11,} points | {t:>7.2f} s | {N_POINTS / t:>12,.0f} points/s | {len(orders):,} routes")
+
+    orders, t = timed(process_gps_to_orders, big, n_jobs=n_jobs)
+    print(f"{f'vectorized n_jobs={n_jobs}':<18}| {N_POINTS:>11,} points | {t:>7.2f} s | {N_POINTS / t:>12,.0f} points/s | {len(orders):,} routes")
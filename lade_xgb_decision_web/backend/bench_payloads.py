@@ -0,0 +1,80 @@
+import gzip
+import json
+import time
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from json_response import orjson, float32_bytes, records_to_columns
+
+# Benchmarks response encoding for the large API payloads.
+# Compares the old shapes (list of dicts, FastAPI's encoder + stdlib json)
+# with parallel arrays, orjson and raw float32, and the effect of gzip.
+
+N_PREDICTIONS = 100_000
+N_SAMPLE_ROWS = 10_000
+CURVE_POINTS = 1000
+
+def curves_payloads(rng):
+    thresholds = np.linspace(0.01, 0.99, CURVE_POINTS)
+    cost = rng.uniform(1e6, 5e7, CURVE_POINTS)
+    rate = rng.uniform(0, 1, CURVE_POINTS)
+    records = [{"threshold": float(t), "total_cost": float(c), "intervention_rate": float(r)}
+               for t, c, r in zip(thresholds, cost, rate)]
+    columns = {"threshold": thresholds.tolist(), "total_cost": cost.tolist(), "intervention_rate": rate.tolist()}
+    return records, columns
+
+def sample_payloads(rng):
+    df = pd.DataFrame({
+        "order_id": rng.integers(0, 10**9, N_SAMPLE_ROWS),
+        "courier_id": rng.integers(0, 5000, N_SAMPLE_ROWS),
+        "ds": rng.integers(501, 531, N_SAMPLE_ROWS),
+        "accept_time": pd.Timestamp("2024-05-01") + pd.to_timedelta(rng.integers(0, 86400 * 30, N_SAMPLE_ROWS), unit="s"),
+        "distance": rng.uniform(0.5, 30, N_SAMPLE_ROWS)
+    })
+    df["accept_time"] = df["accept_time"].astype(str)
+    return df.to_dict(orient="records"), records_to_columns(df)
+
+def encoders():
+    # name -> fn(payload) -> bytes
+    out = {
+        "fastapi+json": lambda p: json.dumps(jsonable_encoder(p)).encode(),
+        "json": lambda p: json.dumps(p, separators=(",", ":")).encode()
+    }
+    if orjson is not None:
+        out["orjson"] = orjson.dumps
+    return out
+
+def timed(fn, *args, reps=3):
+    best = float("inf")
+    for _ in range(reps):
+        start = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+def report(name, body, seconds):
+    gz = gzip.compress(body, compresslevel=6)
+    print(f"{name:<42} | {len(body) / 1024:>10,.1f} KiB | gzip {len(gz) / 1024:>9,.1f} KiB | {seconds * 1e3:>9,.2f} ms")
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(42)
+    if orjson is None:
+        print("orjson not installed; comparing stdlib encoders only")
+
+    print(f"{'payload / encoder':<42} | {'size':>14} | {'compressed':>14} | {'encode':>12}")
+    for label, (records, columns) in (
+        (f"curves x{CURVE_POINTS}", curves_payloads(rng)),
+        (f"data sample x{N_SAMPLE_ROWS:,}", sample_payloads(rng))
+    ):
+        for enc_name, enc in encoders().items():
+            for shape, payload in (("records", records), ("columnar", columns)):
+                body, t = timed(enc, payload)
+                report(f"{label} {shape} {enc_name}", body, t)
+
+    probs = rng.uniform(0, 1, N_PREDICTIONS).tolist()
+    label = f"predict x{N_PREDICTIONS:,}"
+    for enc_name, enc in encoders().items():
+        body, t = timed(enc, {"probabilities": probs})
+        report(f"{label} {enc_name}", body, t)
+    body, t = timed(float32_bytes, probs)
+    report(f"{label} float32 binary", body, t)
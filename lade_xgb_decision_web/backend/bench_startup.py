@@ -0,0 +1,51 @@
+
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# Benchmarks worker cold start: launches uvicorn on app:app and measures
+# the time until /healthz answers (serving) and /readyz returns 200 (warmed up).
+
+PORT = int(os.environ.get("BENCH_PORT", 8765))
+TIMEOUT_S = 300
+
+def status_of(path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{PORT}{path}", timeout=1) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+def wait_for(path, accept, start):
+    while time.perf_counter() - start < TIMEOUT_S:
+        if status_of(path) in accept:
+            return time.perf_counter() - start
+        time.sleep(0.01)
+    return None
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    import app # noqa: F401  (module import cost alone)
+    print(f"import app           : {time.perf_counter() - start:6.2f} s")
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(PORT), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    try:
+        healthy = wait_for("/healthz", {200}, start)
+        print(f"first /healthz 200   : {healthy:6.2f} s")
+        ready = wait_for("/readyz", {200}, start)
+        if ready is None:
+            print("/readyz never reached 200 (see /readyz for failed components)")
+        else:
+            print(f"first /readyz 200    : {ready:6.2f} s")
+    finally:
+        server.terminate()
+        server.wait()
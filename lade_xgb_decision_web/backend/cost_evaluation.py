@@ -23,6 +23,13 @@ def calculate_financial_impact(y_true, y_prob, threshold, cost_fn, cost_fp):
     tn = np.sum((y_pred == 0) & (y_true == 0))
     fn = np.sum((y_pred == 0) & (y_true == 1))
     
+    return _impact_from_counts(threshold, tp, fp, tn, fn, cost_fn, cost_fp)
+
+def _impact_from_counts(threshold, tp, fp, tn, fn, cost_fn, cost_fp):
+    """
+    Builds the financial impact dict from confusion matrix counts.
+    Shared by `calculate_financial_impact` and `ThresholdIndex.impact`.
+    """
     # Financial Calculation
     total_cost_fn = fn * cost_fn
     total_cost_fp = fp * cost_fp
@@ -44,6 +51,209 @@ def calculate_financial_impact(y_true, y_prob, threshold, cost_fn, cost_fp):
         "tn_count": int(tn)
     }
 
+class ThresholdIndex:
+    """
+    Sort-once index over validation predictions.
+
+    `y_prob` is sorted a single time and the cumulative count of positives is
+    stored alongside it. The confusion matrix for any threshold is then a
+    binary search plus a few lookups, so sweeping k thresholds costs
+    O(k log n) instead of k full passes over the data.
+    """
+    def __init__(self, y_true, y_prob):
+        y_true = np.asarray(y_true)
+        y_prob = np.asarray(y_prob)
+
+        order = np.argsort(y_prob, kind="mergesort")
+        self.sorted_prob = y_prob[order]
+
+        # cum_pos[i] = number of positives among the i lowest scores
+        self.cum_pos = np.zeros(len(y_prob) + 1, dtype=np.int64)
+        np.cumsum(y_true[order] == 1, out=self.cum_pos[1:])
+
+        self.n = len(y_prob)
+        self.n_pos = int(self.cum_pos[-1])
+
+    @classmethod
+    def from_sorted(cls, sorted_prob, cum_pos):
+        """
+        Rebuilds an index from its arrays without re-sorting, e.g. from
+        memory-mapped copies shared between worker processes.
+        """
+        index = cls.__new__(cls)
+        index.sorted_prob = sorted_prob
+        index.cum_pos = cum_pos
+        index.n = len(sorted_prob)
+        index.n_pos = int(cum_pos[-1])
+        return index
+
+    def counts(self, thresholds):
+        """
+        Confusion matrix components for one or many thresholds.
+
+        Args:
+            thresholds (float or array-like): Decision thresholds (predict 1 if prob >= t).
+
+        Returns:
+            tuple: (tp, fp, tn, fn) as int64 arrays shaped like `thresholds`.
+        """
+        # Rows strictly below the threshold are predicted negative
+        n_below = np.searchsorted(self.sorted_prob, thresholds, side="left")
+
+        fn = self.cum_pos[n_below]
+        tn = n_below - fn
+        tp = self.n_pos - fn
+        fp = (self.n - n_below) - tp
+        return tp, fp, tn, fn
+
+    def impact(self, threshold, cost_fn, cost_fp):
+        """
+        Same output as `calculate_financial_impact`, answered from the index.
+        """
+        tp, fp, tn, fn = (int(c) for c in self.counts(threshold))
+        return _impact_from_counts(threshold, tp, fp, tn, fn, cost_fn, cost_fp)
+
+    def bootstrap_impact(self, threshold, cost_fn, cost_fp, baseline_threshold=0.5,
+                         n_resamples=1000, confidence=0.95, seed=0):
+        """
+        Poisson bootstrap confidence intervals for `impact` at `threshold`
+        and its savings against `baseline_threshold`.
+
+        A row's contribution to every reported metric depends only on its
+        label and on which side of the two thresholds its score falls, so the
+        rows form at most 6 cells. Under the Poisson bootstrap each row's
+        weight is Poisson(1), and the weight total of a cell with m rows is
+        exactly Poisson(m). The (n_resamples x cells) weight matrix is
+        therefore drawn directly and is independent of the dataset size.
+
+        Returns:
+            dict: metric -> {"low", "high", "mean", "std"}, plus the settings used.
+        """
+        lo, hi = sorted((float(threshold), float(baseline_threshold)))
+        n_below = np.searchsorted(self.sorted_prob, [lo, hi], side="left")
+        pos_below = self.cum_pos[n_below]
+
+        # Score bands: p < lo, lo <= p < hi, p >= hi
+        band_rows = np.diff(np.r_[0, n_below, self.n])
+        band_pos = np.diff(np.r_[0, pos_below, self.n_pos])
+        cells = np.r_[band_rows - band_pos, band_pos] # negatives per band, then positives per band
+
+        rng = np.random.default_rng(seed)
+        W = rng.poisson(cells, size=(n_resamples, len(cells)))
+        neg, pos = W[:, :3], W[:, 3:]
+
+        def metrics_at(t):
+            # Bands flagged at t: all bands at or above it
+            first = 1 if t == lo else 2
+            fp = neg[:, first:].sum(axis=1)
+            tp = pos[:, first:].sum(axis=1)
+            fn = pos[:, :first].sum(axis=1)
+            return tp, fp, fn, fn * cost_fn + fp * cost_fp
+
+        tp, fp, fn, cost = metrics_at(float(threshold))
+        _, _, _, base_cost = metrics_at(float(baseline_threshold))
+
+        alpha = (1 - confidence) / 2
+        def interval(x):
+            low, high = np.quantile(x, [alpha, 1 - alpha])
+            return {"low": float(low), "high": float(high), "mean": float(np.mean(x)), "std": float(np.std(x))}
+
+        return {
+            "confidence": confidence,
+            "n_resamples": int(n_resamples),
+            "total_cost": interval(cost),
+            "savings_vs_baseline": interval(base_cost - cost),
+            "intervention_count": interval(tp + fp),
+            "missed_sla_count": interval(fn)
+        }
+
+    def _candidates(self):
+        """
+        Every threshold that yields a distinct confusion matrix: each distinct
+        predicted probability, plus one just above the max (flag nothing).
+        Returns (thresholds, fn, fp) arrays, computed once and cached.
+        """
+        if getattr(self, "_candidate_cache", None) is None:
+            p = self.sorted_prob
+            # First position of each distinct score in the sorted array
+            starts = np.flatnonzero(np.r_[True, p[1:] > p[:-1]]) if self.n else np.zeros(0, dtype=np.int64)
+            n_below = np.r_[starts, self.n]
+            top = np.nextafter(p[-1], np.inf) if self.n else 0.5
+            thresholds = np.r_[p[starts], top]
+
+            fn = self.cum_pos[n_below]
+            fp = (self.n - n_below) - (self.n_pos - fn)
+            self._candidate_cache = (thresholds, fn, fp)
+        return self._candidate_cache
+
+    def optimal_thresholds(self, cost_fn, cost_fp, chunk_elems=4_000_000):
+        """
+        Exact cost-minimizing threshold for one or many (cost_fn, cost_fp) pairs.
+
+        Minimizes `fn*cost_fn + fp*cost_fp` over all distinct predicted
+        probabilities. Ties resolve to the lowest threshold.
+
+        Args:
+            cost_fn (float or array-like): Cost of a False Negative, per pair.
+            cost_fp (float or array-like): Cost of a False Positive, per pair.
+            chunk_elems (int): Upper bound on the pairs x candidates cost matrix built at once.
+
+        Returns:
+            np.ndarray: Optimal thresholds, one per pair.
+        """
+        cost_fn = np.atleast_1d(np.asarray(cost_fn, dtype=np.float64))
+        cost_fp = np.atleast_1d(np.asarray(cost_fp, dtype=np.float64))
+        cost_fn, cost_fp = np.broadcast_arrays(cost_fn, cost_fp)
+
+        thresholds, fn, fp = self._candidates()
+        best = np.empty(len(cost_fn), dtype=np.int64)
+
+        # Broadcast pairs against all candidates, a block of pairs at a time
+        step = max(1, chunk_elems // len(thresholds))
+        for i in range(0, len(cost_fn), step):
+            costs = cost_fn[i:i + step, None] * fn + cost_fp[i:i + step, None] * fp
+            best[i:i + step] = np.argmin(costs, axis=1)
+
+        return thresholds[best]
+
+def segment_counts(codes, n_segments, y_true, y_prob, thresholds):
+    """
+    Confusion matrix components for every (segment, threshold) pair in one pass.
+
+    Each row is binned by its segment and by how many thresholds it clears
+    (one binary search into the sorted thresholds). A single bincount over
+    those (segment, bin) keys plus a reverse cumulative sum along the bins
+    gives every segment's predicted-positive count at every threshold, so the
+    cost is O(n log k + segments * k) regardless of the number of segments.
+
+    Args:
+        codes (array-like): Segment code per row, in [0, n_segments).
+        n_segments (int): Number of segments.
+        y_true (array-like): True labels (0 or 1).
+        y_prob (array-like): Predicted probabilities.
+        thresholds (array-like): Sorted, unique thresholds (predict 1 if prob >= t).
+
+    Returns:
+        tuple: (tp, fp, tn, fn), int64 arrays of shape (n_segments, n_thresholds).
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    k = len(thresholds)
+    # Number of thresholds each row clears: predicted 1 at t_j for every j < bin
+    bins = np.searchsorted(thresholds, y_prob, side="right")
+    keys = np.asarray(codes, dtype=np.int64) * (k + 1) + bins
+
+    positive = np.asarray(y_true) == 1
+    rows_hist = np.bincount(keys, minlength=n_segments * (k + 1)).reshape(n_segments, k + 1)
+    pos_hist = np.bincount(keys[positive], minlength=n_segments * (k + 1)).reshape(n_segments, k + 1)
+
+    # Rows in bins > j are flagged at threshold j
+    flagged = np.cumsum(rows_hist[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    tp = np.cumsum(pos_hist[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    fp = flagged - tp
+    n_pos = pos_hist.sum(axis=1, keepdims=True)
+    n_neg = rows_hist.sum(axis=1, keepdims=True) - n_pos
+    return tp, fp, n_neg - fp, n_pos - tp
+
 def estimate_risk_exposure(y_prob, cost_fn):
     """
     Estimates total risk exposure if NO action is taken.
@@ -1,9 +1,17 @@
 
 import os
+import json
+import base64
+import hashlib
 import pandas as pd
 import numpy as np
-from datasets import load_dataset
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
 import logging
+import threading
+from spatial import grid_cell
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -12,6 +20,21 @@ logger = logging.getLogger(__name__)
 CACHE_DIR = "data_cache"
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+# Partitioned order cache: one directory per `ds`, Parquet part files inside
+ORDERS_DIR = os.path.join(CACHE_DIR, "lade_orders")
+RAW_COLUMNS = ['ds', 'postman_id', 'gps_time', 'lat', 'lng']
+# Small row groups keep a page read (see OrderPageIndex) cheap
+ROW_GROUP_ROWS = 16_384
+# Raw points `load_lade_data` streams per source by default, as the original
+# download limit did; ingesting everything is opt-in (max_points=None)
+DEFAULT_MAX_POINTS = 100_000
+# SLA rule for routes built from trajectories: 5 mins/km + 30 mins fixed
+PROMISE_MIN_PER_KM = 5.0
+PROMISE_BASE_MIN = 30.0
+# Bumped when order columns change; caches built with an older one are rebuilt
+# (2: route start/end coordinates and grid cells)
+ORDER_SCHEMA_VERSION = 2
+
 def haversine_np(lon1, lat1, lon2, lat2):
     """
     Calculate the great circle distance between two points
@@ -28,114 +51,794 @@ def haversine_np(lon1, lat1, lon2, lat2):
     km = 6367 * c
     return km
 
-def process_gps_to_orders(df):
+def _route_stats(lat, lng, gps_time, starts):
+    """
+    Per-route distance and time span for points already sorted by route.
+    `starts` holds the first point index of each route; routes are contiguous.
+    Returns (distance_km, start_time, end_time) arrays, one entry per route.
+    """
+    # Distance of every consecutive segment in one call...
+    seg = haversine_np(lng[:-1], lat[:-1], lng[1:], lat[1:])
+    # ...minus the segments that jump from one route to the next
+    crosses = np.zeros(len(seg), dtype=bool)
+    crosses[starts[1:] - 1] = True
+    seg[crosses] = 0.0
+
+    dist_km = np.add.reduceat(np.append(seg, 0.0), starts)
+    start_time = np.fmin.reduceat(gps_time, starts)
+    end_time = np.fmax.reduceat(gps_time, starts)
+    return dist_km, start_time, end_time
+
+def _route_stats_sharded(lat, lng, gps_time, starts, courier_starts, n_jobs):
+    """
+    `_route_stats` across a process pool, sharded at courier boundaries so
+    no route is split between workers.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Cut points: the courier boundary closest to each equal-size split
+    targets = np.linspace(0, len(lat), n_jobs + 1)[1:-1]
+    cuts = np.unique(courier_starts[np.searchsorted(courier_starts, targets)
+                                    .clip(0, len(courier_starts) - 1)])
+    bounds = np.r_[0, cuts[cuts > 0], len(lat)]
+
+    jobs = []
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            if hi <= lo:
+                continue
+            shard_starts = starts[(starts >= lo) & (starts < hi)] - lo
+            jobs.append(pool.submit(_route_stats, lat[lo:hi], lng[lo:hi], gps_time[lo:hi], shard_starts))
+        parts = [job.result() for job in jobs]
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+def process_gps_to_orders(df, n_jobs=1):
     """
     Transforms raw GPS trajectory data into 'Order' records.
     Assumes columns: ['ds', 'postman_id', 'gps_time', 'lat', 'lng']
+
+    Fully vectorized: points are sorted once by (postman_id, ds, gps_time),
+    route boundaries are found where the key changes, and per-route
+    distance/time span are reduced with `reduceat` at those boundaries.
+
+    Args:
+        df (pd.DataFrame): Raw GPS points.
+        n_jobs (int): If > 1, reduce routes across a process pool sharded by courier.
     """
     logger.info("Transforming raw GPS trajectories to Order/Route records...")
     
-    # 1. Sort
-    df = df.sort_values(by=['postman_id', 'ds', 'gps_time'])
+    # Rows without a route key never form a route (groupby drops them)
+    keyed = df['postman_id'].notna().to_numpy() & df['ds'].notna().to_numpy()
+    
+    if not keyed.any():
+        logger.warning("Transformation resulted in empty dataframe!")
+        return pd.DataFrame()
+    
+    # 1. Sort once
+    # factorize(sort=True) gives integer codes in key order, so string keys can go through lexsort
+    pid_codes, pid_uniques = pd.factorize(df['postman_id'].to_numpy()[keyed], sort=True)
+    ds_codes, ds_uniques = pd.factorize(df['ds'].to_numpy()[keyed], sort=True)
+    gps_time = df['gps_time'].to_numpy()[keyed]
+    time_key = gps_time if gps_time.dtype.kind in 'iuf' else pd.factorize(gps_time, sort=True)[0]
+    order = np.lexsort((time_key, ds_codes, pid_codes))
+    
+    pid_codes = pid_codes[order]
+    ds_codes = ds_codes[order]
+    gps_time = gps_time[order].astype(np.float64)
+    lats = df['lat'].to_numpy(dtype=np.float64)[keyed][order]
+    lngs = df['lng'].to_numpy(dtype=np.float64)[keyed][order]
     
-    # 2. Group by Courier & Day to form a "Route"
+    # 2. Courier & Day form a "Route"
     # For this dataset, we'll treat a full day's route as one "Job/Order" 
     # (or you could split by idle time, but Daily Performance is a good unit).
+    new_courier = np.r_[True, pid_codes[1:] != pid_codes[:-1]]
+    new_route = new_courier | np.r_[True, ds_codes[1:] != ds_codes[:-1]]
+    starts = np.flatnonzero(new_route)
     
-    grouped = df.groupby(['postman_id', 'ds'])
+    if n_jobs > 1:
+        dist_km, start_time, end_time = _route_stats_sharded(
+            lats, lngs, gps_time, starts, np.flatnonzero(new_courier), n_jobs
+        )
+    else:
+        dist_km, start_time, end_time = _route_stats(lats, lngs, gps_time, starts)
     
-    processed_rows = []
+    # Routes need at least two points
+    lengths = np.diff(np.r_[starts, len(pid_codes)])
+    keep = lengths >= 2
+    first = starts[keep]
+    last = first + lengths[keep] - 1
     
-    for (pid, ds), group in grouped:
-        if len(group) < 2:
-            continue
-            
-        # Extract basic info
-        start_time = group['gps_time'].min()
-        end_time = group['gps_time'].max()
-        
-        # Calculate Total Distance
-        # Shift distinct points to handle stationary periods
-        lats = group['lat'].values
-        lngs = group['lng'].values
-        
-        # Vectorized distance calc
-        dist_km = np.sum(haversine_np(lngs[:-1], lats[:-1], lngs[1:], lats[1:]))
-        
-        # Meta-data
-        record = {
-            'courier_id': int(pid) if not pd.isna(pid) else 0,
-            'ds': ds,
-            'accept_time': pd.to_datetime(start_time, unit='s'),
-            'finish_time': pd.to_datetime(end_time, unit='s'),
-            'distance': dist_km,
-            # Synthetic features where missing
-            'vehicle_type': 'Motorcycle', 
-            'weather': 'Cloudy' # Placeholder
-        }
-        processed_rows.append(record)
-        
-    orders_df = pd.DataFrame(processed_rows)
-    
-    if orders_df.empty:
+    if len(first) == 0:
         logger.warning("Transformation resulted in empty dataframe!")
         return pd.DataFrame()
+    
+    # LaDe courier ids are integers (float once NaN was present); other ids are kept as they are
+    if pid_uniques.dtype.kind == 'f' and np.array_equal(pid_uniques, np.trunc(pid_uniques)):
+        pid_uniques = pid_uniques.astype(np.int64)
+
+    orders_df = pd.DataFrame({
+        'courier_id': pid_uniques[pid_codes[first]],
+        'ds': ds_uniques[ds_codes[first]],
+        'accept_time': pd.to_datetime(start_time[keep], unit='s'),
+        'finish_time': pd.to_datetime(end_time[keep], unit='s'),
+        'distance': dist_km[keep],
+        # First and last fix, indexed by grid cell for regional aggregation (see spatial.py)
+        'start_lat': lats[first],
+        'start_lng': lngs[first],
+        'end_lat': lats[last],
+        'end_lng': lngs[last],
+        'start_cell': grid_cell(lats[first], lngs[first]),
+        'end_cell': grid_cell(lats[last], lngs[last]),
+        # Synthetic features where missing
+        'vehicle_type': 'Motorcycle', 
+        'weather': 'Cloudy' # Placeholder
+    })
 
     # 3. Add SLA Logic (Promise Time)
     # Realistic assumption: 5 mins/km + 30 mins fixed
-    avg_speed_min_per_km = 5.0 
-    orders_df['promise_duration'] = orders_df['distance'] * avg_speed_min_per_km + 30
+    orders_df['promise_duration'] = orders_df['distance'] * PROMISE_MIN_PER_KM + PROMISE_BASE_MIN
     orders_df['promise_time'] = orders_df['accept_time'] + pd.to_timedelta(orders_df['promise_duration'], unit='m')
     
     logger.info(f"Generated {len(orders_df)} order records from trajectories.")
     return orders_df
 
-def load_lade_data(subset="default", split="train", sample_size=None, cache_path="data_cache/lade_orders.parquet"):
+def iter_raw_batches(source="huggingface", split="train", batch_size=100_000, max_points=None):
+    """
+    Yields raw GPS points as DataFrames of at most `batch_size` rows, read as
+    Arrow record batches so only one batch is in memory at a time.
+
+    Args:
+        source (str): "huggingface" to stream Cainiao-AI/LaDe, or a local
+            .parquet / .csv file with the same columns as a stand-in.
+        split (str): Dataset split (HuggingFace only).
+        batch_size (int): Rows per batch.
+        max_points (int, optional): Stop after this many points.
+    """
+    if source == "huggingface":
+        # Imported here: `datasets` is slow to import and only needed to stream from the Hub
+        from datasets import load_dataset
+        dataset = load_dataset("Cainiao-AI/LaDe", split=split, streaming=True, trust_remote_code=True)
+        batches = (t.to_pandas() for t in dataset.with_format("arrow").iter(batch_size=batch_size))
+    elif source.endswith(".parquet"):
+        pf = pq.ParquetFile(source)
+        columns = [c for c in RAW_COLUMNS if c in pf.schema_arrow.names]
+        batches = (b.to_pandas() for b in pf.iter_batches(batch_size=batch_size, columns=columns))
+    elif source.endswith(".csv"):
+        batches = pd.read_csv(source, chunksize=batch_size)
+    else:
+        raise ValueError(f"Unsupported raw data source: {source}")
+
+    seen = 0
+    for batch in batches:
+        if max_points is not None and seen + len(batch) >= max_points:
+            yield batch.iloc[:max_points - seen]
+            return
+        seen += len(batch)
+        yield batch
+
+def _route_keys(df):
+    return set(df[['postman_id', 'ds']].drop_duplicates().itertuples(index=False, name=None))
+
+def iter_route_chunks(raw_batches):
+    """
+    Re-chunks raw batches so that no courier-day route is split across chunks.
+
+    Trajectories arrive grouped by courier and day, so only the route that is
+    still open at the end of a batch can continue into the next one. Its rows
+    are held back and prepended to the next batch; memory stays bounded by
+    one batch plus one route, and the set of route keys already emitted.
+
+    Raises:
+        ValueError: A route reappears after it was emitted, i.e. the input
+            is not grouped by (postman_id, ds) and would yield split routes.
+    """
+    carry = None
+    closed = set()
+    for batch in raw_batches:
+        if batch.empty:
+            continue
+        reopened = _route_keys(batch) & closed
+        if reopened:
+            raise ValueError(f"Raw points are not grouped by courier and day: {len(reopened)} route(s) "
+                             f"reappear after they were closed, e.g. {sorted(reopened, key=str)[:3]}; "
+                             "sort the source by (postman_id, ds) first.")
+        if carry is not None and len(carry):
+            batch = pd.concat([carry, batch], ignore_index=True)
+
+        # Rows sharing the last row's route key may continue in the next batch
+        last = batch.iloc[-1]
+        open_route = (batch['postman_id'] == last['postman_id']).to_numpy() & (batch['ds'] == last['ds']).to_numpy()
+        carry = batch[open_route]
+        if not open_route.all():
+            done = batch[~open_route]
+            closed |= _route_keys(done)
+            yield done
+
+    if carry is not None and len(carry):
+        yield carry
+
+class OrderCacheWriter:
+    """
+    Incrementally writes order records into the partitioned Parquet cache,
+    flushing every `flush_rows`. Files land in `ds=<ds>/` (and
+    `bucket=<b>/` below it when courier bucketing is on) and are named with
+    `prefix` so parts from different raw sources never collide. `files`
+    lists what was written, for the manifest.
+    """
+    def __init__(self, dataset_dir, prefix="part", courier_buckets=0, flush_rows=100_000):
+        self.dataset_dir = dataset_dir
+        self.prefix = prefix
+        self.courier_buckets = courier_buckets
+        self.flush_rows = flush_rows
+        self.buffer = []
+        self.buffered = 0
+        self.flushes = 0
+        self.files = []
+        os.makedirs(dataset_dir, exist_ok=True)
+
+    def write(self, orders_df):
+        if orders_df.empty:
+            return
+        self.buffer.append(orders_df)
+        self.buffered += len(orders_df)
+        if self.buffered >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        orders = pd.concat(self.buffer, ignore_index=True)
+        keys = ['ds']
+        if self.courier_buckets:
+            if orders['courier_id'].dtype.kind not in 'iu':
+                raise ValueError("Courier bucketing needs integer courier ids; build the cache with courier_buckets=0.")
+            keys.append(orders['courier_id'] % self.courier_buckets)
+        for key, part in orders.groupby(keys, sort=False):
+            ds = key[0]
+            rel_dir = f"ds={ds}"
+            bucket = None
+            if self.courier_buckets:
+                bucket = int(key[1])
+                rel_dir = os.path.join(rel_dir, f"bucket={bucket}")
+            rel_path = os.path.join(rel_dir, f"{self.prefix}-{self.flushes:05d}.parquet")
+            os.makedirs(os.path.join(self.dataset_dir, rel_dir), exist_ok=True)
+            pq.write_table(pa.Table.from_pandas(part, preserve_index=False), os.path.join(self.dataset_dir, rel_path),
+                           row_group_size=ROW_GROUP_ROWS)
+            self.files.append({"path": rel_path, "ds": str(ds), "bucket": bucket, "rows": len(part)})
+        self.flushes += 1
+        self.buffer = []
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+        return self.files
+
+MANIFEST_NAME = "_manifest.json"
+
+def load_manifest(dataset_dir=ORDERS_DIR):
+    """
+    The cache manifest: for every raw source, its fingerprint and the part
+    files built from it. Only files listed here are ever read, so parts
+    written by an interrupted update stay invisible.
+    """
+    path = os.path.join(dataset_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"schema_version": ORDER_SCHEMA_VERSION, "courier_buckets": 0, "sources": {}, "partitions": {}}
+    with open(path) as f:
+        return json.load(f)
+
+def _save_manifest(dataset_dir, manifest):
+    # Partition summary, derived from the per-source file lists
+    partitions = {}
+    for src in manifest["sources"].values():
+        for entry in src["files"]:
+            summary = partitions.setdefault(entry["ds"], {"rows": 0, "files": 0})
+            summary["rows"] += entry["rows"]
+            summary["files"] += 1
+    manifest["partitions"] = dict(sorted(partitions.items()))
+
+    path = os.path.join(dataset_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def _delete_files(dataset_dir, entries):
+    for entry in entries:
+        path = os.path.join(dataset_dir, entry["path"])
+        try:
+            os.remove(path)
+            # Prune partition directories left empty (stops at the first non-empty one)
+            os.removedirs(os.path.dirname(path))
+        except OSError:
+            pass
+
+def list_raw_sources(source):
+    """
+    A raw source is "huggingface", a single .parquet/.csv file, or a
+    directory of them (e.g. one file per day). Each file is tracked, and
+    rebuilt, independently; a courier-day route must not span two files.
+    """
+    if source != "huggingface" and os.path.isdir(source):
+        return sorted(
+            os.path.join(source, f) for f in os.listdir(source) if f.endswith((".parquet", ".csv"))
+        )
+    return [source]
+
+def source_fingerprint(source, split="train", max_points=None):
+    """
+    Cheap change detector for a raw source: size and mtime for local files,
+    the dataset/split/limit for the HuggingFace stream.
+
+    The HuggingFace fingerprint does not include the dataset revision, so
+    new upstream data is not picked up by itself: rebuild explicitly (e.g.
+    delete the cache directory) after the dataset is updated on the Hub.
+    """
+    if source == "huggingface":
+        return f"huggingface:Cainiao-AI/LaDe:{split}:{max_points}"
+    st = os.stat(source)
+    return f"{st.st_size}:{st.st_mtime_ns}:{max_points}"
+
+def _same_root(cached_source, source):
+    """
+    Whether `cached_source` (a manifest key) was listed from `source`, i.e. is
+    a file directly inside the directory `source`.
+    """
+    if source == "huggingface" or not os.path.isdir(source):
+        return False
+    return os.path.normpath(os.path.dirname(cached_source)) == os.path.normpath(source)
+
+def update_order_cache(source="huggingface", split="train", dataset_dir=ORDERS_DIR, batch_size=100_000,
+                       max_points=None, courier_buckets=0):
+    """
+    Brings the partitioned order cache up to date with `source`.
+
+    Only raw sources that are new or whose fingerprint changed are streamed
+    and transformed; their old part files are replaced. Files that
+    disappeared from a `source` directory have their parts dropped; sources
+    cached from anywhere else (another directory, a single file, the
+    HuggingFace stream) are left alone. Unchanged sources cost nothing.
+
+    Returns:
+        dict: The updated manifest.
+    """
+    os.makedirs(dataset_dir, exist_ok=True)
+    manifest = load_manifest(dataset_dir)
+
+    # Manifests from before schema versioning have no key: schema 1
+    if manifest["sources"] and manifest["courier_buckets"] != courier_buckets:
+        rebuild = "Courier bucketing changed"
+    elif manifest["sources"] and manifest.get("schema_version", 1) != ORDER_SCHEMA_VERSION:
+        rebuild = "Order schema changed"
+    else:
+        rebuild = None
+    if rebuild:
+        logger.info(f"{rebuild}; rebuilding the whole order cache.")
+        for src in manifest["sources"].values():
+            _delete_files(dataset_dir, src["files"])
+        manifest["sources"] = {}
+    manifest["courier_buckets"] = courier_buckets
+    manifest["schema_version"] = ORDER_SCHEMA_VERSION
+
+    raw_sources = list_raw_sources(source)
+    removed = [src for src in set(manifest["sources"]) - set(raw_sources) if _same_root(src, source)]
+    for src in removed:
+        logger.info(f"Raw source removed, dropping its partitions: {src}")
+        _delete_files(dataset_dir, manifest["sources"].pop(src)["files"])
+        _save_manifest(dataset_dir, manifest)
+
+    for src in raw_sources:
+        fingerprint = source_fingerprint(src, split, max_points)
+        previous = manifest["sources"].get(src)
+        if previous is not None and previous["fingerprint"] == fingerprint:
+            continue
+
+        logger.info(f"Building order partitions from {src}...")
+        # New names per fingerprint, so the old parts stay valid until the manifest flips
+        prefix = hashlib.sha1(f"{src}|{fingerprint}".encode()).hexdigest()[:12]
+        writer = OrderCacheWriter(dataset_dir, prefix=prefix, courier_buckets=courier_buckets)
+        n_points = 0
+        for chunk in iter_route_chunks(iter_raw_batches(src, split, batch_size, max_points)):
+            n_points += len(chunk)
+            writer.write(process_gps_to_orders(chunk))
+        files = writer.close()
+        logger.info(f"Streamed {n_points:,} raw GPS points into {sum(f['rows'] for f in files):,} order records.")
+
+        manifest["sources"][src] = {"fingerprint": fingerprint, "files": files}
+        _save_manifest(dataset_dir, manifest)
+        if previous is not None:
+            _delete_files(dataset_dir, previous["files"])
+
+    return manifest
+
+def _ds_matches(value, ds, ds_range):
+    """
+    Partition pruning on the `ds` directory value (stored as a string).
+    """
+    if ds is not None and value not in {str(d) for d in ds}:
+        return False
+    if ds_range is not None:
+        try:
+            v = float(value)
+        except ValueError:
+            return True # Can't prune; the row filter still applies
+        lo, hi = ds_range
+        if (lo is not None and v < lo) or (hi is not None and v > hi):
+            return False
+    return True
+
+def _row_filter(ds=None, ds_range=None, couriers=None, distance_range=None):
+    """
+    Arrow filter expression, pushed down to the Parquet reader so row groups
+    whose min/max statistics can't match are skipped.
+    """
+    expr = None
+    def both(a, b):
+        return b if a is None else a & b
+    if ds is not None:
+        expr = both(expr, pc.field('ds').isin(list(ds)))
+    if ds_range is not None:
+        lo, hi = ds_range
+        if lo is not None:
+            expr = both(expr, pc.field('ds') >= lo)
+        if hi is not None:
+            expr = both(expr, pc.field('ds') <= hi)
+    if couriers is not None:
+        expr = both(expr, pc.field('courier_id').isin([int(c) for c in couriers]))
+    if distance_range is not None:
+        lo, hi = distance_range
+        if lo is not None:
+            expr = both(expr, pc.field('distance') >= lo)
+        if hi is not None:
+            expr = both(expr, pc.field('distance') <= hi)
+    return expr
+
+def _sample_row_groups(files, columns, sample_size, seed):
+    """
+    Uniform sample without a row filter: pick global row numbers from the
+    Parquet footers, then decode only the row groups that hold them.
+    """
+    rng = np.random.default_rng(seed)
+    groups = [] # (file, row group, rows)
+    for path in files:
+        meta = pq.ParquetFile(path).metadata
+        groups.extend((path, i, meta.row_group(i).num_rows) for i in range(meta.num_row_groups))
+    sizes = np.array([g[2] for g in groups], dtype=np.int64)
+    total = int(sizes.sum())
+    if total == 0:
+        return None
+
+    picks = np.sort(rng.choice(total, size=min(sample_size, total), replace=False))
+    group_of = np.searchsorted(np.cumsum(sizes), picks, side='right')
+    group_start = np.r_[0, np.cumsum(sizes)[:-1]]
+
+    tables = []
+    for g in np.unique(group_of):
+        path, i, _ = groups[g]
+        table = pq.ParquetFile(path).read_row_group(i, columns=columns)
+        tables.append(table.take(picks[group_of == g] - group_start[g]))
+    return pa.concat_tables(tables)
+
+def _sample_filtered(dataset, columns, expr, sample_size, seed):
+    """
+    Uniform sample of the rows matching `expr`, in one streaming pass:
+    each row gets a random key and the `sample_size` smallest keys are kept
+    (reservoir sampling), so memory stays O(sample_size).
+    """
+    rng = np.random.default_rng(seed)
+    kept, kept_keys = None, np.zeros(0)
+    for batch in dataset.to_batches(columns=columns, filter=expr):
+        if batch.num_rows == 0:
+            continue
+        table = pa.Table.from_batches([batch]) if kept is None else pa.concat_tables([kept, pa.Table.from_batches([batch])])
+        keys = np.r_[kept_keys, rng.random(batch.num_rows)]
+        if len(keys) > sample_size:
+            best = np.argpartition(keys, sample_size)[:sample_size]
+            table, keys = table.take(best), keys[best]
+        kept, kept_keys = table, keys
+    return kept
+
+def order_cache_files(dataset_dir=ORDERS_DIR, legacy_path=os.path.join(CACHE_DIR, "lade_orders.parquet")):
+    """
+    Every Parquet file of the order cache, in (ds, path) order: the legacy
+    single-file cache if present (it wins, as in `load_lade_data`), else the
+    files listed in the manifest.
+    """
+    if os.path.exists(legacy_path):
+        return [legacy_path]
+    manifest = load_manifest(dataset_dir)
+    files = sorted(
+        (entry["ds"], os.path.join(dataset_dir, entry["path"]))
+        for src in manifest["sources"].values() for entry in src["files"]
+    )
+    return [path for _, path in files]
+
+def read_order_cache(dataset_dir=ORDERS_DIR, columns=None, ds=None, ds_range=None, couriers=None,
+                     distance_range=None, sample_size=None, random_state=42, files=None):
+    """
+    Reads only what a caller needs from the order cache.
+
+    Partitions are pruned from the manifest (ds, and courier bucket when
+    bucketing is on); columns and row filters are pushed down to the
+    Parquet reader; sampling touches only the row groups it draws from.
+
+    Args:
+        columns (list, optional): Columns to read (all if None).
+        ds (list, optional): Partition values to read.
+        ds_range (tuple, optional): Inclusive (min, max) ds; either end may be None.
+        couriers (list, optional): Courier ids.
+        distance_range (tuple, optional): Inclusive (min, max) route distance in km.
+        sample_size (int, optional): Uniform random sample of at most this many rows.
+        files (list, optional): Read these Parquet files instead of the manifest (legacy cache).
+    """
+    row_ds, row_ds_range = ds, ds_range
+    if files is None:
+        # Each partition holds a single ds, so ds filters are fully answered by pruning
+        row_ds, row_ds_range = None, None
+        manifest = load_manifest(dataset_dir)
+        buckets = manifest["courier_buckets"]
+        wanted_buckets = None
+        if couriers is not None and buckets:
+            wanted_buckets = {int(c) % buckets for c in couriers}
+
+        files = sorted(
+            os.path.join(dataset_dir, entry["path"])
+            for src in manifest["sources"].values() for entry in src["files"]
+            if _ds_matches(entry["ds"], ds, ds_range)
+            and (wanted_buckets is None or entry["bucket"] in wanted_buckets)
+        )
+    if not files:
+        return pd.DataFrame()
+    if columns is not None:
+        # Requested columns the cache doesn't have are skipped rather than raising
+        available = set(pq.read_schema(files[0]).names)
+        columns = [c for c in columns if c in available]
+
+    expr = _row_filter(row_ds, row_ds_range, couriers, distance_range)
+    if sample_size and expr is None:
+        table = _sample_row_groups(files, columns, sample_size, random_state)
+    elif sample_size:
+        table = _sample_filtered(pads.dataset(files, format="parquet"), columns, expr, sample_size, random_state)
+    else:
+        table = pads.dataset(files, format="parquet").to_table(columns=columns, filter=expr)
+    if table is None:
+        return pd.DataFrame()
+    return table.to_pandas()
+
+def _encode_cursor(path, group, offset):
+    raw = json.dumps({"p": path, "g": group, "o": offset}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def _decode_cursor(cursor):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return state["p"], int(state["g"]), int(state["o"])
+    except Exception:
+        raise ValueError("Malformed cursor.")
+
+class OrderPageIndex:
+    """
+    Row-group index over the order cache for cursor pagination.
+
+    Built from the manifest (or the legacy single-file cache, which takes
+    precedence as in `load_lade_data`) and the Parquet footers only: for every row group it keeps its file, ds,
+    courier bucket, row count and min/max statistics of `courier_id` and
+    `distance`. A cursor names a (file, row group, offset) position, so a
+    page decodes just the row groups it returns rows from, however deep it
+    is; filters prune partitions and row groups before anything is read.
+    The index rebuilds itself when the manifest changes.
+    """
+    STAT_COLUMNS = ("courier_id", "distance")
+
+    def __init__(self, dataset_dir=ORDERS_DIR, legacy_path=os.path.join(CACHE_DIR, "lade_orders.parquet")):
+        self.dataset_dir = dataset_dir
+        self.legacy_path = legacy_path
+        self.stamp = None
+        self.groups = [] # dicts: path, group, ds, bucket, rows, stats
+        self.position = {} # (path, group) -> index into self.groups
+        self.schema = None
+        self.courier_buckets = 0
+        self._lock = threading.Lock()
+
+    def _source_stamp(self):
+        manifest_path = os.path.join(self.dataset_dir, MANIFEST_NAME)
+        # Same precedence as load_lade_data: the legacy file wins if both exist
+        for path in (self.legacy_path, manifest_path):
+            if os.path.exists(path):
+                st = os.stat(path)
+                return (path, st.st_mtime_ns, st.st_size)
+        return None
+
+    def refresh(self):
+        stamp = self._source_stamp()
+        if stamp == self.stamp:
+            return
+        with self._lock:
+            if stamp != self.stamp:
+                self._build(stamp)
+
+    def _build(self, stamp):
+        if stamp is None:
+            files, self.courier_buckets = [], 0
+        elif stamp[0] == self.legacy_path:
+            files, self.courier_buckets = [(self.legacy_path, None, None)], 0
+        else:
+            manifest = load_manifest(self.dataset_dir)
+            self.courier_buckets = manifest["courier_buckets"]
+            files = sorted(
+                (os.path.join(self.dataset_dir, entry["path"]), entry["ds"], entry["bucket"])
+                for src in manifest["sources"].values() for entry in src["files"]
+            )
+
+        groups = []
+        schema = None
+        for path, ds, bucket in files:
+            meta = pq.read_metadata(path)
+            if schema is None:
+                schema = meta.schema.to_arrow_schema()
+            names = [meta.schema.column(i).name for i in range(meta.num_columns)]
+            for g in range(meta.num_row_groups):
+                rg = meta.row_group(g)
+                stats = {}
+                for col in self.STAT_COLUMNS:
+                    if col in names:
+                        st = rg.column(names.index(col)).statistics
+                        if st is not None and st.has_min_max:
+                            stats[col] = (st.min, st.max)
+                groups.append({"path": path, "group": g, "ds": ds, "bucket": bucket,
+                               "rows": rg.num_rows, "stats": stats})
+
+        self.groups = groups
+        self.position = {(grp["path"], grp["group"]): i for i, grp in enumerate(groups)}
+        self.schema = schema
+        self.stamp = stamp
+        logger.info(f"Order page index: {len(groups)} row groups, {sum(g['rows'] for g in groups):,} rows.")
+
+    def _may_match(self, grp, ds, ds_range, couriers, distance_range):
+        try:
+            if grp["ds"] is not None and not _ds_matches(grp["ds"], ds, ds_range):
+                return False
+        except TypeError:
+            pass # Non-numeric ds against a range: left to the row filter
+        if couriers is not None and grp["bucket"] is not None and self.courier_buckets:
+            if grp["bucket"] not in {int(c) % self.courier_buckets for c in couriers}:
+                return False
+        stats = grp["stats"]
+        if couriers is not None and "courier_id" in stats:
+            lo, hi = stats["courier_id"]
+            if not any(lo <= int(c) <= hi for c in couriers):
+                return False
+        if distance_range is not None and "distance" in stats:
+            lo, hi = stats["distance"]
+            d_lo, d_hi = distance_range
+            if (d_lo is not None and hi < d_lo) or (d_hi is not None and lo > d_hi):
+                return False
+        return True
+
+    def page(self, columns=None, ds=None, ds_range=None, couriers=None, distance_range=None,
+             cursor=None, limit=100, max_row_groups=64):
+        """
+        One page of orders in cache order.
+
+        Args:
+            columns (list, optional): Columns to return (all if None).
+            ds, ds_range, couriers, distance_range: Same filters as `read_order_cache`.
+            cursor (str, optional): `next_cursor` from the previous page, for
+                the same filters; None starts from the beginning.
+            limit (int): Max rows in the page.
+            max_row_groups (int): Scan budget; a very selective filter may
+                return a short page, with a cursor to continue from.
+        Returns:
+            tuple: (pa.Table, next_cursor or None when the cache is exhausted)
+        """
+        self.refresh()
+        if self.schema is None:
+            return pa.table({}), None
+        if columns is not None:
+            unknown = [c for c in columns if c not in self.schema.names]
+            if unknown:
+                raise ValueError(f"Unknown columns: {unknown}. Available: {self.schema.names}")
+
+        start, offset = 0, 0
+        if cursor:
+            path, group, offset = _decode_cursor(cursor)
+            if (path, group) not in self.position:
+                raise ValueError("Cursor no longer matches the order cache; start again.")
+            start = self.position[(path, group)]
+
+        ds = self._coerce_ds(ds)
+        ds_range = self._coerce_ds(ds_range)
+        expr = _row_filter(ds, ds_range, couriers, distance_range)
+        read_cols = None
+        if columns is not None:
+            # Filter columns are read too, then dropped
+            needed = set(columns) | {c for c in ('ds', 'courier_id', 'distance') if c in self.schema.names}
+            read_cols = [c for c in self.schema.names if c in needed]
+
+        tables, taken, scanned = [], 0, 0
+        for i in range(start, len(self.groups)):
+            grp = self.groups[i]
+            if not self._may_match(grp, ds, ds_range, couriers, distance_range):
+                offset = 0
+                continue
+            if scanned == max_row_groups:
+                return self._finish(tables, columns), _encode_cursor(grp["path"], grp["group"], 0)
+            scanned += 1
+
+            table = pq.ParquetFile(grp["path"]).read_row_group(grp["group"], columns=read_cols)
+            if expr is not None:
+                table = table.filter(expr)
+            # `offset` counts matching rows already returned from this group
+            chunk = table.slice(offset, limit - taken)
+            tables.append(chunk)
+            taken += chunk.num_rows
+            if taken == limit:
+                next_offset = offset + chunk.num_rows
+                if next_offset < table.num_rows:
+                    return self._finish(tables, columns), _encode_cursor(grp["path"], grp["group"], next_offset)
+                if i + 1 < len(self.groups):
+                    nxt = self.groups[i + 1]
+                    return self._finish(tables, columns), _encode_cursor(nxt["path"], nxt["group"], 0)
+                return self._finish(tables, columns), None
+            offset = 0
+        return self._finish(tables, columns), None
+
+    def _finish(self, tables, columns):
+        tables = [t for t in tables if t.num_rows] or tables[:1]
+        if not tables:
+            schema = self.schema if columns is None else pa.schema([self.schema.field(c) for c in columns])
+            return schema.empty_table()
+        table = pa.concat_tables(tables, promote_options="default")
+        return table.select(columns) if columns is not None else table
+
+    def _coerce_ds(self, values):
+        # Query strings arrive as text; compare in the column's own type
+        if values is None or 'ds' not in self.schema.names:
+            return values
+        if pa.types.is_integer(self.schema.field('ds').type):
+            return [None if v is None else int(v) for v in values]
+        return [None if v is None else str(v) for v in values]
+
+def load_lade_data(subset="default", split="train", sample_size=None, cache_path="data_cache/lade_orders.parquet",
+                   dataset_dir=ORDERS_DIR, source="huggingface", max_points=DEFAULT_MAX_POINTS, columns=None,
+                   ds=None, ds_range=None, couriers=None, courier_buckets=0, random_state=42, refresh=False):
     """
     Loads LaDe data, forcing a fresh download/transform if needed to get real orders.
+
+    Raw trajectories are streamed in fixed-size chunks into a partitioned
+    order cache (see `update_order_cache`); only new or changed raw sources
+    are transformed. Column lists, ds/courier filters and `sample_size` are
+    pushed down to the Parquet reader (see `read_order_cache`).
+
+    Args:
+        max_points (int, optional): Raw points streamed per source when the
+            cache is built; None streams all of it (full ingestion).
+        refresh (bool): Bring the cache up to date with `source` (at
+            `max_points`) first. By default an existing cache is read as is
+            and `source` is only streamed when there is no cache yet, so a
+            quick training run or a server start never triggers a full
+            ingestion or rebuild.
     """
+    filters = dict(columns=columns, ds=ds, ds_range=ds_range, couriers=couriers,
+                   sample_size=sample_size, random_state=random_state)
     
     # Check cache first
     # IMPORTANT: We changed the cache filename to 'lade_orders' to distinguish from raw
     if os.path.exists(cache_path):
         logger.info(f"Loading transformed orders from cache: {cache_path}")
-        df = pd.read_parquet(cache_path)
-        if sample_size and len(df) > sample_size:
-            df = df.sample(n=sample_size, random_state=42)
-        return df
+        return read_order_cache(files=[cache_path], **filters)
+
+    if not refresh and load_manifest(dataset_dir)["partitions"]:
+        logger.info(f"Loading transformed orders from partitioned cache: {dataset_dir}")
+        return read_order_cache(dataset_dir, **filters)
 
-    logger.info(f"Downloading {subset} dataset from HuggingFace...")
     try:
-        # We need ENOUGH rows to form routes. 20k rows might form ~50-100 routes.
-        # Let's pull more to be safe -> 50,000
-        download_limit = 100000 
-        
-        dataset = load_dataset("Cainiao-AI/LaDe", split=split, streaming=True, trust_remote_code=True)
-        
-        data_list = []
-        for i, item in enumerate(dataset):
-            data_list.append(item)
-            if i >= download_limit:
-                break
-                
-        raw_df = pd.DataFrame(data_list)
-        logger.info(f"Downloaded {len(raw_df)} raw GPS points.")
-        
-        # TRANSFORM
-        orders_df = process_gps_to_orders(raw_df)
-        
-        if orders_df.empty:
-             # Fallback if transformation fails (e.g. data is not trajectory)
-             raise ValueError("Transformation yielded 0 orders.")
-             
-        # Save cache
-        logger.info(f"Saving transformed data to cache: {cache_path}")
-        orders_df.to_parquet(cache_path, index=False)
+        manifest = update_order_cache(source, split, dataset_dir, max_points=max_points, courier_buckets=courier_buckets)
+        if not manifest["partitions"]:
+            # Fallback if transformation fails (e.g. data is not trajectory)
+            raise ValueError("Transformation yielded 0 orders.")
         
-        if sample_size and len(orders_df) > sample_size:
-             return orders_df.sample(n=sample_size, random_state=42)
-             
-        return orders_df
+        logger.info(f"Loading transformed orders from partitioned cache: {dataset_dir}")
+        return read_order_cache(dataset_dir, **filters)
         
     except Exception as e:
         logger.error(f"Error loading/transforming dataset: {e}")
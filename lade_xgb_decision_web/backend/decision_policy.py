@@ -1,34 +1,70 @@
+import numpy as np
+
+# Per-level action metadata, indexed by risk code (0=Low, 1=Medium, 2=High)
+RISK_LEVELS = (
+    {
+        "risk_level": "Low",
+        "action": "Monitor",
+        "color": "green",
+        "description": "Standard tracking. No intervention needed."
+    },
+    {
+        "risk_level": "Medium",
+        "action": "Prioritize",
+        "color": "yellow",
+        "description": "Flag for potential delay. Assign to priority queue."
+    },
+    {
+        "risk_level": "High",
+        "action": "Escalate",
+        "color": "red",
+        "description": "Immediate intervention required. Notify ops manager."
+    }
+)
 
 def apply_decision_policy(prob, t1=0.3, t2=0.7):
     """
     Applies the decision policy based on risk buckets.
-    
+
     Args:
         prob (float): Probability of SLA breach.
         t1 (float): Threshold for Low/Medium risk.
         t2 (float): Threshold for Medium/High risk.
-        
+
     Returns:
         dict: Decision details (Risk Level, Action, Color).
     """
     if prob < t1:
-        return {
-            "risk_level": "Low",
-            "action": "Monitor",
-            "color": "green",
-            "description": "Standard tracking. No intervention needed."
-        }
+        return dict(RISK_LEVELS[0])
     elif prob < t2:
-        return {
-            "risk_level": "Medium",
-            "action": "Prioritize",
-            "color": "yellow",
-            "description": "Flag for potential delay. Assign to priority queue."
-        }
+        return dict(RISK_LEVELS[1])
     else:
-        return {
-            "risk_level": "High",
-            "action": "Escalate",
-            "color": "red",
-            "description": "Immediate intervention required. Notify ops manager."
-        }
+        return dict(RISK_LEVELS[2])
+
+def apply_decision_policy_batch(probs, t1=0.3, t2=0.7):
+    """
+    Vectorized decision policy for a whole batch of orders.
+
+    Args:
+        probs (array-like): Probabilities of SLA breach.
+        t1 (float): Threshold for Low/Medium risk.
+        t2 (float): Threshold for Medium/High risk.
+
+    Returns:
+        np.ndarray: int8 risk codes indexing into `RISK_LEVELS`
+        (same buckets as `apply_decision_policy`).
+    Raises:
+        ValueError: If t1 > t2 (digitize would silently bucket differently
+            from the scalar policy).
+    """
+    if not t1 <= t2:
+        raise ValueError(f"t1 must not exceed t2 (got t1={t1}, t2={t2})")
+    # digitize: p < t1 -> 0, t1 <= p < t2 -> 1, p >= t2 (or NaN) -> 2
+    return np.digitize(np.asarray(probs, dtype=np.float64), [t1, t2]).astype(np.int8)
+
+def summarize_decisions(codes):
+    """
+    Order count per risk level for a batch of risk codes.
+    """
+    counts = np.bincount(codes, minlength=len(RISK_LEVELS))
+    return {level["risk_level"]: int(n) for level, n in zip(RISK_LEVELS, counts)}
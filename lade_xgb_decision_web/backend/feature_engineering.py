@@ -1,13 +1,215 @@
 
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import LabelEncoder
 import joblib
 import logging
+import warnings
 
 logger = logging.getLogger(__name__)
 
-def engineering_features(df):
+BASE_FEATURES = ['hour_of_day', 'day_of_week', 'is_weekend', 'log_distance']
+CAT_FEATS = ['weather', 'vehicle_type'] # Example common fields
+# Raw order columns the features and target are built from (for column pushdown)
+INPUT_COLUMNS = ['accept_time', 'order_time', 'finish_time', 'delivery_time', 'promise_time', 'distance'] + CAT_FEATS
+# Route keys kept with the validation predictions as segments, not features
+# (per-courier simulation, regional risk by start/end grid cell)
+ROUTE_KEY_COLUMNS = ['courier_id', 'start_cell', 'end_cell']
+
+# Fields every serving request must carry, and the feature each one fills
+# (transform leaves NaN there when the value is missing or unparseable)
+REQUIRED_FIELDS = {'accept_time': 'hour_of_day', 'distance': 'log_distance'}
+
+NS_PER_HOUR = 3600 * 10**9
+NS_PER_DAY = 24 * NS_PER_HOUR
+
+def _column(data, col):
+    """
+    Pulls one column out of a DataFrame, a list of records or a single record
+    as a NumPy array, without building an intermediate DataFrame.
+    Returns None if the column is absent.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data[col].to_numpy() if col in data.columns else None
+    if not any(col in r for r in data):
+        return None
+    return np.array([r.get(col) for r in data], dtype=object)
+
+# Trailing UTC offset of an ISO timestamp ("Z", "+08:00", "-0500")
+TZ_SUFFIX = r'(?:Z|[+-]\d{2}:?\d{2})$'
+
+def _to_datetime(values):
+    """
+    Coerces an array to datetime64[ns]. Numeric values are epoch seconds
+    (common in LaDe), anything else is parsed.
+    """
+    if not np.issubdtype(values.dtype, np.datetime64):
+        if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) in (
+                'integer', 'floating', 'mixed-integer-float', 'decimal', 'empty'):
+            # Records (JSON requests) arrive as object arrays; numbers there are epoch seconds too
+            values = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(np.float64)
+        if values.dtype.kind in 'iuf':
+            values = pd.to_datetime(values, unit='s', errors='coerce').to_numpy()
+        else:
+            values = _parse_datetime_strings(values)
+    return values.astype('datetime64[ns]')
+
+def _parse_datetime_strings(values):
+    """
+    NumPy parses plain ISO 8601 strings far faster than pandas, which matters
+    for per-request transforms. Anything else goes through pandas: UTC
+    offsets are dropped first, so every timestamp keeps its local wall-clock
+    time (NumPy would shift it to UTC, and pandas refuses mixed offsets);
+    ISO variants then parse in one pass and other formats value by value.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            return np.array(values, dtype='datetime64[ns]')
+    except (ValueError, TypeError, UserWarning):
+        series = pd.Series(values, dtype=object)
+        # Non-strings come back NaN from .str; keep them as they were
+        local = series.str.replace(TZ_SUFFIX, '', regex=True).fillna(series)
+        parsed = pd.to_datetime(local, errors='coerce', format='ISO8601')
+        retry = parsed.isna() & local.notna()
+        if retry.any():
+            parsed[retry] = pd.to_datetime(local[retry], errors='coerce', format='mixed')
+        return parsed.to_numpy()
+
+class InvalidFeaturesError(ValueError):
+    """
+    Raised by `FeaturePipeline.check_required` when records lack a usable
+    value for a required field. `rows` maps field -> offending row positions.
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        def listed(idx):
+            return ", ".join(map(str, idx[:10])) + (f" and {len(idx) - 10} more" if len(idx) > 10 else "")
+        super().__init__("; ".join(f"{field} missing or invalid in rows {listed(idx)}" for field, idx in rows.items()))
+
+class FeaturePipeline:
+    """
+    Single fit/transform path shared by training and serving.
+
+    `fit` learns the categorical vocabularies; `transform` turns raw orders
+    (DataFrame, list of dicts or a single dict) into a contiguous float32
+    matrix with columns `feature_names`. Transform holds no mutable state,
+    so one fitted instance can serve concurrent requests.
+    """
+    def __init__(self):
+        self.categories = {}
+        self.feature_names = list(BASE_FEATURES)
+
+    @classmethod
+    def from_encoders(cls, encoders):
+        """
+        Builds a fitted pipeline from legacy `encoders.pkl` LabelEncoders.
+        A LabelEncoder's code is the label's position in `classes_`.
+        """
+        pipeline = cls()
+        pipeline.categories = {col: pd.Index(le.classes_) for col, le in encoders.items()}
+        pipeline.feature_names = list(BASE_FEATURES) + [c for c in CAT_FEATS if c in pipeline.categories]
+        return pipeline
+
+    def fit(self, df):
+        existing_cats = [c for c in CAT_FEATS if c in df.columns]
+        # Sorted unique labels, same codes LabelEncoder would assign
+        self.categories = {
+            col: pd.Index(np.unique(df[col].astype(str).to_numpy())) for col in existing_cats
+        }
+        self.feature_names = list(BASE_FEATURES) + existing_cats
+        return self
+
+    def transform(self, data):
+        """
+        Args:
+            data (pd.DataFrame, list of dicts or dict): Raw order records.
+        Returns:
+            np.ndarray: float32 matrix of shape (n_rows, len(feature_names)).
+        """
+        if isinstance(data, dict):
+            data = [data]
+        n = len(data)
+        X = np.full((n, len(self.feature_names)), np.nan, dtype=np.float32)
+
+        # Time based features, straight from the int64 nanosecond representation
+        accept = _column(data, 'accept_time')
+        if accept is not None:
+            ts = _to_datetime(accept)
+            valid = ~np.isnat(ts)
+            ns = ts.astype(np.int64)
+            days = ns // NS_PER_DAY
+            # 1970-01-01 was a Thursday (dayofweek 3)
+            dow = (days + 3) % 7
+            X[valid, 0] = ((ns - days * NS_PER_DAY) // NS_PER_HOUR)[valid]
+            X[valid, 1] = dow[valid]
+            X[valid, 2] = (dow >= 5)[valid]
+
+        distance = _column(data, 'distance')
+        if distance is not None:
+            X[:, 3] = np.log1p(pd.to_numeric(distance, errors='coerce').astype(np.float64))
+
+        # Categoricals: hash lookup, unseen labels map to -1
+        for j, col in enumerate(self.feature_names[len(BASE_FEATURES):], start=len(BASE_FEATURES)):
+            values = _column(data, col)
+            if values is None:
+                X[:, j] = -1
+            else:
+                X[:, j] = self.categories[col].get_indexer(values.astype(str))
+
+        return X
+
+    def check_required(self, X):
+        """
+        Raises InvalidFeaturesError if any row of a transformed matrix had a
+        required field missing or unparseable. Serving calls this so such
+        rows are rejected rather than scored; training drops them instead.
+        """
+        bad = {}
+        for field, feature in REQUIRED_FIELDS.items():
+            rows = np.flatnonzero(np.isnan(X[:, self.feature_names.index(feature)]))
+            if len(rows):
+                bad[field] = rows.tolist()
+        if bad:
+            raise InvalidFeaturesError(bad)
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+def build_target(df):
+    """
+    SLA breach target: 1 if finish_time > promise_time else 0.
+    If dataset has no promise_time, we assume SLA = accept_time + 2 hours (Last Mile standard).
+    Returns a float array with NaN where the target can't be determined.
+    """
+    # Real LaDe often has 'order_time' and 'delivery_time'.
+    finish = _column(df, 'finish_time')
+    if finish is None:
+        finish = _column(df, 'delivery_time')
+    accept = _column(df, 'accept_time')
+    if accept is None:
+        accept = _column(df, 'order_time')
+
+    finish = _to_datetime(finish)
+    promise = _column(df, 'promise_time')
+    if promise is not None:
+        deadline = _to_datetime(promise)
+    else:
+        # Fallback SLA: 2 hours from accept
+        logger.warning("No 'promise_time' found. Constructing synthetic SLA (2 hours).")
+        deadline = _to_datetime(accept) + np.timedelta64(2, 'h')
+
+    y = (finish > deadline).astype(np.float64)
+    y[np.isnat(finish) | np.isnat(deadline)] = np.nan
+    return y
+
+def engineering_features(df, pipeline=None, return_rows=False):
     """
     Performs feature engineering on the LaDe dataframe.
     
@@ -17,101 +219,39 @@ def engineering_features(df):
     - `finish_time`: Actual delivery time
     (We will verify columns, if different, we adapt)
     
+    Args:
+        df (pd.DataFrame): Order records.
+        pipeline (FeaturePipeline, optional): Fitted pipeline. Fitted on `df` if None.
+        return_rows (bool): Also return the positions of the kept rows in `df`.
+    
     Returns:
-        X (pd.DataFrame): Features
-        y (pd.Series): Target (1 if finish_time > promise_time else 0)
-        encoders (dict): Dictionary of fitted label encoders
+        X (np.ndarray): float32 feature matrix (columns `pipeline.feature_names`)
+        y (np.ndarray): Target (1 if finish_time > promise_time else 0)
+        pipeline (FeaturePipeline): The fitted pipeline
+        rows (np.ndarray): Only if `return_rows`; positions of the rows of X in `df`
     """
-    df = df.copy()
-    
-    # ---------------------------------------------------------
-    # 1. Schema Standardization (Adapting to common LaDe naming)
-    # ---------------------------------------------------------
-    # Note: If columns are different, we might need to adjust.
-    # We'll print columns in main execution to verify.
-    # For now, we assume standard timestamps exist.
-    
-    # Mocking column check/filling for robustness if real names vary slightly
-    # Common keys in LaDe: 'req_time', 'accept_time', 'finish_time'
-    
-    time_cols = [c for c in df.columns if 'time' in c.lower()]
-    logger.info(f"Time columns found: {time_cols}")
-    
-    # Let's try to identify critical columns
-    # We NEED a ground truth for 'sla_breach'.
-    # If `promise_time` exists, use it. Else, simulate a synthetic SLA based on distance.
-    
-    target_col = 'sla_breach'
-    
-    # --- SYNTHETIC LOGIC IF COLUMNS MISSING (Safety Net) ---
-    # Real LaDe often has 'order_time' and 'delivery_time'. 
-    # We can define SLA as order_time + X hours.
-    
-    if 'finish_time' not in df.columns and 'delivery_time' in df.columns:
-        df['finish_time'] = df['delivery_time']
-        
     if 'accept_time' not in df.columns and 'order_time' in df.columns:
-        df['accept_time'] = df['order_time']
-        
-    # Ensure datetime
-    for col in time_cols:
-        if not pd.api.types.is_datetime64_any_dtype(df[col]):
-            try:
-                # Try unit='s' first (common in LaDe), fallback if needed
-                df[col] = pd.to_datetime(df[col], unit='s', errors='coerce')
-            except:
-                 df[col] = pd.to_datetime(df[col], errors='coerce')
+        df = df.rename(columns={'order_time': 'accept_time'})
         
-    # Create Target: SLA Breach
-    # If dataset has no promise_time, we assume SLA = accept_time + 2 hours (Last Mile standard)
-    if 'promise_time' in df.columns:
-        df['promise_time'] = pd.to_datetime(df['promise_time'], unit='s')
-        df[target_col] = (df['finish_time'] > df['promise_time']).astype(int)
-    else:
-        # Fallback SLA: 2 hours from accept
-        logger.warning("No 'promise_time' found. Constructing synthetic SLA (2 hours).")
-        df['sla_deadline'] = df['accept_time'] + pd.to_timedelta(2, unit='h')
-        df[target_col] = (df['finish_time'] > df['sla_deadline']).astype(int)
-
-    # ---------------------------------------------------------
-    # 2. Feature Extraction
-    # ---------------------------------------------------------
-    
-    # Time based features
-    df['hour_of_day'] = df['accept_time'].dt.hour
-    df['day_of_week'] = df['accept_time'].dt.dayofweek
-    df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
-    
-    # Duration (if available at inference time? No, duration is target proxy. Don't leak it.)
-    # We can use 'distance' if available.
-    
     if 'distance' not in df.columns:
         # Create random distance if missing (unlikely in LaDe)
-        # Global np is used
-        df['distance'] = np.random.uniform(0.5, 20.0, size=len(df))
+        df = df.assign(distance=np.random.uniform(0.5, 20.0, size=len(df)))
         
-    df['log_distance'] = np.log1p(df['distance'])
-    
-    # Categorical features
-    cat_feats = ['weather', 'vehicle_type'] # Example common fields
-    existing_cats = [c for c in cat_feats if c in df.columns]
-    
-    encoders = {}
-    for col in existing_cats:
-        le = LabelEncoder()
-        df[col] = le.fit_transform(df[col].astype(str))
-        encoders[col] = le
+    if pipeline is None:
+        pipeline = FeaturePipeline().fit(df)
         
-    # Select features for training
-    feature_cols = ['hour_of_day', 'day_of_week', 'is_weekend', 'log_distance'] + existing_cats
-    
-    # Validation: drop rows with NaNs in features
-    train_df = df[feature_cols + [target_col]].dropna()
+    X = pipeline.transform(df)
+    y = build_target(df)
     
-    X = train_df[feature_cols]
-    y = train_df[target_col]
+    # Validation: drop rows with NaNs in features or target
+    keep = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+    if not keep.all():
+        X = np.ascontiguousarray(X[keep])
+        y = y[keep]
     
-    return X, y, encoders
+    if return_rows:
+        return X, y.astype(np.int64), pipeline, np.flatnonzero(keep)
+    return X, y.astype(np.int64), pipeline
 
 def save_encoders(encoders, path="backend/encoders.pkl"):
     joblib.dump(encoders, path)
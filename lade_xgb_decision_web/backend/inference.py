@@ -1,35 +1,133 @@
 
-import xgboost as xgb
 import joblib
-import pandas as pd
 import os
 import logging
-from feature_engineering import engineering_features
+from feature_engineering import FeaturePipeline
+from tree_scorer import CompiledForest, check_parity, random_feature_matrix
+from risk_table import RiskLookupTable
+from model_backend import load_model, MODEL_META_PATH
 
 logger = logging.getLogger(__name__)
 
 class InferenceEngine:
-    def __init__(self, model_path="model.pkl", encoder_path="encoders.pkl"):
+    def __init__(self, model_path="model.pkl", encoder_path="encoders.pkl", pipeline_path="pipeline.pkl",
+                 forest_path="forest.npz", compiled_max_rows=8192,
+                 use_lookup_table=False, lookup_grid_points=256, lookup_max_distance=100.0,
+                 shared_dir=None, model_meta_path=MODEL_META_PATH, n_threads=None):
         self.model_path = model_path
+        # Names the backend (sklearn forest or XGBoost booster); absent for older artifacts
+        self.model_meta_path = model_meta_path
+        self.n_threads = n_threads
         self.encoder_path = encoder_path
-        self.model = None
-        self.encoders = None
-        self._load_artifacts()
+        self.pipeline_path = pipeline_path
+        self.forest_path = forest_path
+        # Above this batch size sklearn's Cython predict_proba is faster than the NumPy walk
+        self.compiled_max_rows = compiled_max_rows
+        self.model = None # SklearnBackend or XGBoostBackend
+        self.pipeline = None
+        self.forest = None
+        # Optional precomputed probability table (answers rows without calling the model)
+        self.use_lookup_table = use_lookup_table
+        self.lookup_grid_points = lookup_grid_points
+        self.lookup_max_distance = lookup_max_distance
+        self.lookup_table = None
+        # Directory written by shared_artifacts.export_shared_artifacts (multi-worker serving)
+        self.shared_dir = shared_dir
+        if shared_dir:
+            self._attach_shared()
+        else:
+            self._load_artifacts()
+
+    def _attach_shared(self):
+        """
+        Worker mode: node arrays (and lookup table) are memory-mapped from the
+        parent's export instead of unpickling model.pkl in every process.
+        Every batch size goes through the compiled forest. Boosted models
+        have no node-array export; their native file is small, so each
+        worker loads it.
+        """
+        from shared_artifacts import attach_forest, attach_lookup_table
+        self._load_pipeline()
+        self.forest = attach_forest(self.shared_dir)
+        if self.forest is None:
+            self.model = load_model(self.model_meta_path, self.model_path, n_threads=self.n_threads)
+            if self.model is None:
+                raise ValueError(f"No compiled forest in {self.shared_dir} and no model file")
+            logger.info(f"Model loaded ({self.model.name} backend), no compiled forest in {self.shared_dir}.")
+        else:
+            logger.info(f"Compiled forest attached from {self.shared_dir}.")
+        self.compiled_max_rows = None
+        if self.use_lookup_table:
+            self.lookup_table = attach_lookup_table(self.shared_dir)
 
     def _load_artifacts(self):
-        if os.path.exists(self.model_path):
-            # self.model = xgb.XGBClassifier()
-            # self.model.load_model(self.model_path)
-            self.model = joblib.load(self.model_path)
-            logger.info("Model loaded.")
+        self.model = load_model(self.model_meta_path, self.model_path, n_threads=self.n_threads)
+        if self.model is not None:
+            logger.info(f"Model loaded ({self.model.name} backend).")
         else:
             logger.warning(f"Model file not found at {self.model_path}")
             
-        if os.path.exists(self.encoder_path):
-            self.encoders = joblib.load(self.encoder_path)
-            logger.info("Encoders loaded.")
+        self._load_pipeline()
+
+        # The NumPy node-array scorer only covers sklearn forests
+        if self.model is not None and hasattr(getattr(self.model, 'estimator', None), 'estimators_'):
+            self.forest = self._load_forest()
+
+        if self.model is not None and self.use_lookup_table:
+            self.lookup_table = self._build_lookup_table()
+
+    def _load_pipeline(self):
+        if os.path.exists(self.pipeline_path):
+            self.pipeline = FeaturePipeline.load(self.pipeline_path)
+            logger.info("Feature pipeline loaded.")
+        elif os.path.exists(self.encoder_path):
+            # Older artifacts only ship the fitted LabelEncoders
+            self.pipeline = FeaturePipeline.from_encoders(joblib.load(self.encoder_path))
+            logger.info("Feature pipeline built from encoders.")
         else:
-            logger.warning(f"Encoder file not found at {self.encoder_path}")
+            logger.warning(f"Neither {self.pipeline_path} nor {self.encoder_path} found. Using an unfitted pipeline.")
+            self.pipeline = FeaturePipeline()
+
+    def _load_forest(self):
+        """
+        Loads the exported node arrays, or compiles them from the model if the
+        export is missing or stale (fails a parity check against the model).
+        """
+        estimator = self.model.estimator
+        X_check = random_feature_matrix(256, estimator.n_features_in_)
+        if os.path.exists(self.forest_path):
+            try:
+                forest = CompiledForest.load(self.forest_path)
+                check_parity(forest, estimator, X_check)
+                logger.info("Compiled forest loaded.")
+                return forest
+            except Exception as e:
+                logger.warning(f"Ignoring {self.forest_path}: {e}")
+        try:
+            forest = CompiledForest.from_sklearn(estimator)
+            check_parity(forest, estimator, X_check)
+            logger.info("Compiled forest built from model.")
+            return forest
+        except Exception as e:
+            logger.warning(f"Compiled scorer unavailable, using predict_proba: {e}")
+            return None
+
+    def _build_lookup_table(self):
+        table = RiskLookupTable.build(
+            self.predict_matrix, self.pipeline,
+            max_distance=self.lookup_max_distance, grid_points=self.lookup_grid_points
+        )
+        table.accuracy_report(self.predict_matrix)
+        return table
+
+    def predict_matrix(self, X):
+        """
+        Scores an already-transformed float32 feature matrix with the exact model.
+        """
+        if self.forest is not None and (self.model is None or len(X) <= self.compiled_max_rows):
+            return self.forest.predict_proba(X)
+        
+        return self.model.predict_proba(X)
 
     def predict(self, input_data):
         """
@@ -38,57 +136,25 @@ class InferenceEngine:
             input_data (dict or list of dicts): Raw input features.
         Returns:
             list: Probabilities.
+        Raises:
+            InvalidFeaturesError: A record has no usable accept_time or distance.
         """
-        if not self.model:
+        if self.model is None and self.forest is None:
             raise ValueError("Model not loaded. Train model first.")
             
-        df = pd.DataFrame(input_data)
-        
-        # Preprocess
-        # Note: engineering_features expects a certain schema and might re-fit label encoders if we aren't careful.
-        # We need a transformation-only version. 
-        # For simplicity, we assume we use the same function but for single row inference we must handle encoders carefully.
-        # Actually, `engineering_features` returns `encoders` which implies it fits them.
-        # We should modify `engineering_features` to accept `encoders` for transform only, OR handle it here.
-        
-        # Simplification: We will just re-use the logic but apply saved encoders for categoricals.
-        
-        # 1. Feature extraction logic (copy-paste/import from FE but handling transform)
-        # We'll use the imported function but we need to ensure we don't re-fit encoders.
-        # Refactoring FE to separate fit/transform is best, but due to time, I will apply encoders manually here 
-        # matching what FE does.
-        
-        # Reuse time features
-        time_cols = ['accept_time'] # Adjust based on input schema
-        # Input expected: {'accept_time': '...', 'distance': ...}
-        
-        # If input is raw JSON, ensure format
-        if 'accept_time' in df.columns:
-             df['accept_time'] = pd.to_datetime(df['accept_time'])
-             df['hour_of_day'] = df['accept_time'].dt.hour
-             df['day_of_week'] = df['accept_time'].dt.dayofweek
-             df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
-        
-        if 'distance' in df.columns:
-            import numpy as np
-            df['log_distance'] = np.log1p(df['distance'])
-            
-        # Categoricals
-        cat_feats = ['weather', 'vehicle_type']
-        if self.encoders:
-            for col in cat_feats:
-                if col in df.columns and col in self.encoders:
-                    # Handle unseen labels carefully
-                    le = self.encoders[col]
-                    df[col] = df[col].astype(str).map(lambda x: le.transform([x])[0] if x in le.classes_ else -1)
-        
-        # Select columns matches training
-        feature_cols = ['hour_of_day', 'day_of_week', 'is_weekend', 'log_distance'] + [c for c in cat_feats if c in df.columns]
+        # Same transform as training: raw records -> float32 matrix
+        X = self.pipeline.transform(input_data)
+        # Missing or malformed accept_time/distance: reject instead of scoring imputed rows
+        self.pipeline.check_required(X)
         
-        X = df[feature_cols]
+        if self.lookup_table is not None:
+            probs, missing = self.lookup_table.lookup(X)
+            # Rows with missing features fall back to the model
+            if missing.any():
+                probs[missing] = self.predict_matrix(X[missing])
+            return probs.tolist()
         
-        probs = self.model.predict_proba(X)[:, 1]
-        return probs.tolist()
+        return self.predict_matrix(X).tolist()
 
 # Singleton instance
 # engine = InferenceEngine()
@@ -0,0 +1,77 @@
+
+import json
+import numpy as np
+from fastapi.responses import JSONResponse
+
+# orjson is optional: several times faster than the stdlib encoder on large
+# float arrays and serializes NumPy arrays natively
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson when installed, the stdlib otherwise.
+
+    Returning it directly from an endpoint also skips FastAPI's per-element
+    `jsonable_encoder` pass, so content must already be plain JSON types
+    (or NumPy arrays when orjson is available).
+    """
+    def render(self, content):
+        return dumps(content)
+
+def dumps(content):
+    """
+    JSON bytes, with orjson when installed (also for WebSocket messages).
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    try:
+        return json.dumps(content, separators=(",", ":"), default=_to_builtin, allow_nan=False).encode("utf-8")
+    except ValueError:
+        # NaN/Infinity would be written bare (invalid JSON); send null, as orjson does
+        return json.dumps(_finite(content), separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _to_builtin(obj):
+    # Stdlib fallback for NumPy values
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _finite(obj):
+    # Copy of `obj` as builtins with non-finite floats replaced by None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return _finite(_to_builtin(obj))
+    if isinstance(obj, float) and not np.isfinite(obj):
+        return None
+    return obj
+
+def wants_binary(request):
+    """
+    True if the client asked for raw little-endian float32 via the Accept header.
+    """
+    return BINARY_MEDIA_TYPE in request.headers.get("accept", "")
+
+def float32_bytes(values):
+    return np.asarray(values, dtype="<f4").tobytes()
+
+def records_to_columns(df):
+    """
+    DataFrame -> {"columns": [...], "data": {column: [values]}} (parallel arrays).
+    """
+    return {
+        "columns": [str(c) for c in df.columns],
+        "data": {str(c): df[c].tolist() for c in df.columns}
+    }
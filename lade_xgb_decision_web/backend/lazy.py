@@ -0,0 +1,73 @@
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class LazyResource:
+    """
+    A heavy object (model, simulation data, dataset sample) built on first
+    use or by a background warm-up, whichever comes first. The factory runs
+    at most once at a time; concurrent callers wait for the same build.
+    A failed build is recorded and retried on the next `get`.
+    """
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.value = None
+        self.state = "pending" # pending -> loading -> ready | failed
+        self.error = None
+        self.load_seconds = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.state == "ready":
+            return self.value
+        with self._lock:
+            if self.state != "ready":
+                self._build()
+        if self.state != "ready":
+            raise RuntimeError(f"{self.name} unavailable: {self.error}")
+        return self.value
+
+    def _build(self):
+        self.state = "loading"
+        start = time.perf_counter()
+        try:
+            self.value = self.factory()
+            self.state = "ready"
+            self.error = None
+        except Exception as e:
+            logger.error(f"Failed to load {self.name}: {e}")
+            self.state = "failed"
+            self.error = str(e)
+        self.load_seconds = time.perf_counter() - start
+
+    def swap(self, value):
+        """
+        Replaces the value with one built elsewhere (hot reload). Callers
+        that already hold the previous value keep using it until they are
+        done; it is returned so the caller can track when it is released.
+        """
+        with self._lock:
+            old = self.value
+            # A single reference assignment: readers see the old or the new value, never neither
+            self.value = value
+            self.state = "ready"
+            self.error = None
+        return old
+
+    def status(self):
+        return {"state": self.state, "error": self.error, "load_seconds": self.load_seconds}
+
+def warm_up(resources):
+    """
+    Builds every resource in turn; meant to run in a background thread.
+    """
+    for resource in resources:
+        try:
+            resource.get()
+        except RuntimeError:
+            pass # Recorded in resource.status(); /readyz reports it
+    logger.info("Warm-up finished: " + ", ".join(f"{r.name}={r.state}" for r in resources))
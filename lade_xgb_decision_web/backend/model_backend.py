@@ -0,0 +1,182 @@
+
+import json
+import logging
+import os
+import joblib
+import numpy as np
+import pandas as pd
+
+# xgboost is optional at serving time: forests pickled by older runs still load without it
+try:
+    import xgboost as xgb
+except ImportError:
+    xgb = None
+
+logger = logging.getLogger(__name__)
+
+MODEL_META_PATH = "model_meta.json"
+SKLEARN_MODEL_PATH = "model.pkl"
+XGB_MODEL_PATH = "model.ubj"
+
+# Defaults for the boosted model; `scale_pos_weight` is set per training run
+XGB_PARAMS = {
+    "n_estimators": 300,
+    "max_depth": 6,
+    "learning_rate": 0.1,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "tree_method": "hist",
+    "eval_metric": "logloss",
+    "random_state": 42
+}
+
+class SklearnBackend:
+    """
+    Any fitted sklearn classifier with predict_proba (the RandomForest baseline).
+    Stored with joblib.
+    """
+    name = "sklearn"
+
+    def __init__(self, estimator):
+        self.estimator = estimator
+        self.n_features = estimator.n_features_in_
+
+    def predict_proba(self, X):
+        """
+        Positive-class probability for a float32 feature matrix.
+        """
+        if hasattr(self.estimator, 'feature_names_in_'):
+            # Models fitted on a DataFrame validate column names
+            X = pd.DataFrame(X, columns=self.estimator.feature_names_in_, copy=False)
+        return self.estimator.predict_proba(X)[:, 1]
+
+    def save(self, path):
+        joblib.dump(self.estimator, path)
+
+    @classmethod
+    def load(cls, path):
+        return cls(joblib.load(path))
+
+class XGBoostBackend:
+    """
+    XGBoost booster stored in the native UBJSON format (.ubj). Scoring goes
+    through `inplace_predict`, which reads the NumPy matrix directly (no
+    DMatrix construction) and parallelizes across `n_threads`.
+    """
+    name = "xgboost"
+
+    def __init__(self, booster, n_threads=None):
+        self.booster = booster
+        if n_threads:
+            self.booster.set_param({"nthread": n_threads})
+        self.n_features = booster.num_features()
+
+    def predict_proba(self, X):
+        # binary:logistic -> probabilities; NaN is XGBoost's missing value, as in the pipeline
+        return self.booster.inplace_predict(X, validate_features=False).astype(np.float64)
+
+    def save(self, path):
+        self.booster.save_model(path)
+
+    @classmethod
+    def load(cls, path, n_threads=None):
+        if xgb is None:
+            raise ImportError("xgboost is required to load " + path)
+        booster = xgb.Booster()
+        booster.load_model(path)
+        return cls(booster, n_threads=n_threads)
+
+BACKENDS = {SklearnBackend.name: SklearnBackend, XGBoostBackend.name: XGBoostBackend}
+
+def make_classifier(backend, scale_pos_weight=1.0, n_jobs=-1, **params):
+    """
+    Unfitted estimator for a training run.
+
+    Args:
+        backend (str): "xgboost" or "sklearn" (RandomForest baseline).
+        scale_pos_weight (float): Negatives / positives in the training set
+            (XGBoost only).
+        n_jobs (int): Training threads.
+        **params: Overrides of the backend's default hyperparameters.
+    """
+    if backend == XGBoostBackend.name:
+        if xgb is None:
+            raise ImportError("xgboost is not installed; train with backend='sklearn'")
+        return xgb.XGBClassifier(**{**XGB_PARAMS, **params}, scale_pos_weight=scale_pos_weight, n_jobs=n_jobs)
+    if backend == SklearnBackend.name:
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(**{"n_estimators": 100, "max_depth": 6, "random_state": 42, **params}, n_jobs=n_jobs)
+    raise ValueError(f"Unknown model backend: {backend}")
+
+def wrap_fitted(model):
+    """
+    Backend object for a fitted estimator from `make_classifier`.
+    """
+    if xgb is not None and isinstance(model, xgb.XGBModel):
+        return XGBoostBackend(model.get_booster())
+    return SklearnBackend(model)
+
+def save_model(model, meta_path=MODEL_META_PATH, model_path=None, feature_names=None, extra=None):
+    """
+    Writes the model in its backend's native format plus a metadata JSON
+    naming the backend, so `load_model` needs no guessing.
+
+    Args:
+        model: Fitted estimator or backend object.
+        model_path (str): Defaults to model.ubj (XGBoost) or model.pkl.
+        feature_names (list): Column order the model was trained on.
+        extra (dict): Merged into the metadata (e.g. training parameters).
+    Returns:
+        dict: The metadata written.
+    """
+    params = _json_params(model)
+    backend = model if isinstance(model, tuple(BACKENDS.values())) else wrap_fitted(model)
+    if model_path is None:
+        model_path = XGB_MODEL_PATH if backend.name == XGBoostBackend.name else SKLEARN_MODEL_PATH
+    backend.save(model_path)
+
+    meta = {
+        "backend": backend.name,
+        # Relative to the metadata file, so the artifacts can be moved together
+        "model_path": os.path.relpath(model_path, os.path.dirname(os.path.abspath(meta_path))),
+        "n_features": int(backend.n_features),
+        "feature_names": list(feature_names) if feature_names is not None else None,
+        "params": params
+    }
+    meta.update(extra or {})
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+    logger.info(f"Model saved to {model_path} ({backend.name}), metadata in {meta_path}")
+    return meta
+
+def _json_params(model):
+    # Set hyperparameters only (unset XGBoost params are None, `missing` is NaN)
+    if not hasattr(model, "get_params"):
+        return {}
+    return {k: v for k, v in model.get_params().items()
+            if isinstance(v, (str, int, float, bool)) and v == v}
+
+def load_model(meta_path=MODEL_META_PATH, default_path=SKLEARN_MODEL_PATH, n_threads=None):
+    """
+    Loads the backend named in `meta_path`. Without metadata (artifacts from
+    older runs) a pickled sklearn model at `default_path` is assumed.
+
+    Returns:
+        SklearnBackend | XGBoostBackend | None: None if no model artifact exists.
+    """
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        path = os.path.join(os.path.dirname(os.path.abspath(meta_path)), meta["model_path"])
+        backend_cls = BACKENDS.get(meta["backend"])
+        if backend_cls is None:
+            raise ValueError(f"Unknown model backend in {meta_path}: {meta['backend']}")
+        if backend_cls is XGBoostBackend:
+            return XGBoostBackend.load(path, n_threads=n_threads)
+        return backend_cls.load(path)
+
+    if os.path.exists(default_path):
+        return SklearnBackend.load(default_path)
+    return None
@@ -0,0 +1,294 @@
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_DIR = "artifacts"
+CURRENT_NAME = "CURRENT"
+MANIFEST_NAME = "manifest.json"
+
+# Everything an engine reads, relative to an artifact directory (missing ones are skipped)
+ARTIFACT_FILES = ("model_meta.json", "model.ubj", "model.pkl", "pipeline.pkl", "encoders.pkl",
+                  "forest.npz", "validation_preds", "validation_preds.csv")
+
+# Registry layout:
+#
+#     artifacts/
+#         CURRENT                  name of the active version
+#         20240601-120000/         one immutable directory per version
+#             manifest.json        files, sizes and sha1s
+#             model_meta.json, model.ubj, pipeline.pkl, validation_preds/ ...
+#
+# Versions are published under a temporary name and renamed into place, and
+# CURRENT is replaced atomically, so readers never see a half-written version.
+
+def _sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(name for name in os.listdir(registry_dir)
+                  if os.path.exists(os.path.join(registry_dir, name, MANIFEST_NAME)))
+
+def current_version(registry_dir=REGISTRY_DIR):
+    """
+    Active version name, or None if the registry is empty or missing.
+    """
+    try:
+        with open(os.path.join(registry_dir, CURRENT_NAME)) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    return version or None
+
+def version_dir(version, registry_dir=REGISTRY_DIR):
+    path = os.path.join(registry_dir, version)
+    if not os.path.exists(os.path.join(path, MANIFEST_NAME)):
+        raise ValueError(f"Unknown artifact version: {version}")
+    return path
+
+def activate(version, registry_dir=REGISTRY_DIR):
+    """
+    Points CURRENT at `version` (publishing a new one or rolling back).
+    """
+    version_dir(version, registry_dir)
+    _write_atomic(os.path.join(registry_dir, CURRENT_NAME), version + "\n")
+    logger.info(f"Activated artifact version {version}")
+
+def publish(source_dir=".", registry_dir=REGISTRY_DIR, version=None, make_current=True):
+    """
+    Copies the artifacts found in `source_dir` into a new version directory.
+
+    Args:
+        source_dir (str): Where training wrote its outputs.
+        version (str): Version name; defaults to a UTC timestamp.
+        make_current (bool): Also activate it (serving workers pick it up).
+    Returns:
+        str: The version name.
+    """
+    names = [name for name in ARTIFACT_FILES if os.path.exists(os.path.join(source_dir, name))]
+    if not any(name in names for name in ("model_meta.json", "model.pkl")):
+        raise ValueError(f"No model artifacts in {source_dir}")
+
+    os.makedirs(registry_dir, exist_ok=True)
+    version = version or time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    final_dir = os.path.join(registry_dir, version)
+    if os.path.exists(final_dir):
+        raise ValueError(f"Artifact version {version} already exists")
+
+    tmp_dir = os.path.join(registry_dir, f".tmp-{version}-{os.getpid()}")
+    os.makedirs(tmp_dir)
+    files = {}
+    for name in names:
+        src = os.path.join(source_dir, name)
+        if os.path.isdir(src):
+            shutil.copytree(src, os.path.join(tmp_dir, name))
+            for sub in sorted(os.listdir(src)):
+                path = os.path.join(src, sub)
+                files[f"{name}/{sub}"] = {"bytes": os.path.getsize(path), "sha1": _sha1(path)}
+        else:
+            shutil.copy2(src, os.path.join(tmp_dir, name))
+            files[name] = {"bytes": os.path.getsize(src), "sha1": _sha1(src)}
+
+    if "validation_preds.csv" in names and "validation_preds" not in names:
+        # Served versions are read-only: convert legacy predictions now, not in the workers
+        from prediction_store import convert_csv
+        out_dir = os.path.join(tmp_dir, "validation_preds")
+        convert_csv(os.path.join(source_dir, "validation_preds.csv"), out_dir)
+        for sub in sorted(os.listdir(out_dir)):
+            path = os.path.join(out_dir, sub)
+            files[f"validation_preds/{sub}"] = {"bytes": os.path.getsize(path), "sha1": _sha1(path)}
+
+    manifest = {"version": version, "published_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "files": files}
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(tmp_dir, final_dir)
+    logger.info(f"Published artifact version {version} ({len(files)} files)")
+
+    if make_current:
+        activate(version, registry_dir)
+    return version
+
+class ArtifactReloader:
+    """
+    Loads a registry version next to the one being served and swaps it in.
+
+    Each target is (resource, factory, warm): `factory(artifact_dir)` builds
+    the new engine, `warm(engine)` runs a test batch through it, and only
+    then is the resource's value replaced (`LazyResource.swap`). Requests
+    that already hold the old engine finish on it; it is released once the
+    last of them returns ("drained"). If any target fails to build or warm,
+    nothing is swapped and the current version keeps serving.
+
+    With no registry (no CURRENT file) the working directory is served, as
+    before versioned artifacts existed.
+    """
+    def __init__(self, targets, registry_dir=REGISTRY_DIR, poll_seconds=0.0):
+        self.targets = targets
+        self.registry_dir = registry_dir
+        self.poll_seconds = poll_seconds
+        self.active_version = current_version(registry_dir)
+        self.loading_version = None
+        self.failed_version = None
+        self.last_error = None
+        self.last_reload_seconds = None
+        self.draining = set()
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def active_dir(self):
+        """
+        Directory the engines should read (used by the initial factories too).
+        """
+        if self.active_version is None:
+            return "."
+        return os.path.join(self.registry_dir, self.active_version)
+
+    def reload(self, version=None):
+        """
+        Builds, warms and swaps in `version` (default: the registry's CURRENT).
+        An explicit version is also made CURRENT once it has loaded, so other
+        workers follow. Blocks until done; one reload runs at a time.
+
+        Returns:
+            bool: True if a new version was swapped in.
+        """
+        with self._lock:
+            target_version = version or current_version(self.registry_dir)
+            if target_version is None:
+                raise ValueError(f"No artifact versions in {self.registry_dir}")
+            if target_version == self.active_version:
+                return False
+            artifact_dir = version_dir(target_version, self.registry_dir)
+
+            self.loading_version = target_version
+            start = time.perf_counter()
+            try:
+                built = []
+                for resource, factory, warm in self.targets:
+                    engine = factory(artifact_dir)
+                    if warm is not None:
+                        warm(engine)
+                    built.append((resource, engine))
+            except Exception as e:
+                logger.error(f"Reload of {target_version} failed, still serving {self.active_version}: {e}")
+                self.failed_version = target_version
+                self.last_error = str(e)
+                raise
+            finally:
+                self.loading_version = None
+
+            # Everything is built and warm: swap references in one go
+            previous = self.active_version
+            for resource, engine in built:
+                old = resource.swap(engine)
+                if old is not None:
+                    self._track_drain(old, f"{resource.name}@{previous or 'unversioned'}")
+            self.active_version = target_version
+            self.failed_version = None
+            self.last_error = None
+            self.last_reload_seconds = time.perf_counter() - start
+            if version is not None and current_version(self.registry_dir) != version:
+                activate(version, self.registry_dir)
+            logger.info(f"Swapped to artifact version {target_version} in {self.last_reload_seconds:.2f}s")
+            return True
+
+    def _track_drain(self, old, label):
+        self.draining.add(label)
+        weakref.finalize(old, self._drained, label)
+
+    def _drained(self, label):
+        self.draining.discard(label)
+        logger.info(f"{label} drained")
+
+    def reload_async(self, version=None):
+        """
+        Starts `reload` in a background thread. Returns False if one is already
+        running; raises ValueError for an unknown version.
+        """
+        if version is not None:
+            version_dir(version, self.registry_dir) # Unknown versions fail here, not in the thread
+        if self._lock.locked():
+            return False
+        def run():
+            try:
+                self.reload(version)
+            except Exception:
+                pass # Recorded in status()
+        threading.Thread(target=run, name="artifact-reload", daemon=True).start()
+        return True
+
+    def start_watching(self):
+        """
+        Polls the registry's CURRENT file every `poll_seconds` and reloads
+        when it names a new version (e.g. after `publish`).
+        """
+        if self.poll_seconds <= 0 or self._watcher is not None:
+            return
+        def watch():
+            while True:
+                time.sleep(self.poll_seconds)
+                version = current_version(self.registry_dir)
+                if version is None or version in (self.active_version, self.failed_version):
+                    continue
+                try:
+                    self.reload(version=None)
+                except Exception:
+                    pass # Recorded in status(); retried only when CURRENT changes again
+        self._watcher = threading.Thread(target=watch, name="artifact-watcher", daemon=True)
+        self._watcher.start()
+
+    def status(self):
+        return {
+            "registry_dir": self.registry_dir,
+            "current": current_version(self.registry_dir),
+            "active": self.active_version,
+            "loading": self.loading_version,
+            "failed": self.failed_version,
+            "error": self.last_error,
+            "last_reload_seconds": self.last_reload_seconds,
+            "draining": sorted(self.draining),
+            "versions": list_versions(self.registry_dir)
+        }
+
+if __name__ == "__main__":
+    import argparse
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Versioned model artifact registry")
+    parser.add_argument("--registry", default=os.environ.get("MODEL_REGISTRY_DIR", REGISTRY_DIR))
+    sub = parser.add_subparsers(dest="command", required=True)
+    pub = sub.add_parser("publish", help="Copy training outputs into a new version and activate it")
+    pub.add_argument("--source", default=".")
+    pub.add_argument("--version", default=None)
+    pub.add_argument("--no-activate", action="store_true")
+    act = sub.add_parser("activate", help="Point CURRENT at an existing version (rollback)")
+    act.add_argument("version")
+    sub.add_parser("list", help="List versions")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        print(publish(args.source, args.registry, version=args.version, make_current=not args.no_activate))
+    elif args.command == "activate":
+        activate(args.version, args.registry)
+    else:
+        active = current_version(args.registry)
+        for v in list_versions(args.registry):
+            print(("* " if v == active else "  ") + v)
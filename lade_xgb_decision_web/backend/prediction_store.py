@@ -0,0 +1,119 @@
+
+import json
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PREDICTIONS_DIR = "validation_preds"
+LEGACY_CSV_PATH = "validation_preds.csv"
+META_NAME = "meta.json"
+
+# On-disk dtype of each fixed column; segment columns store int32 codes
+LABEL_DTYPE = np.uint8
+PROB_DTYPE = np.float32
+SEGMENT_DTYPE = np.int32
+
+class PredictionStore:
+    """
+    Validation predictions as raw little-endian column files:
+
+        validation_preds/
+            meta.json        rows, column dtypes, segment labels
+            y_true.bin       uint8 labels
+            y_prob.bin       float32 probabilities
+            seg_<name>.bin   int32 codes into meta["segments"][name]
+
+    `load` maps the columns with np.memmap, so opening is constant time and
+    only the pages a query touches are read.
+    """
+    def __init__(self, y_true, y_prob, segments=None):
+        self.y_true = y_true
+        self.y_prob = y_prob
+        # name -> (codes, labels)
+        self.segments = segments or {}
+        self.n = len(y_prob)
+
+    @classmethod
+    def from_arrays(cls, y_true, y_prob, segments=None):
+        """
+        Args:
+            y_true (array-like): 0/1 labels.
+            y_prob (array-like): Predicted probabilities.
+            segments (dict): Optional name -> per-row labels (e.g. weather),
+                factorized into codes plus a label list.
+        """
+        encoded = {}
+        for name, values in (segments or {}).items():
+            labels, codes = np.unique(np.asarray(values).astype(str), return_inverse=True)
+            encoded[name] = (codes.astype(SEGMENT_DTYPE), [str(l) for l in labels])
+        return cls(
+            np.asarray(y_true).astype(LABEL_DTYPE),
+            np.asarray(y_prob).astype(PROB_DTYPE),
+            encoded
+        )
+
+    @classmethod
+    def from_csv(cls, path=LEGACY_CSV_PATH):
+        """
+        Importer for older artifacts: y_true/y_prob columns plus any other
+        column as a segment.
+        """
+        import pandas as pd
+        df = pd.read_csv(path)
+        segments = {c: df[c].to_numpy() for c in df.columns if c not in ("y_true", "y_prob")}
+        return cls.from_arrays(df['y_true'].to_numpy(), df['y_prob'].to_numpy(), segments)
+
+    def save(self, path=PREDICTIONS_DIR):
+        os.makedirs(path, exist_ok=True)
+        columns = {"y_true": self.y_true, "y_prob": self.y_prob}
+        for name, (codes, _) in self.segments.items():
+            columns["seg_" + name] = codes
+
+        for name, arr in columns.items():
+            np.ascontiguousarray(arr).tofile(os.path.join(path, name + ".bin"))
+
+        meta = {
+            "rows": int(self.n),
+            "columns": {name: np.dtype(arr.dtype).str for name, arr in columns.items()},
+            "segments": {name: labels for name, (_, labels) in self.segments.items()}
+        }
+        # Written last, atomically: a directory without meta.json is incomplete
+        tmp_path = os.path.join(path, META_NAME + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(path, META_NAME))
+        logger.info(f"Saved {self.n:,} predictions to {path} (segments: {list(self.segments)})")
+
+    @classmethod
+    def load(cls, path=PREDICTIONS_DIR):
+        with open(os.path.join(path, META_NAME)) as f:
+            meta = json.load(f)
+        n = meta["rows"]
+
+        def column(name):
+            if n == 0:
+                return np.zeros(0, dtype=meta["columns"][name])
+            # Plain ndarray view over the map (np.memmap results carry subclass overhead)
+            return np.asarray(np.memmap(os.path.join(path, name + ".bin"), dtype=meta["columns"][name], mode="r", shape=(n,)))
+
+        segments = {name: (column("seg_" + name), labels) for name, labels in meta["segments"].items()}
+        return cls(column("y_true"), column("y_prob"), segments)
+
+    @staticmethod
+    def exists(path=PREDICTIONS_DIR):
+        return os.path.exists(os.path.join(path, META_NAME))
+
+def convert_csv(csv_path=LEGACY_CSV_PATH, out_path=PREDICTIONS_DIR):
+    """
+    One-off conversion of a legacy validation_preds.csv.
+    """
+    store = PredictionStore.from_csv(csv_path)
+    store.save(out_path)
+    return store
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    convert_csv(*sys.argv[1:3])
@@ -0,0 +1,123 @@
+import argparse
+import json
+import logging
+import time
+import numpy as np
+import pandas as pd
+from data_loader import iter_raw_batches
+
+# Replays GPS trajectories as a stand-in for the live courier feed.
+#
+# Points are read from a raw source (a local .parquet/.csv with the LaDe
+# columns, or the HuggingFace stream), ordered by gps_time within each read
+# window and sent in messages of --message-points. By default they go
+# straight into an in-process StreamScorer to measure ingest throughput;
+# with --url they are sent to a running server's /ws/gps endpoint.
+# --speed N paces the replay at N x real time (0 = as fast as possible).
+
+def synthetic_trajectories(n_couriers=2000, n_points=1_000_000, seed=0):
+    """
+    Random-walk routes for a day of concurrent couriers, in time order.
+    """
+    rng = np.random.default_rng(seed)
+    courier = rng.integers(0, n_couriers, n_points)
+    gps_time = np.sort(rng.uniform(1_600_000_000 + 8 * 3600, 1_600_000_000 + 20 * 3600, n_points))
+    # Each courier drifts from its own start point, ~50 m per fix
+    base_lat = rng.uniform(30.0, 31.0, n_couriers)
+    base_lng = rng.uniform(120.0, 121.0, n_couriers)
+    order = np.argsort(courier, kind="stable") # by courier, then time
+    steps = rng.normal(0, 0.0005, (n_points, 2))
+    walk = steps.cumsum(axis=0)
+    # Restart the cumulative sum at each courier's first point
+    first = np.flatnonzero(np.r_[True, np.diff(courier[order]) != 0])
+    walk -= np.repeat(walk[first] - steps[first], np.diff(np.r_[first, n_points]), axis=0)
+    lat = np.empty(n_points)
+    lng = np.empty(n_points)
+    lat[order] = base_lat[courier[order]] + walk[:, 0]
+    lng[order] = base_lng[courier[order]] + walk[:, 1]
+    yield pd.DataFrame({"postman_id": courier, "gps_time": gps_time, "lat": lat, "lng": lng})
+
+def iter_messages(batches, message_points):
+    for batch in batches:
+        batch = batch.sort_values("gps_time", kind="stable")
+        gps_time = batch["gps_time"].to_numpy()
+        if gps_time.dtype.kind not in "iuf":
+            # Feed contract is epoch seconds
+            gps_time = pd.to_datetime(gps_time).to_numpy().astype("datetime64[s]").astype(np.int64)
+        columns = {
+            "postman_id": batch["postman_id"].to_numpy(),
+            "gps_time": gps_time.astype(np.float64),
+            "lat": batch["lat"].to_numpy(dtype=np.float64),
+            "lng": batch["lng"].to_numpy(dtype=np.float64)
+        }
+        for i in range(0, len(batch), message_points):
+            yield {k: v[i:i + message_points] for k, v in columns.items()}
+
+def replay(messages, send, speed=0.0):
+    """
+    Feeds `messages` to `send`, optionally paced by their gps_time.
+    Returns (points, seconds, per-message latencies in ms).
+    """
+    points, latencies = 0, []
+    start = time.perf_counter()
+    feed_start = None
+    for msg in messages:
+        if speed > 0:
+            if feed_start is None:
+                feed_start = msg["gps_time"][0]
+            due = (msg["gps_time"][0] - feed_start) / speed
+            delay = due - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        t0 = time.perf_counter()
+        send(msg)
+        latencies.append((time.perf_counter() - t0) * 1e3)
+        points += len(msg["postman_id"])
+    return points, time.perf_counter() - start, latencies
+
+def websocket_sender(url):
+    # Optional dependency, only for replaying against a running server
+    from websockets.sync.client import connect
+    ws = connect(url)
+    def send(msg):
+        ws.send(json.dumps({k: v.tolist() for k, v in msg.items()}))
+        reply = json.loads(ws.recv())
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+    return send
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay GPS trajectories into the streaming scorer")
+    parser.add_argument("--source", default="synthetic",
+                        help="'synthetic', 'huggingface', or a local .parquet/.csv of raw points")
+    parser.add_argument("--max-points", type=int, default=1_000_000)
+    parser.add_argument("--window", type=int, default=200_000, help="Points read (and time-ordered) at a time")
+    parser.add_argument("--message-points", type=int, default=1000, help="Points per message")
+    parser.add_argument("--speed", type=float, default=0.0, help="Replay speed vs real time (0 = unpaced)")
+    parser.add_argument("--url", default=None, help="ws://host:port/ws/gps (default: in-process scorer)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.source == "synthetic":
+        batches = synthetic_trajectories(n_points=args.max_points)
+    else:
+        batches = iter_raw_batches(args.source, batch_size=args.window, max_points=args.max_points)
+    messages = iter_messages(batches, args.message_points)
+
+    scorer = None
+    if args.url:
+        send = websocket_sender(args.url)
+    else:
+        from inference import InferenceEngine
+        from streaming import StreamScorer
+        engine = InferenceEngine()
+        scorer = StreamScorer(lambda: engine)
+        send = scorer.ingest
+
+    points, seconds, latencies = replay(messages, send, speed=args.speed)
+    lat_ms = np.array(latencies)
+    print(f"replayed {points:,} points in {seconds:.2f}s: {points / seconds:,.0f} points/s")
+    print(f"per message ({args.message_points} points): p50 {np.percentile(lat_ms, 50):.2f} ms, "
+          f"p99 {np.percentile(lat_ms, 99):.2f} ms, max {lat_ms.max():.2f} ms")
+    if scorer is not None:
+        print(scorer.stats())
@@ -0,0 +1,103 @@
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class ResultCache:
+    """
+    Bounded LRU cache with a per-entry TTL for small, repeatable queries
+    (simulation impact, trade-off curves, dashboard stats).
+
+    Every lookup carries the `version` of the data it was computed from;
+    when that changes (new predictions or model) the whole cache is
+    dropped, so stale results are never served. Cached values are shared
+    between callers and must not be mutated.
+    """
+    def __init__(self, max_entries=1024, ttl_seconds=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.version = None
+        self._entries = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, key, compute, version=None):
+        """
+        Args:
+            key (hashable): Query parameters, e.g. ("simulate", threshold, cost_fn, cost_fp).
+            compute (callable): Builds the value on a miss.
+            version (str): Stamp of the underlying data; a new stamp clears the cache.
+        Returns:
+            The cached or freshly computed value.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.version = version
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Computed outside the lock; concurrent misses on one key may both compute
+        value = compute()
+
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = (now + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+def artifact_version(paths):
+    """
+    Version stamp from the size and modification time of each artifact
+    (files, or directories via their entries). Changes whenever any of
+    them is rewritten; missing paths count as absent.
+    """
+    h = hashlib.sha1()
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, name) for name in os.listdir(path))
+        else:
+            files = [path]
+        for f in files:
+            try:
+                st = os.stat(f)
+                h.update(f"{f}:{st.st_size}:{st.st_mtime_ns};".encode())
+            except OSError:
+                h.update(f"{f}:missing;".encode())
+    return h.hexdigest()[:16]
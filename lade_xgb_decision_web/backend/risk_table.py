@@ -0,0 +1,123 @@
+
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RiskLookupTable:
+    """
+    Dense probability table over the model's discrete feature space.
+
+    Apart from distance every feature is a small integer: hour (24), day of
+    week (7, which also fixes is_weekend) and the categorical codes (with -1
+    for unseen labels). The table stores the model's probability for every
+    combination of those against a uniform grid over `log_distance`, and
+    answers a row with one flat index computation plus linear interpolation
+    between the two nearest grid points.
+    """
+    def __init__(self, table, cat_sizes, grid_max, grid_points):
+        self.table = table
+        self.cat_sizes = list(cat_sizes)
+        self.grid_max = float(grid_max)
+        self.grid_points = int(grid_points)
+        self.step = self.grid_max / (self.grid_points - 1)
+        self.report = {}
+
+        # Row-major strides over (hour, dow, *cats, grid)
+        shape = [24, 7] + [n + 1 for n in self.cat_sizes] + [self.grid_points]
+        self.strides = np.cumprod([1] + shape[::-1][:-1])[::-1]
+
+    @classmethod
+    def build(cls, score_fn, pipeline, max_distance=100.0, grid_points=256):
+        """
+        Args:
+            score_fn (callable): float32 feature matrix -> probabilities (the exact model).
+            pipeline (FeaturePipeline): Fitted pipeline; fixes feature order and category counts.
+            max_distance (float): Distance (km) covered by the grid; longer routes are
+                left to the model (see `lookup`).
+            grid_points (int): Grid resolution over log_distance.
+        """
+        cat_cols = pipeline.feature_names[4:]
+        cat_sizes = [len(pipeline.categories[c]) for c in cat_cols]
+        grid_max = np.log1p(max_distance)
+
+        # Every discrete combination x every grid point, in table order
+        axes = [np.arange(24), np.arange(7)] + [np.arange(-1, n) for n in cat_sizes] + [np.linspace(0, grid_max, grid_points)]
+        mesh = np.meshgrid(*axes, indexing='ij')
+        X = np.empty((mesh[0].size, len(pipeline.feature_names)), dtype=np.float32)
+        X[:, 0] = mesh[0].ravel()
+        X[:, 1] = mesh[1].ravel()
+        X[:, 2] = X[:, 1] >= 5
+        X[:, 3] = mesh[-1].ravel()
+        for j in range(len(cat_cols)):
+            X[:, 4 + j] = mesh[2 + j].ravel()
+
+        table = np.asarray(score_fn(X), dtype=np.float64)
+        logger.info(f"Risk lookup table built: {len(table):,} cells ({grid_points} distance points).")
+        return cls(table, cat_sizes, grid_max, grid_points)
+
+    def lookup(self, X):
+        """
+        Args:
+            X (np.ndarray): float32 feature matrix from FeaturePipeline.transform.
+        Returns:
+            tuple: (probs, missing) where `missing` flags rows the table can't
+            answer, e.g. NaN features or distances past the grid (their probs are NaN).
+        """
+        # NaN features, codes outside the table's axes or distances outside
+        # the grid can't be answered; clamping would give long routes the
+        # probability at max_distance
+        missing = np.isnan(X).any(axis=1)
+        missing |= ~((X[:, 3] >= 0) & (X[:, 3] <= self.grid_max))
+        missing |= ~((X[:, 0] >= 0) & (X[:, 0] < 24) & (X[:, 1] >= 0) & (X[:, 1] < 7))
+        for j, n in enumerate(self.cat_sizes):
+            missing |= ~((X[:, 4 + j] >= -1) & (X[:, 4 + j] < n))
+        Xi = np.where(missing[:, None], 0, X)
+
+        base = Xi[:, 0].astype(np.int64) * self.strides[0] + Xi[:, 1].astype(np.int64) * self.strides[1]
+        for j in range(len(self.cat_sizes)):
+            # Codes start at -1 (unseen), table axes at 0
+            base += (Xi[:, 4 + j].astype(np.int64) + 1) * self.strides[2 + j]
+
+        pos = np.clip(Xi[:, 3].astype(np.float64) / self.step, 0, self.grid_points - 1)
+        i = np.minimum(pos.astype(np.int64), self.grid_points - 2)
+        frac = pos - i
+
+        probs = self.table[base + i] * (1 - frac) + self.table[base + i + 1] * frac
+        probs[missing] = np.nan
+        return probs, missing
+
+    def sample_inputs(self, n_rows, seed=0):
+        """
+        Random feature rows spread uniformly over the table's domain
+        (distance uniform in km up to the grid's maximum).
+        """
+        rng = np.random.default_rng(seed)
+        X = np.empty((n_rows, 4 + len(self.cat_sizes)), dtype=np.float32)
+        X[:, 0] = rng.integers(0, 24, n_rows)
+        X[:, 1] = rng.integers(0, 7, n_rows)
+        X[:, 2] = X[:, 1] >= 5
+        X[:, 3] = np.log1p(rng.uniform(0, np.expm1(self.grid_max), n_rows))
+        for j, n in enumerate(self.cat_sizes):
+            X[:, 4 + j] = rng.integers(-1, n, n_rows)
+        return X
+
+    def accuracy_report(self, score_fn, n_rows=20_000, t1=0.3, t2=0.7):
+        """
+        Compares table answers to the exact model on random inputs.
+        Also reports how often both agree on the decision policy's risk bucket.
+        """
+        X = self.sample_inputs(n_rows)
+        approx, _ = self.lookup(X)
+        exact = np.asarray(score_fn(X), dtype=np.float64)
+        err = np.abs(approx - exact)
+        self.report = {
+            "rows": int(n_rows),
+            "grid_points": self.grid_points,
+            "max_abs_error": float(err.max()),
+            "mean_abs_error": float(err.mean()),
+            "p99_abs_error": float(np.quantile(err, 0.99)),
+            "bucket_agreement": float(np.mean(np.digitize(approx, [t1, t2]) == np.digitize(exact, [t1, t2])))
+        }
+        logger.info(f"Risk lookup table accuracy vs model: {self.report}")
+        return self.report
@@ -0,0 +1,153 @@
+
+import json
+import logging
+import os
+import numpy as np
+from tree_scorer import CompiledForest
+from cost_evaluation import ThresholdIndex
+from risk_table import RiskLookupTable
+
+logger = logging.getLogger(__name__)
+
+# Workers find the shared artifacts through this environment variable
+SHARED_DIR_ENV = "SHARED_ARTIFACTS_DIR"
+SHARED_DIR = "data_cache/shared"
+META_NAME = "meta.json"
+SAMPLE_NAME = "data_sample.parquet"
+
+# Everything the engines read per request, stored as plain .npy files.
+# np.load(mmap_mode='r') maps them read-only, so all workers share the
+# same page-cache pages instead of holding a private copy each.
+FOREST_ARRAYS = CompiledForest.ARRAYS + ("children",)
+VALIDATION_ARRAYS = ("y_true", "y_prob", "sorted_prob", "cum_pos")
+
+def _save_array(shared_dir, name, arr):
+    np.save(os.path.join(shared_dir, name + ".npy"), np.ascontiguousarray(arr))
+
+def _attach_array(shared_dir, name):
+    # Plain ndarray view over the map (np.memmap results carry subclass overhead)
+    return np.asarray(np.load(os.path.join(shared_dir, name + ".npy"), mmap_mode="r"))
+
+def load_meta(shared_dir):
+    with open(os.path.join(shared_dir, META_NAME)) as f:
+        return json.load(f)
+
+def export_shared_artifacts(shared_dir=SHARED_DIR, model_engine=None, simulation_engine=None, data_sample=None):
+    """
+    Writes the engines' arrays once so every worker can attach to them.
+
+    Args:
+        shared_dir (str): Output directory (created if needed).
+        model_engine (InferenceEngine): Loaded engine; its compiled forest
+            (and lookup table, if built) are exported.
+        simulation_engine (SimulationEngine): Loaded engine; its validation
+            arrays and threshold index are exported.
+        data_sample (pd.DataFrame): Small display sample for /api/data/sample.
+    Returns:
+        dict: The metadata written next to the arrays.
+    """
+    os.makedirs(shared_dir, exist_ok=True)
+    meta = {"forest": None, "lookup_table": None, "validation": None, "data_sample": False}
+
+    forest = getattr(model_engine, "forest", None)
+    if forest is not None:
+        for name in FOREST_ARRAYS:
+            _save_array(shared_dir, "forest_" + name, getattr(forest, name))
+        meta["forest"] = {"max_depth": forest.max_depth, "nodes": int(len(forest.value))}
+
+    table = getattr(model_engine, "lookup_table", None)
+    if table is not None:
+        _save_array(shared_dir, "lookup_table", table.table)
+        meta["lookup_table"] = {
+            "cat_sizes": table.cat_sizes,
+            "grid_max": table.grid_max,
+            "grid_points": table.grid_points,
+            "report": table.report
+        }
+
+    if simulation_engine is not None:
+        simulation_engine.load_data()
+        index = simulation_engine.index
+        _save_array(shared_dir, "y_true", simulation_engine.y_true)
+        _save_array(shared_dir, "y_prob", simulation_engine.y_prob)
+        _save_array(shared_dir, "sorted_prob", index.sorted_prob)
+        _save_array(shared_dir, "cum_pos", index.cum_pos)
+        for name, (codes, _) in simulation_engine.segments.items():
+            _save_array(shared_dir, "seg_" + name, codes)
+        meta["validation"] = {
+            "rows": index.n,
+            "segments": {name: labels for name, (_, labels) in simulation_engine.segments.items()}
+        }
+
+    if data_sample is not None and not data_sample.empty:
+        data_sample.to_parquet(os.path.join(shared_dir, SAMPLE_NAME), index=False)
+        meta["data_sample"] = True
+
+    # Written last: workers treat a directory without meta.json as not ready
+    tmp_path = os.path.join(shared_dir, META_NAME + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(shared_dir, META_NAME))
+    logger.info(f"Shared artifacts written to {shared_dir}: {meta}")
+    return meta
+
+def attach_forest(shared_dir):
+    """
+    CompiledForest backed by read-only memory maps, or None if none was exported.
+    """
+    meta = load_meta(shared_dir)
+    if meta["forest"] is None:
+        return None
+    arrays = {name: _attach_array(shared_dir, "forest_" + name) for name in FOREST_ARRAYS}
+    return CompiledForest(max_depth=meta["forest"]["max_depth"], **arrays)
+
+def attach_lookup_table(shared_dir):
+    meta = load_meta(shared_dir)
+    info = meta["lookup_table"]
+    if info is None:
+        return None
+    table = RiskLookupTable(_attach_array(shared_dir, "lookup_table"), info["cat_sizes"], info["grid_max"], info["grid_points"])
+    table.report = info["report"]
+    return table
+
+def attach_validation(shared_dir):
+    """
+    Returns:
+        tuple: (y_true, y_prob, ThresholdIndex, segments) over read-only
+        memory maps, or None if no validation data was exported.
+    """
+    meta = load_meta(shared_dir)
+    if meta["validation"] is None:
+        return None
+    arrays = {name: _attach_array(shared_dir, name) for name in VALIDATION_ARRAYS}
+    index = ThresholdIndex.from_sorted(arrays["sorted_prob"], arrays["cum_pos"])
+    segments = {
+        name: (_attach_array(shared_dir, "seg_" + name), labels)
+        for name, labels in meta["validation"].get("segments", {}).items()
+    }
+    return arrays["y_true"], arrays["y_prob"], index, segments
+
+def attach_data_sample(shared_dir):
+    import pandas as pd
+    meta = load_meta(shared_dir)
+    if not meta["data_sample"]:
+        return None
+    return pd.read_parquet(os.path.join(shared_dir, SAMPLE_NAME))
+
+def prepare_shared_artifacts(shared_dir=SHARED_DIR, model_engine=None, simulation_engine=None, data_sample=None):
+    """
+    Parent-process step for multi-worker serving: loads each engine once
+    (unless given), exports its arrays and releases the parent's copies.
+    Returns the absolute shared directory to hand to the workers.
+    """
+    from inference import InferenceEngine
+    from what_if import SimulationEngine
+    if model_engine is None:
+        model_engine = InferenceEngine(
+            use_lookup_table=os.environ.get("PREDICT_LOOKUP_TABLE", "0") == "1",
+            lookup_grid_points=int(os.environ.get("PREDICT_LOOKUP_GRID_POINTS", 256))
+        )
+    if simulation_engine is None:
+        simulation_engine = SimulationEngine()
+    export_shared_artifacts(shared_dir, model_engine, simulation_engine, data_sample)
+    return os.path.abspath(shared_dir)
@@ -0,0 +1,198 @@
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Side of a grid cell in degrees (~1.1 km north-south). Cell ids are written
+# into the order cache, so changing this needs a rebuild (ORDER_SCHEMA_VERSION).
+GRID_DEG = 0.01
+
+# Grid layout:
+#
+#     row  = floor((lat + 90) / GRID_DEG)
+#     col  = floor((lng + 180) / GRID_DEG)
+#     cell = row * n_cols + col            (-1 = no valid coordinate)
+#
+# Ids are row-major, so sorting cells sorts them by latitude band first and a
+# bounding box becomes one contiguous range of rows plus a column test.
+# Coarser views merge resolution x resolution blocks of cells by integer
+# division of row and col, so one index serves every zoom level.
+
+def n_cols(cell_deg=GRID_DEG):
+    return int(round(360.0 / cell_deg))
+
+def grid_cell(lat, lng, cell_deg=GRID_DEG):
+    """
+    Grid cell id of each coordinate.
+
+    Args:
+        lat, lng (array-like): Degrees.
+    Returns:
+        np.ndarray: int64 cell ids, -1 where a coordinate is missing or out of range.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    valid = (np.abs(lat) <= 90) & (np.abs(lng) <= 180) # False for NaN too
+    rows = np.floor((np.where(valid, lat, 0) + 90) / cell_deg).astype(np.int64)
+    cols = np.floor((np.where(valid, lng, 0) + 180) / cell_deg).astype(np.int64)
+    # lat = 90 / lng = 180 fall on the edge; keep them in the last row/col
+    rows = np.minimum(rows, int(round(180.0 / cell_deg)) - 1)
+    cols = np.minimum(cols, n_cols(cell_deg) - 1)
+    return np.where(valid, rows * n_cols(cell_deg) + cols, -1)
+
+def cell_bounds(rows, cols, cell_deg=GRID_DEG):
+    """
+    (lat_min, lng_min, lat_max, lng_max) arrays of cells given by row/col.
+    """
+    # Rounded to drop float noise from the multiplication (1e-6 deg is ~0.1 m)
+    lat_min = np.round(rows * cell_deg - 90, 6)
+    lng_min = np.round(cols * cell_deg - 180, 6)
+    return lat_min, lng_min, np.round(lat_min + cell_deg, 6), np.round(lng_min + cell_deg, 6)
+
+def _label_cell(label):
+    # Segment labels are stringified cell ids; missing ones come out as "nan"
+    try:
+        value = float(label)
+    except (TypeError, ValueError):
+        return -1
+    return int(value) if np.isfinite(value) and value >= 0 else -1
+
+class RegionIndex:
+    """
+    Per-cell route totals (count, breaches, summed breach probability),
+    sorted by cell id.
+
+    Routes are reduced to cells once, with bincount, when the index is
+    built; a query then touches only the occupied cells inside its bounding
+    box, however many routes sit behind them.
+    """
+    def __init__(self, cells, count, breaches, sum_prob, cell_deg=GRID_DEG):
+        order = np.argsort(cells, kind="stable")
+        self.cells = np.asarray(cells, dtype=np.int64)[order]
+        self.count = np.asarray(count, dtype=np.int64)[order]
+        self.breaches = np.asarray(breaches, dtype=np.float64)[order]
+        self.sum_prob = np.asarray(sum_prob, dtype=np.float64)[order]
+        self.cell_deg = cell_deg
+        self.rows, self.cols = np.divmod(self.cells, n_cols(cell_deg))
+
+    @classmethod
+    def from_cells(cls, cells, y_true, y_prob, cell_deg=GRID_DEG):
+        """
+        Builds the index from per-route cell ids (-1 = no location, skipped).
+
+        Args:
+            cells (array-like): int64 cell id of each route.
+            y_true (array-like): 1 if the route breached its SLA.
+            y_prob (array-like): Predicted breach probability.
+        """
+        cells = np.asarray(cells, dtype=np.int64)
+        located = cells >= 0
+        uniques, inverse = np.unique(cells[located], return_inverse=True)
+        return cls._reduce(uniques, inverse, np.asarray(y_true)[located], np.asarray(y_prob)[located], cell_deg)
+
+    @classmethod
+    def from_segment(cls, codes, labels, y_true, y_prob, cell_deg=GRID_DEG):
+        """
+        Builds the index from a cell segment of the validation predictions:
+        per-row int codes into `labels` (cell ids as strings, see PredictionStore).
+        Labels that are not a cell id ("nan", "", "-1") count as no location.
+        """
+        cells = np.array([_label_cell(label) for label in labels], dtype=np.int64)
+        index = cls._reduce(cells, codes, y_true, y_prob, cell_deg)
+        located = index.cells >= 0
+        if not located.all():
+            index = cls(index.cells[located], index.count[located], index.breaches[located],
+                        index.sum_prob[located], cell_deg)
+        return index
+
+    @classmethod
+    def _reduce(cls, cells, codes, y_true, y_prob, cell_deg):
+        n = len(cells)
+        count = np.bincount(codes, minlength=n)
+        breaches = np.bincount(codes, weights=np.asarray(y_true, dtype=np.float64), minlength=n)
+        sum_prob = np.bincount(codes, weights=np.asarray(y_prob, dtype=np.float64), minlength=n)
+        return cls(cells, count, breaches, sum_prob, cell_deg)
+
+    @property
+    def n_routes(self):
+        return int(self.count.sum())
+
+    def query(self, bbox=None, resolution=1, cost_fn=1.0, min_count=1, top=None):
+        """
+        Risk per region inside a bounding box.
+
+        Args:
+            bbox (tuple, optional): (lat_min, lng_min, lat_max, lng_max); whole grid if None.
+            resolution (int): Merge resolution x resolution cells into one region.
+            cost_fn (float): Cost of a missed breach; exposure = sum of y_prob * cost_fn.
+            min_count (int): Skip regions with fewer routes.
+            top (int, optional): Keep only the regions with the highest exposure.
+        Returns:
+            dict: Columnar result, one entry per region, sorted by exposure
+            (descending), plus totals over the whole box.
+        """
+        resolution = max(int(resolution), 1)
+        if bbox is not None:
+            lat_min, lng_min, lat_max, lng_max = bbox
+            if lat_min > lat_max or lng_min > lng_max:
+                raise ValueError("Bounding box must be lat_min,lng_min,lat_max,lng_max with min <= max.")
+            (r0, c0), (r1, c1) = self._row_col(bbox)
+            # Rows are sorted: the box's latitude band is one slice
+            lo, hi = np.searchsorted(self.rows, [r0, r1 + 1])
+            cols = self.cols[lo:hi]
+            sel = np.flatnonzero((cols >= c0) & (cols <= c1)) + lo
+        else:
+            sel = np.arange(len(self.cells))
+
+        # Merge cells into regions; ids stay row-major on the coarser grid
+        rows = self.rows[sel] // resolution
+        cols = self.cols[sel] // resolution
+        region_cols = -(-n_cols(self.cell_deg) // resolution)
+        regions, inverse = np.unique(rows * region_cols + cols, return_inverse=True)
+        n = len(regions)
+        count = np.bincount(inverse, weights=self.count[sel], minlength=n)
+        breaches = np.bincount(inverse, weights=self.breaches[sel], minlength=n)
+        sum_prob = np.bincount(inverse, weights=self.sum_prob[sel], minlength=n)
+
+        totals = {
+            "count": int(count.sum()),
+            "breaches": float(breaches.sum()),
+            "expected_breaches": float(sum_prob.sum()),
+            "exposure": float(sum_prob.sum() * cost_fn)
+        }
+
+        keep = np.flatnonzero(count >= max(min_count, 1))
+        keep = keep[np.argsort(-sum_prob[keep], kind="stable")]
+        if top is not None:
+            keep = keep[:top]
+        region_rows, region_col = np.divmod(regions[keep], region_cols)
+        lat_min, lng_min, lat_max, lng_max = cell_bounds(region_rows, region_col, self.cell_deg * resolution)
+        count, breaches, sum_prob = count[keep], breaches[keep], sum_prob[keep]
+        return {
+            "cell_deg": self.cell_deg * resolution,
+            "regions": len(regions),
+            "totals": totals,
+            "region": regions[keep].tolist(),
+            "lat_min": lat_min.tolist(),
+            "lng_min": lng_min.tolist(),
+            "lat_max": lat_max.tolist(),
+            "lng_max": lng_max.tolist(),
+            "count": count.astype(np.int64).tolist(),
+            "breaches": breaches.tolist(),
+            "breach_rate": (breaches / count).tolist(),
+            "mean_risk": (sum_prob / count).tolist(),
+            "expected_breaches": sum_prob.tolist(),
+            "exposure": (sum_prob * cost_fn).tolist()
+        }
+
+    def _row_col(self, bbox):
+        # Box corners as grid row/col, clipped to the grid
+        lat_min, lng_min, lat_max, lng_max = bbox
+        lat = np.clip([lat_min, lat_max], -90, 90)
+        lng = np.clip([lng_min, lng_max], -180, 180)
+        rows, cols = np.divmod(grid_cell(lat, lng, self.cell_deg), n_cols(self.cell_deg))
+        return (rows[0], cols[0]), (rows[1], cols[1])
+
+    def stats(self):
+        return {"cells": len(self.cells), "routes": self.n_routes, "cell_deg": self.cell_deg}
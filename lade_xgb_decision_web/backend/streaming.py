@@ -0,0 +1,394 @@
+
+import asyncio
+import logging
+import threading
+import time
+import numpy as np
+import pandas as pd
+from data_loader import haversine_np, PROMISE_MIN_PER_KM, PROMISE_BASE_MIN
+from spatial import RegionIndex, grid_cell
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86_400
+POINT_FIELDS = ("postman_id", "gps_time", "lat", "lng")
+
+class CourierStateStore:
+    """
+    Running state of every courier's current route, one slot per courier in
+    parallel NumPy arrays (grown by doubling), so a batch of points updates
+    all affected couriers with array operations instead of per-point Python.
+
+    A route is a courier-day, as in `process_gps_to_orders`: the first point
+    on a new (UTC) day starts a new route.
+    """
+    FIELDS = {
+        "day": np.int64,            # route day (gps_time // 86400); -1 = no route yet
+        "start_time": np.float64,   # epoch seconds of the route's first point
+        "last_time": np.float64,
+        "last_lat": np.float64,
+        "last_lng": np.float64,
+        "distance_km": np.float64,  # cumulative haversine distance of the route
+        "points": np.int64,
+        "scored_log_distance": np.float64, # log1p(distance) at the last model call; NaN = not scored
+        "risk": np.float32          # last predicted breach probability; NaN = not scored
+    }
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.slot_of = {}
+        self.ids = np.empty(capacity, dtype=object)
+        for name, dtype in self.FIELDS.items():
+            setattr(self, name, np.empty(capacity, dtype=dtype))
+
+    def _grow(self, needed):
+        capacity = len(self.ids)
+        while capacity < needed:
+            capacity *= 2
+        for name in ("ids",) + tuple(self.FIELDS):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def slots(self, postman_ids, create=True):
+        """
+        Slot per id; unknown ids get a new empty slot (or -1 if not `create`).
+        """
+        out = np.fromiter((self.slot_of.get(pid, -1) for pid in postman_ids), dtype=np.int64, count=len(postman_ids))
+        missing = np.flatnonzero(out < 0)
+        if create and len(missing):
+            if self.size + len(missing) > len(self.ids):
+                self._grow(self.size + len(missing))
+            new = np.arange(self.size, self.size + len(missing))
+            for i, slot in zip(missing, new):
+                self.slot_of[postman_ids[i]] = int(slot)
+            self.ids[new] = [postman_ids[i] for i in missing]
+            self.day[new] = -1
+            self.last_time[new] = -np.inf
+            self.start_time[new] = np.nan
+            self.last_lat[new] = np.nan
+            self.last_lng[new] = np.nan
+            self.distance_km[new] = 0.0
+            self.points[new] = 0
+            self.scored_log_distance[new] = np.nan
+            self.risk[new] = np.nan
+            out[missing] = new
+            self.size += len(missing)
+        return out
+
+    def update(self, postman_id, gps_time, lat, lng):
+        """
+        Applies a batch of points (any order, any mix of couriers).
+
+        Points are sorted by (courier, time); each point's predecessor is the
+        previous point of the same courier in the batch, or the stored last
+        point for the courier's first point in the batch. Segment distances
+        are one `haversine_np` call, and per-courier totals are sums over the
+        run after each courier's last route start. Points older than a
+        courier's stored last point (late arrivals) are dropped.
+
+        Returns:
+            tuple: (slots updated, number of points dropped)
+        """
+        gps_time = np.asarray(gps_time, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        codes, uniques = pd.factorize(np.asarray(postman_id, dtype=object))
+        valid = (codes >= 0) & np.isfinite(gps_time) & np.isfinite(lat) & np.isfinite(lng)
+        if not valid.any():
+            # e.g. every postman_id null: no slot to index
+            return np.zeros(0, dtype=np.int64), len(valid)
+        slot = self.slots(list(uniques))[np.maximum(codes, 0)]
+        valid &= gps_time >= self.last_time[slot]
+        dropped = int(len(valid) - valid.sum())
+        if not valid.any():
+            return np.zeros(0, dtype=np.int64), dropped
+
+        order = np.lexsort((gps_time[valid], slot[valid]))
+        slot = slot[valid][order]
+        t = gps_time[valid][order]
+        lat = lat[valid][order]
+        lng = lng[valid][order]
+        day = (t // SECONDS_PER_DAY).astype(np.int64)
+
+        # Predecessor of every point: batch neighbour, or stored state at each courier's first point
+        first = np.r_[True, slot[1:] != slot[:-1]]
+        first_slot = slot[first]
+        prev_lat = np.r_[np.nan, lat[:-1]]
+        prev_lng = np.r_[np.nan, lng[:-1]]
+        prev_day = np.r_[-1, day[:-1]]
+        prev_lat[first] = self.last_lat[first_slot]
+        prev_lng[first] = self.last_lng[first_slot]
+        prev_day[first] = self.day[first_slot]
+
+        # A new day (or a courier's first point ever) starts a route; its segment doesn't count
+        restart = day != prev_day
+        seg = haversine_np(prev_lng, prev_lat, lng, lat)
+        seg[restart] = 0.0
+
+        # Runs: contiguous points of one courier within one route
+        run_start = first | restart
+        run = np.cumsum(run_start) - 1
+        run_dist = np.bincount(run, weights=seg)
+        run_points = np.bincount(run)
+        run_first = np.flatnonzero(run_start)
+
+        # Each courier's final state comes from its last run in the batch
+        last = np.r_[np.flatnonzero(first)[1:] - 1, len(slot) - 1]
+        s = slot[last]
+        r = run[last]
+        restarted = restart[run_first[r]]
+        self.distance_km[s] = np.where(restarted, 0.0, self.distance_km[s]) + run_dist[r]
+        self.points[s] = np.where(restarted, 0, self.points[s]) + run_points[r]
+        self.start_time[s] = np.where(restarted, t[run_first[r]], self.start_time[s])
+        self.day[s] = day[last]
+        self.last_time[s] = t[last]
+        self.last_lat[s] = lat[last]
+        self.last_lng[s] = lng[last]
+        # A new route has not been scored yet
+        self.scored_log_distance[s[restarted]] = np.nan
+        self.risk[s[restarted]] = np.nan
+        return s, dropped
+
+    def view(self, slots):
+        """
+        Columnar state for `slots`, with the SLA position of each route.
+        """
+        distance = self.distance_km[slots]
+        elapsed_min = (self.last_time[slots] - self.start_time[slots]) / 60.0
+        promise_min = distance * PROMISE_MIN_PER_KM + PROMISE_BASE_MIN
+        return {
+            "postman_id": self.ids[slots].tolist(),
+            "risk": [None if np.isnan(v) else float(v) for v in self.risk[slots]],
+            "distance_km": distance.tolist(),
+            "points": self.points[slots].tolist(),
+            "start_time": self.start_time[slots].tolist(),
+            "last_time": self.last_time[slots].tolist(),
+            "elapsed_min": elapsed_min.tolist(),
+            "promise_min": promise_min.tolist(),
+            "overdue": (elapsed_min > promise_min).tolist()
+        }
+
+class StreamScorer:
+    """
+    Online risk scoring of in-progress routes from live GPS points.
+
+    Every batch updates the courier state store; a courier's route is sent
+    to the model again only when its log-distance (the feature the model
+    sees) has moved by at least `min_log_change` since the last score, or
+    when a new route starts. Start time and so the time features are fixed
+    per route, and elapsed vs promised time is computed without the model.
+
+    Args:
+        engine_fn (callable): Returns the current InferenceEngine (e.g.
+            `model_engine.get`, so hot-reloaded models are picked up).
+        min_log_change (float): Re-score threshold on log1p(distance);
+            0.02 is roughly a 2% change in distance.
+        weather, vehicle_type: Values for features GPS points don't carry
+            (same placeholders as `process_gps_to_orders`).
+    """
+    def __init__(self, engine_fn, min_log_change=0.02, weather="Cloudy", vehicle_type="Motorcycle",
+                 queue_max_points=50_000, queue_max_pending_points=500_000):
+        self.engine_fn = engine_fn
+        self.min_log_change = min_log_change
+        self.weather = weather
+        self.vehicle_type = vehicle_type
+        self.store = CourierStateStore()
+        # Fire-and-forget entry point (HTTP); WebSocket clients call `ingest` directly
+        self.queue = GpsQueue(self, max_points=queue_max_points, max_pending_points=queue_max_pending_points)
+        self._lock = threading.Lock()
+        self.points = 0
+        self.dropped = 0
+        self.batches = 0
+        self.rescored = 0
+        self.busy_seconds = 0.0
+
+    def ingest(self, points):
+        """
+        Args:
+            points (dict): Columns postman_id, gps_time (epoch seconds), lat, lng.
+        Returns:
+            dict: Columnar state of the couriers that were re-scored by this batch.
+        """
+        with self._lock:
+            start = time.perf_counter()
+            slots, dropped = self.store.update(points["postman_id"], points["gps_time"], points["lat"], points["lng"])
+            store = self.store
+            log_distance = np.log1p(store.distance_km[slots])
+            stale = ~(np.abs(log_distance - store.scored_log_distance[slots]) < self.min_log_change)
+            rescore = slots[stale]
+            if len(rescore):
+                engine = self.engine_fn()
+                X = engine.pipeline.transform(pd.DataFrame({
+                    "accept_time": pd.to_datetime(store.start_time[rescore], unit="s"),
+                    "distance": store.distance_km[rescore],
+                    "weather": self.weather,
+                    "vehicle_type": self.vehicle_type
+                }))
+                store.risk[rescore] = engine.predict_matrix(X)
+                store.scored_log_distance[rescore] = log_distance[stale]
+
+            self.points += len(points["postman_id"])
+            self.dropped += dropped
+            self.batches += 1
+            self.rescored += len(rescore)
+            self.busy_seconds += time.perf_counter() - start
+            return store.view(rescore)
+
+    def snapshot(self, postman_ids=None, top=None):
+        """
+        Current state of the given couriers, or the `top` highest-risk routes.
+        """
+        with self._lock:
+            store = self.store
+            if postman_ids is not None:
+                slots = store.slots(list(postman_ids), create=False)
+                slots = slots[slots >= 0]
+            else:
+                risk = np.nan_to_num(store.risk[:store.size], nan=-1.0)
+                slots = np.argsort(-risk, kind="stable")
+                if top is not None:
+                    slots = slots[:top]
+            return store.view(slots)
+
+    def region_index(self, active_seconds=3600.0):
+        """
+        Live routes indexed by the grid cell of their last fix: breaches are
+        the routes already past their promised time, y_prob their last risk.
+
+        Args:
+            active_seconds (float): Only routes with a fix this recent, relative
+                to the newest fix in the store (idle couriers drop out).
+        Returns:
+            RegionIndex
+        """
+        with self._lock:
+            store = self.store
+            n = store.size
+            last_time = store.last_time[:n]
+            active = store.day[:n] >= 0
+            if active.any():
+                active &= last_time >= last_time[active].max() - active_seconds
+            slots = np.flatnonzero(active)
+            elapsed_min = (last_time[slots] - store.start_time[slots]) / 60.0
+            promise_min = store.distance_km[slots] * PROMISE_MIN_PER_KM + PROMISE_BASE_MIN
+            return RegionIndex.from_cells(
+                grid_cell(store.last_lat[slots], store.last_lng[slots]),
+                elapsed_min > promise_min,
+                np.nan_to_num(store.risk[slots], nan=0.0) # not scored yet: no expected breach
+            )
+
+    def stats(self):
+        return {
+            "couriers": self.store.size,
+            "points": self.points,
+            "dropped_points": self.dropped,
+            "batches": self.batches,
+            "queued_points": self.queue.queued_points,
+            "rejected_points": self.queue.rejected_points,
+            "rescored": self.rescored,
+            "rescore_rate": self.rescored / self.points if self.points else 0.0,
+            # Ingest capacity: points per second of time spent in `ingest`
+            "points_per_busy_second": self.points / self.busy_seconds if self.busy_seconds else None
+        }
+
+def _checked_columns(columns):
+    # Numeric fields become float64 arrays (None -> NaN, dropped by the store)
+    n = len(columns["postman_id"])
+    if any(isinstance(v, (list, dict)) for v in columns["postman_id"]):
+        raise ValueError("postman_id values must be scalars")
+    for f in POINT_FIELDS[1:]:
+        try:
+            values = np.asarray(columns[f], dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError(f"{f} values must be numbers")
+        if values.shape != (n,):
+            raise ValueError(f"{f} needs one number per point")
+        columns[f] = values
+    return columns
+
+def points_to_columns(payload):
+    """
+    Accepts the wire formats of the GPS endpoints and returns columns:
+    a single point {postman_id, gps_time, lat, lng}, {"points": [point, ...]},
+    or columnar {postman_id: [...], gps_time: [...], lat: [...], lng: [...]}.
+    gps_time, lat and lng come back as float64 arrays.
+    Raises ValueError on anything else, including scalar columns and
+    non-numeric coordinates.
+    """
+    if isinstance(payload, dict) and "points" in payload:
+        payload = payload["points"]
+    if isinstance(payload, dict):
+        missing = [f for f in POINT_FIELDS if f not in payload]
+        if missing:
+            raise ValueError(f"Missing point fields: {missing}")
+        if isinstance(payload["postman_id"], list):
+            columns = {f: payload[f] for f in POINT_FIELDS}
+            if not all(isinstance(v, list) for v in columns.values()):
+                raise ValueError("Point columns must all be lists")
+            if len({len(v) for v in columns.values()}) != 1:
+                raise ValueError("Point columns must have equal lengths")
+            return _checked_columns(columns)
+        return _checked_columns({f: [payload[f]] for f in POINT_FIELDS})
+    if isinstance(payload, list):
+        try:
+            columns = {f: [p[f] for p in payload] for f in POINT_FIELDS}
+        except (KeyError, TypeError):
+            raise ValueError(f"Every point needs {list(POINT_FIELDS)}")
+        return _checked_columns(columns)
+    raise ValueError("Expected a point, a list of points or point columns")
+
+class GpsQueueFull(Exception):
+    """
+    Raised by `GpsQueue.submit` when accepting a batch would exceed the
+    pending-point limit (the producer is outrunning scoring).
+    """
+
+class GpsQueue:
+    """
+    Fire-and-forget ingestion for `POST /api/stream/gps`: batches are queued
+    and a single worker task drains whatever has accumulated (up to
+    `max_points`) into one `StreamScorer.ingest` call in a worker thread.
+    At most `max_pending_points` wait at any time; beyond that `submit`
+    refuses the batch so memory stays bounded.
+    """
+    def __init__(self, scorer, max_points=50_000, max_pending_points=500_000):
+        self.scorer = scorer
+        self.max_points = max_points
+        self.max_pending_points = max_pending_points
+        self.rejected_points = 0
+        self.queue = None
+        self.worker = None
+        self.queued_points = 0
+
+    def _ensure_worker(self):
+        # Started lazily so the queue binds to the serving event loop
+        if self.worker is None or self.worker.done():
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.get_running_loop().create_task(self._run())
+
+    def submit(self, columns):
+        n = len(columns["postman_id"])
+        if self.queued_points + n > self.max_pending_points:
+            self.rejected_points += n
+            raise GpsQueueFull(f"Batch of {n:,} points would exceed the queue limit "
+                               f"({self.queued_points:,} of {self.max_pending_points:,} pending)")
+        self._ensure_worker()
+        self.queue.put_nowait(columns)
+        self.queued_points += n
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            n = len(batch[0]["postman_id"])
+            while n < self.max_points and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                n += len(batch[-1]["postman_id"])
+            columns = {f: np.concatenate([b[f] for b in batch]) for f in POINT_FIELDS[1:]}
+            columns["postman_id"] = [v for b in batch for v in b["postman_id"]]
+            self.queued_points -= n
+            try:
+                await asyncio.to_thread(self.scorer.ingest, columns)
+            except Exception as e:
+                logger.error(f"GPS batch of {n} points failed: {e}")
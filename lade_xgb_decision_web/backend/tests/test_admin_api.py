@@ -0,0 +1,26 @@
+
+import os
+import pytest
+
+os.environ.setdefault("WARMUP_ON_STARTUP", "0")
+os.environ.setdefault("MODEL_RELOAD_POLL_SECONDS", "0")
+
+from fastapi.testclient import TestClient
+import app
+
+@pytest.fixture
+def client():
+    # No `with`: skips the lifespan (warm-up, registry watcher)
+    return TestClient(app.app)
+
+def test_admin_api_disabled_without_token(client, monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert client.get("/api/admin/artifacts").status_code == 403
+    assert client.post("/api/admin/reload", json={"version": "v1"}).status_code == 403
+
+def test_admin_api_requires_matching_token(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    assert client.get("/api/admin/artifacts", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    response = client.get("/api/admin/artifacts", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    assert "active" in response.json()
@@ -0,0 +1,39 @@
+import asyncio
+from batching import PredictionBatcher
+
+def _predict(records):
+    if any(r.get("bad") for r in records):
+        raise ValueError("bad record")
+    return [r["x"] * 2.0 for r in records]
+
+def _run(batcher, requests):
+    async def main():
+        return await asyncio.gather(*(batcher.submit(r) for r in requests), return_exceptions=True)
+    return asyncio.run(main())
+
+def test_concurrent_requests_share_one_call():
+    calls = []
+    batcher = PredictionBatcher(lambda records: calls.append(len(records)) or _predict(records),
+                                max_batch_rows=1000, max_wait_ms=50)
+    requests = [[{"x": i}, {"x": i + 0.5}] for i in range(10)]
+    results = _run(batcher, requests)
+    assert results == [[2.0 * i, 2.0 * i + 1.0] for i in range(10)]
+    assert calls == [20]
+    assert batcher.stats()["batch_size_rows"]["count"] == 1
+
+def test_batch_closes_at_max_rows():
+    calls = []
+    batcher = PredictionBatcher(lambda records: calls.append(len(records)) or _predict(records),
+                                max_batch_rows=4, max_wait_ms=50)
+    results = _run(batcher, [[{"x": i}, {"x": i}] for i in range(6)])
+    assert results == [[2.0 * i, 2.0 * i] for i in range(6)]
+    assert calls == [4, 4, 4]
+
+def test_bad_request_fails_alone():
+    batcher = PredictionBatcher(_predict, max_batch_rows=1000, max_wait_ms=50)
+    results = _run(batcher, [[{"x": 1}], [{"x": 2, "bad": True}], [{"x": 3}]])
+    assert results[0] == [2.0] and results[2] == [6.0]
+    assert isinstance(results[1], ValueError)
+
+def test_empty_request():
+    assert _run(PredictionBatcher(_predict), [[]]) == [[]]
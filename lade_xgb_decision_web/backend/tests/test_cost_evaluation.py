@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from cost_evaluation import ThresholdIndex, calculate_financial_impact
+
+def _predictions(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    y_true = rng.integers(0, 2, n)
+    # Rounded so many rows tie with each other and with the thresholds
+    y_prob = np.round(np.clip(0.3 * y_true + rng.uniform(0, 0.7, n), 0, 1), 2)
+    return y_true, y_prob
+
+def _brute_counts(y_true, y_prob, t):
+    flagged = y_prob >= t
+    return ((flagged & (y_true == 1)).sum(), (flagged & (y_true == 0)).sum(),
+            (~flagged & (y_true == 0)).sum(), (~flagged & (y_true == 1)).sum())
+
+def test_counts_match_brute_force():
+    y_true, y_prob = _predictions()
+    index = ThresholdIndex(y_true, y_prob)
+    thresholds = np.r_[0.0, np.linspace(0.01, 0.99, 99), 0.5, 1.0, 1.01]
+    tp, fp, tn, fn = index.counts(thresholds)
+    for i, t in enumerate(thresholds):
+        assert (tp[i], fp[i], tn[i], fn[i]) == _brute_counts(y_true, y_prob, t)
+
+def test_impact_matches_calculate_financial_impact():
+    y_true, y_prob = _predictions()
+    index = ThresholdIndex(y_true, y_prob)
+    for t in (0.0, 0.25, 0.5, 0.73, 1.0):
+        assert index.impact(t, 50000, 10000) == calculate_financial_impact(y_true, y_prob, t, 50000, 10000)
+
+def test_empty_index():
+    tp, fp, tn, fn = ThresholdIndex(np.zeros(0, int), np.zeros(0)).counts([0.5])
+    assert (tp[0], fp[0], tn[0], fn[0]) == (0, 0, 0, 0)
+
+def _exhaustive_optimum(y_true, y_prob, cost_fn, cost_fp):
+    # Every distinct score plus "flag nothing"; lowest threshold wins ties
+    candidates = np.r_[np.unique(y_prob), np.nextafter(y_prob.max(), np.inf)]
+    costs = [calculate_financial_impact(y_true, y_prob, t, cost_fn, cost_fp)["total_cost"] for t in candidates]
+    return candidates[int(np.argmin(costs))], min(costs)
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_optimal_thresholds_match_exhaustive_search(seed):
+    y_true, y_prob = _predictions(n=800, seed=seed)
+    index = ThresholdIndex(y_true, y_prob)
+    pairs = [(50000, 10000), (10000, 50000), (1, 1), (0, 1), (1, 0), (123.4, 567.8)]
+    found = index.optimal_thresholds([p[0] for p in pairs], [p[1] for p in pairs], chunk_elems=50)
+    for t, (cost_fn, cost_fp) in zip(found, pairs):
+        best_t, best_cost = _exhaustive_optimum(y_true, y_prob, cost_fn, cost_fp)
+        assert t == best_t
+        assert index.impact(t, cost_fn, cost_fp)["total_cost"] == pytest.approx(best_cost)
+
+def test_segment_counts_match_per_segment_brute_force():
+    from cost_evaluation import segment_counts
+    y_true, y_prob = _predictions(n=2000, seed=2)
+    codes = np.random.default_rng(3).integers(0, 7, len(y_true))
+    thresholds = np.unique(np.r_[0.0, np.linspace(0.05, 0.95, 19), 0.5, 1.0])
+    tp, fp, tn, fn = segment_counts(codes, 8, y_true, y_prob, thresholds) # Segment 7 is empty
+    for s in range(8):
+        rows = codes == s
+        for j, t in enumerate(thresholds):
+            assert (tp[s, j], fp[s, j], tn[s, j], fn[s, j]) == _brute_counts(y_true[rows], y_prob[rows], t)
@@ -0,0 +1,15 @@
+
+import numpy as np
+import pytest
+from decision_policy import RISK_LEVELS, apply_decision_policy, apply_decision_policy_batch
+
+def test_batch_matches_scalar_policy():
+    probs = np.r_[np.linspace(0, 1, 101), [0.3, 0.7]]
+    for t1, t2 in ((0.3, 0.7), (0.5, 0.5), (0.0, 1.0)):
+        codes = apply_decision_policy_batch(probs, t1, t2)
+        expected = [apply_decision_policy(p, t1, t2)["risk_level"] for p in probs]
+        assert [RISK_LEVELS[c]["risk_level"] for c in codes] == expected
+
+def test_batch_rejects_decreasing_thresholds():
+    with pytest.raises(ValueError):
+        apply_decision_policy_batch([0.5], t1=0.7, t2=0.3)
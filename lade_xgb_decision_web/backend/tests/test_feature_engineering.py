@@ -0,0 +1,117 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+os.environ.setdefault("WARMUP_ON_STARTUP", "0")
+os.environ.setdefault("MODEL_RELOAD_POLL_SECONDS", "0")
+
+from feature_engineering import FeaturePipeline, InvalidFeaturesError, engineering_features
+
+def _orders(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    accept = rng.integers(1_600_000_000, 1_700_000_000, n)
+    return pd.DataFrame({
+        "accept_time": accept,
+        "promise_time": accept + rng.integers(1800, 7200, n),
+        "finish_time": accept + rng.integers(600, 9000, n),
+        "distance": rng.uniform(0.1, 20, n),
+        "weather": rng.choice(["Sunny", "Rainy", "Cloudy"], n),
+        "vehicle_type": rng.choice(["Motorcycle", "Van"], n)
+    })
+
+def _legacy_features(df):
+    # What engineering_features did before FeaturePipeline: .dt accessors and LabelEncoders
+    df = df.copy()
+    for col in ("accept_time", "promise_time", "finish_time"):
+        df[col] = pd.to_datetime(df[col], unit="s", errors="coerce")
+    y = (df["finish_time"] > df["promise_time"]).astype(int)
+    X = pd.DataFrame({
+        "hour_of_day": df["accept_time"].dt.hour,
+        "day_of_week": df["accept_time"].dt.dayofweek,
+        "is_weekend": (df["accept_time"].dt.dayofweek >= 5).astype(int),
+        "log_distance": np.log1p(df["distance"])
+    })
+    encoders = {}
+    for col in ("weather", "vehicle_type"):
+        encoders[col] = LabelEncoder().fit(df[col].astype(str))
+        X[col] = encoders[col].transform(df[col].astype(str))
+    return X.to_numpy(np.float32), y.to_numpy(), encoders
+
+def test_matches_label_encoder_path():
+    df = _orders()
+    X, y, pipeline = engineering_features(df)
+    X_legacy, y_legacy, encoders = _legacy_features(df)
+    np.testing.assert_array_equal(X, X_legacy)
+    np.testing.assert_array_equal(y, y_legacy)
+    # Pipelines rebuilt from legacy encoders.pkl give the same matrix
+    np.testing.assert_array_equal(FeaturePipeline.from_encoders(encoders).transform(df), X)
+
+@pytest.mark.parametrize("values", [
+    [1_717_266_600, 1_700_000_000.5, None, np.nan],
+    ["2024-06-01 18:30:00", "2024-06-02T07:05:59", None, "not a time"],
+    ["2024-06-01T18:30:00Z", "2024-06-02T23:59:00Z", None, np.nan],
+    ["2024-06-01T18:30:00+08:00", "2024-06-02T01:00:00-05:00", None, np.nan]
+])
+def test_time_features_match_pandas(values):
+    pipeline = FeaturePipeline()
+    X = pipeline.transform([{"accept_time": v, "distance": 1.0} for v in values])
+    numeric = not isinstance(values[0], str)
+    expected = pd.Series([pd.to_datetime(v, unit="s" if numeric else None, errors="coerce") for v in values])
+    for i, ts in enumerate(expected):
+        if pd.isna(ts):
+            assert np.isnan(X[i, :3]).all()
+        else:
+            # Timezone-aware strings keep their local wall-clock hour
+            assert X[i, 0] == ts.hour
+            assert X[i, 1] == ts.dayofweek
+            assert X[i, 2] == (ts.dayofweek >= 5)
+
+def test_unseen_and_missing_categoricals_map_to_minus_one():
+    pipeline = FeaturePipeline().fit(_orders())
+    X = pipeline.transform([
+        {"accept_time": 1_700_000_000, "distance": 1.0, "weather": "Snow", "vehicle_type": "Van"},
+        {"accept_time": 1_700_000_000, "distance": 1.0, "weather": None},
+        {"accept_time": 1_700_000_000, "distance": 1.0}
+    ])
+    weather, vehicle = pipeline.feature_names.index("weather"), pipeline.feature_names.index("vehicle_type")
+    assert X[:, weather].tolist() == [-1, -1, -1]
+    assert X[:, vehicle].tolist() == [list(pipeline.categories["vehicle_type"]).index("Van"), -1, -1]
+
+def test_check_required_names_bad_rows():
+    pipeline = FeaturePipeline().fit(_orders())
+    X = pipeline.transform([
+        {"accept_time": "2024-06-01 18:30:00", "distance": 5.2},
+        {"accept_time": "2024-06-01 18:30:00", "distance": "abc"},
+        {"distance": 1.0},
+        {}
+    ])
+    with pytest.raises(InvalidFeaturesError) as e:
+        pipeline.check_required(X)
+    assert e.value.rows == {"accept_time": [2, 3], "distance": [1, 3]}
+    pipeline.check_required(X[:1])
+
+def test_predict_endpoint_rejects_malformed_records(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import app
+    from inference import InferenceEngine
+    from lazy import LazyResource
+    from model_backend import make_classifier, save_model
+
+    X, y, pipeline = engineering_features(_orders())
+    pipeline.save(str(tmp_path / "pipeline.pkl"))
+    save_model(make_classifier("sklearn", n_jobs=1, n_estimators=5).fit(X, y), str(tmp_path / "model_meta.json"),
+               model_path=str(tmp_path / "model.pkl"), feature_names=pipeline.feature_names)
+    engine = InferenceEngine(model_path=str(tmp_path / "model.pkl"), pipeline_path=str(tmp_path / "pipeline.pkl"),
+                             forest_path=str(tmp_path / "forest.npz"), model_meta_path=str(tmp_path / "model_meta.json"))
+    monkeypatch.setattr(app, "model_engine", LazyResource("model", lambda: engine))
+    client = TestClient(app.app)
+
+    good = {"accept_time": "2024-06-01 18:30:00", "distance": 5.2, "weather": "Rainy", "vehicle_type": "Van"}
+    assert client.post("/api/predict", json={"features": [good]}).status_code == 200
+    for bad in ({**good, "distance": "abc"}, {"distance": 5.2}, {}):
+        response = client.post("/api/predict", json={"features": [good, bad]})
+        assert response.status_code == 422
+        assert "rows 1" in response.json()["detail"]
+    assert client.post("/api/decide", json={"features": [{}]}).status_code == 422
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+from bench_gps_transform import legacy_process_gps_to_orders
+from data_loader import process_gps_to_orders
+
+def _points(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "ds": rng.integers(300, 304, n),
+        "postman_id": rng.integers(0, 150, n),
+        "gps_time": rng.integers(1_600_000_000, 1_600_000_000 + 86_400, n).astype(np.float64),
+        "lat": rng.uniform(30.0, 31.0, n),
+        "lng": rng.uniform(120.0, 121.0, n)
+    })
+    # Rows without a key, and a courier with a single point (no route)
+    df.loc[:9, "postman_id"] = np.nan
+    df.loc[10:14, "ds"] = np.nan
+    return pd.concat([df, pd.DataFrame({"ds": [300], "postman_id": [999], "gps_time": [1.6e9],
+                                        "lat": [30.0], "lng": [120.0]})], ignore_index=True)
+
+def _compare(orders, expected):
+    columns = ["courier_id", "ds", "accept_time", "finish_time"]
+    orders = orders.sort_values(["courier_id", "ds"]).reset_index(drop=True)
+    expected = expected.sort_values(["courier_id", "ds"]).reset_index(drop=True)
+    assert len(orders) == len(expected)
+    pd.testing.assert_frame_equal(orders[columns], expected[columns], check_dtype=False)
+    np.testing.assert_allclose(orders["distance"], expected["distance"], rtol=1e-9)
+
+def test_matches_groupby_reference():
+    points = _points()
+    orders = process_gps_to_orders(points)
+    reference = legacy_process_gps_to_orders(points.dropna(subset=["postman_id", "ds"]))
+    _compare(orders, reference)
+    assert 999 not in set(orders["courier_id"])
+    assert (orders["start_cell"] >= 0).all() and (orders["end_cell"] >= 0).all()
+
+def test_sharded_matches_single_process():
+    points = _points(seed=1)
+    _compare(process_gps_to_orders(points, n_jobs=3), process_gps_to_orders(points))
+
+def test_no_keyed_rows():
+    assert process_gps_to_orders(_points().assign(postman_id=np.nan)).empty
+
+def test_string_courier_ids_are_kept():
+    points = _points(seed=2).dropna(subset=["postman_id"])
+    expected = process_gps_to_orders(points)
+    points["postman_id"] = "courier-" + points["postman_id"].astype(int).astype(str)
+    orders = process_gps_to_orders(points)
+    # Same routes as with the numeric ids, under their original labels
+    expected["courier_id"] = "courier-" + expected["courier_id"].astype(str)
+    _compare(orders, expected)
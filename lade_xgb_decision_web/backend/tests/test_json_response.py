@@ -0,0 +1,23 @@
+
+import json
+import numpy as np
+import pytest
+import json_response
+from json_response import dumps
+
+PAYLOAD = {"risk": [0.5, float("nan")], "arr": np.array([1.0, np.inf], dtype=np.float32),
+           "n": np.int64(3), "nested": {"x": (np.float64("-inf"), 2)}}
+EXPECTED = {"risk": [0.5, None], "arr": [1.0, None], "n": 3, "nested": {"x": [None, 2]}}
+
+def test_stdlib_fallback_writes_valid_json(monkeypatch):
+    monkeypatch.setattr(json_response, "orjson", None)
+    body = dumps(PAYLOAD).decode()
+    # parse_constant rejects NaN/Infinity tokens, like strict JSON parsers
+    assert json.loads(body, parse_constant=pytest.fail) == EXPECTED
+
+def test_orjson_and_fallback_agree(monkeypatch):
+    if json_response.orjson is None:
+        pytest.skip("orjson not installed")
+    fast = json.loads(dumps(PAYLOAD))
+    monkeypatch.setattr(json_response, "orjson", None)
+    assert json.loads(dumps(PAYLOAD)) == fast
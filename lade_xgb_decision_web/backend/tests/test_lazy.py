@@ -0,0 +1,63 @@
+import os
+import threading
+import time
+
+os.environ.setdefault("WARMUP_ON_STARTUP", "0")
+os.environ.setdefault("MODEL_RELOAD_POLL_SECONDS", "0")
+
+from fastapi.testclient import TestClient
+import app
+from lazy import LazyResource, warm_up
+
+def test_concurrent_callers_share_one_build():
+    calls = []
+    def factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+    resource = LazyResource("slow", factory)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(resource.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert len({id(r) for r in results}) == 1
+    assert resource.status()["state"] == "ready"
+
+def test_failed_build_is_recorded_and_retried():
+    attempts = []
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("artifact missing")
+        return "model"
+    resource = LazyResource("model", factory)
+    warm_up([resource]) # Swallows the failure
+    assert resource.status()["state"] == "failed"
+    assert "artifact missing" in resource.status()["error"]
+    assert resource.get() == "model"
+    assert resource.status() == {"state": "ready", "error": None, "load_seconds": resource.load_seconds}
+
+def test_swap_returns_previous_value():
+    resource = LazyResource("model", lambda: "v1")
+    assert resource.get() == "v1"
+    assert resource.swap("v2") == "v1"
+    assert resource.get() == "v2"
+
+def test_readiness_follows_resources(monkeypatch):
+    ok = LazyResource("model", lambda: 1)
+    broken = LazyResource("simulation", lambda: 1 / 0)
+    monkeypatch.setattr(app, "RESOURCES", [ok, broken])
+    client = TestClient(app.app)
+
+    assert client.get("/healthz").status_code == 200
+    warm_up([ok, broken])
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["components"]["simulation"]["state"] == "failed"
+
+    broken.factory = lambda: 1
+    broken.get()
+    assert client.get("/readyz").json()["ready"] is True
@@ -0,0 +1,56 @@
+import json
+import joblib
+import numpy as np
+import pytest
+from model_backend import SklearnBackend, XGBoostBackend, load_model, make_classifier, save_model
+from tree_scorer import random_feature_matrix
+
+def _data(n=2000):
+    X = random_feature_matrix(n, 6, seed=0).astype(np.float32)
+    y = ((X[:, 3] > 2.5) ^ (X[:, 0] > 17)).astype(int)
+    return X, y
+
+@pytest.mark.parametrize("backend", ["sklearn", "xgboost"])
+def test_save_and_load_round_trip(tmp_path, backend):
+    if backend == "xgboost":
+        pytest.importorskip("xgboost")
+    X, y = _data()
+    model = make_classifier(backend, n_jobs=1, n_estimators=20).fit(X, y)
+    meta_path = str(tmp_path / "artifacts" / "model_meta.json")
+    (tmp_path / "artifacts").mkdir()
+    ext = ".ubj" if backend == "xgboost" else ".pkl"
+    meta = save_model(model, meta_path, model_path=str(tmp_path / "artifacts" / ("model" + ext)),
+                      feature_names=[f"f{i}" for i in range(6)], extra={"test_auc": 0.5})
+    assert meta["backend"] == backend and meta["model_path"] == "model" + ext
+    assert json.load(open(meta_path))["test_auc"] == 0.5
+
+    # Metadata and model move together
+    moved = tmp_path / "moved"
+    (tmp_path / "artifacts").rename(moved)
+    loaded = load_model(str(moved / "model_meta.json"))
+    assert loaded.name == backend
+    np.testing.assert_allclose(loaded.predict_proba(X), model.predict_proba(X)[:, 1], rtol=1e-6)
+
+def test_xgboost_scores_missing_values():
+    pytest.importorskip("xgboost")
+    X, y = _data()
+    model = make_classifier("xgboost", n_jobs=1, n_estimators=10).fit(X, y)
+    backend = XGBoostBackend(model.get_booster(), n_threads=1)
+    X[::7, 2] = np.nan
+    assert np.isfinite(backend.predict_proba(X)).all()
+
+def test_pickle_without_metadata_loads_as_sklearn(tmp_path):
+    X, y = _data()
+    model = make_classifier("sklearn", n_jobs=1, n_estimators=5).fit(X, y)
+    joblib.dump(model, tmp_path / "model.pkl")
+    loaded = load_model(str(tmp_path / "missing.json"), default_path=str(tmp_path / "model.pkl"))
+    assert isinstance(loaded, SklearnBackend)
+    assert load_model(str(tmp_path / "missing.json"), default_path=str(tmp_path / "none.pkl")) is None
+
+def test_unknown_backend_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        make_classifier("lightgbm")
+    meta_path = tmp_path / "model_meta.json"
+    meta_path.write_text(json.dumps({"backend": "lightgbm", "model_path": "model.txt"}))
+    with pytest.raises(ValueError):
+        load_model(str(meta_path))
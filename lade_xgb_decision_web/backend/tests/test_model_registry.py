@@ -0,0 +1,97 @@
+import gc
+import json
+import os
+import pytest
+from lazy import LazyResource
+from model_registry import ArtifactReloader, activate, current_version, list_versions, publish
+from prediction_store import PredictionStore
+
+def _training_output(path, name):
+    # Stand-in artifacts: the "engine" is just the text of model_meta.json
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "model_meta.json"), "w") as f:
+        json.dump({"name": name}, f)
+    return str(path)
+
+class Engine:
+    def __init__(self, artifact_dir):
+        with open(os.path.join(artifact_dir, "model_meta.json")) as f:
+            self.name = json.load(f)["name"]
+
+def _warm(engine):
+    if engine.name == "broken":
+        raise RuntimeError("warm-up batch failed")
+
+def _registry(tmp_path):
+    registry = str(tmp_path / "artifacts")
+    publish(_training_output(tmp_path / "run1", "good-1"), registry, version="v1")
+    publish(_training_output(tmp_path / "run2", "good-2"), registry, version="v2", make_current=False)
+    publish(_training_output(tmp_path / "run3", "broken"), registry, version="v3", make_current=False)
+    model = LazyResource("model", lambda: Engine(os.path.join(registry, "v1")))
+    simulation = LazyResource("simulation", lambda: Engine(os.path.join(registry, "v1")))
+    # The warm-up check runs on the second target, after the first one has been built
+    reloader = ArtifactReloader([(model, Engine, None), (simulation, Engine, _warm)], registry_dir=registry)
+    return registry, reloader, model, simulation
+
+def test_publish_and_activate(tmp_path):
+    registry, _, _, _ = _registry(tmp_path)
+    assert list_versions(registry) == ["v1", "v2", "v3"]
+    assert current_version(registry) == "v1"
+    activate("v2", registry)
+    assert current_version(registry) == "v2"
+    with pytest.raises(ValueError):
+        activate("v9", registry)
+    with pytest.raises(ValueError):
+        publish(_training_output(tmp_path / "run4", "again"), registry, version="v1")
+    with pytest.raises(ValueError):
+        publish(str(tmp_path / "empty"), registry)
+
+def test_publish_converts_legacy_csv(tmp_path):
+    source = _training_output(tmp_path / "run", "csv")
+    with open(os.path.join(source, "validation_preds.csv"), "w") as f:
+        f.write("y_true,y_prob,weather\n1,0.9,Rainy\n0,0.2,Sunny\n")
+    registry = str(tmp_path / "artifacts")
+    publish(source, registry, version="v1")
+    store = PredictionStore.load(os.path.join(registry, "v1", "validation_preds"))
+    assert store.n == 2 and "weather" in store.segments
+
+def test_reload_swaps_every_target(tmp_path):
+    registry, reloader, model, simulation = _registry(tmp_path)
+    old = model.get()
+    assert reloader.reload("v2") is True
+    assert model.get().name == simulation.get().name == "good-2"
+    assert reloader.status()["active"] == "v2"
+    assert current_version(registry) == "v2"
+    assert reloader.reload("v2") is False # Already active
+
+    # The old engine is released once its last holder lets go
+    assert "model@v1" in reloader.status()["draining"]
+    del old
+    gc.collect()
+    assert "model@v1" not in reloader.status()["draining"]
+
+def test_failed_warm_up_keeps_serving_the_old_version(tmp_path):
+    registry, reloader, model, simulation = _registry(tmp_path)
+    before = (model.get(), simulation.get())
+    with pytest.raises(RuntimeError):
+        reloader.reload("v3")
+
+    # Nothing swapped, not even the target that built fine
+    assert (model.get(), simulation.get()) == before
+    status = reloader.status()
+    assert status["active"] == "v1"
+    assert status["failed"] == "v3"
+    assert "warm-up batch failed" in status["error"]
+    assert status["loading"] is None
+    assert current_version(registry) == "v1" # Other workers aren't pointed at it either
+
+    # A good version afterwards clears the failure
+    assert reloader.reload("v2") is True
+    assert reloader.status()["failed"] is None
+
+def test_unknown_version_is_rejected(tmp_path):
+    _, reloader, _, _ = _registry(tmp_path)
+    with pytest.raises(ValueError):
+        reloader.reload("v9")
+    with pytest.raises(ValueError):
+        reloader.reload_async("v9")
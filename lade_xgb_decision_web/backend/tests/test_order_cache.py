@@ -0,0 +1,161 @@
+
+import numpy as np
+import pandas as pd
+import pytest
+from data_loader import iter_route_chunks, load_lade_data, load_manifest, read_order_cache, update_order_cache
+
+def _write_raw(path, ds, n_couriers=5, n_points=20, seed=0):
+    # Raw points grouped by courier and day, in time order (as LaDe is)
+    rng = np.random.default_rng(seed)
+    rows = []
+    for courier in range(n_couriers):
+        gps_time = 1_600_000_000 + np.sort(rng.uniform(0, 8 * 3600, n_points))
+        rows.append(pd.DataFrame({
+            "ds": ds,
+            "postman_id": courier,
+            "gps_time": gps_time,
+            "lat": 30.0 + rng.normal(0, 0.001, n_points).cumsum(),
+            "lng": 120.0 + rng.normal(0, 0.001, n_points).cumsum()
+        }))
+    pd.concat(rows).to_parquet(path)
+
+def _sources(dataset_dir):
+    return {src: entry["fingerprint"] for src, entry in load_manifest(dataset_dir)["sources"].items()}
+
+def test_only_new_or_changed_sources_are_rebuilt(tmp_path):
+    raw, cache = tmp_path / "raw", str(tmp_path / "orders")
+    raw.mkdir()
+    _write_raw(raw / "day1.parquet", 501)
+    update_order_cache(str(raw), dataset_dir=cache)
+    first = load_manifest(cache)["sources"]
+    assert len(read_order_cache(cache)) == 5
+
+    _write_raw(raw / "day2.parquet", 502, seed=1)
+    update_order_cache(str(raw), dataset_dir=cache)
+    sources = load_manifest(cache)["sources"]
+    # day1 untouched (same part files), day2 added
+    assert sources[str(raw / "day1.parquet")] == first[str(raw / "day1.parquet")]
+    assert sorted(read_order_cache(cache)["ds"].unique()) == [501, 502]
+
+    (raw / "day1.parquet").unlink()
+    update_order_cache(str(raw), dataset_dir=cache)
+    assert list(_sources(cache)) == [str(raw / "day2.parquet")]
+    assert read_order_cache(cache)["ds"].unique().tolist() == [502]
+
+def test_other_sources_are_not_pruned(tmp_path):
+    raw, cache = tmp_path / "raw", str(tmp_path / "orders")
+    raw.mkdir()
+    _write_raw(raw / "day1.parquet", 501)
+    _write_raw(tmp_path / "extra.parquet", 600, seed=2)
+    update_order_cache(str(raw), dataset_dir=cache)
+    update_order_cache(str(tmp_path / "extra.parquet"), dataset_dir=cache)
+    assert set(_sources(cache)) == {str(raw / "day1.parquet"), str(tmp_path / "extra.parquet")}
+
+def test_read_without_refresh_keeps_cache(tmp_path):
+    raw, cache = tmp_path / "raw", str(tmp_path / "orders")
+    raw.mkdir()
+    _write_raw(raw / "day1.parquet", 501)
+    update_order_cache(str(raw), dataset_dir=cache)
+    before = _sources(cache)
+    # Default source is the HuggingFace stream; refresh=False must not touch it
+    df = load_lade_data(sample_size=3, cache_path=str(tmp_path / "missing.parquet"), dataset_dir=cache, refresh=False)
+    assert len(df) == 3
+    assert _sources(cache) == before
+
+def test_page_index_and_loader_read_the_same_cache(tmp_path):
+    from data_loader import OrderPageIndex, order_cache_files
+    raw, cache = tmp_path / "raw", str(tmp_path / "orders")
+    raw.mkdir()
+    _write_raw(raw / "day1.parquet", 501)
+    update_order_cache(str(raw), dataset_dir=cache)
+    legacy = str(tmp_path / "lade_orders.parquet")
+    read_order_cache(cache).head(2).to_parquet(legacy)
+
+    # Both present: the legacy file wins everywhere
+    index = OrderPageIndex(cache, legacy_path=legacy)
+    index.refresh()
+    assert {grp["path"] for grp in index.groups} == {legacy}
+    assert order_cache_files(cache, legacy_path=legacy) == [legacy]
+    assert len(load_lade_data(cache_path=legacy, dataset_dir=cache)) == 2
+
+def _bucketed_cache(tmp_path):
+    raw, cache = tmp_path / "raw", str(tmp_path / "orders")
+    raw.mkdir()
+    for i, ds in enumerate((501, 502, 503)):
+        _write_raw(raw / f"day{ds}.parquet", ds, n_couriers=12, seed=i)
+    update_order_cache(str(raw), dataset_dir=cache, courier_buckets=4)
+    return cache
+
+def test_pushed_down_filters_match_pandas(tmp_path):
+    cache = _bucketed_cache(tmp_path)
+    full = read_order_cache(cache)
+    assert len(full) == 36
+
+    df = read_order_cache(cache, columns=["courier_id", "ds", "distance", "no_such_column"],
+                          ds_range=(502, None), couriers=[1, 5, 6], distance_range=(0.0, 1e9))
+    assert list(df.columns) == ["courier_id", "ds", "distance"]
+    expected = full[(full["ds"] >= 502) & full["courier_id"].isin([1, 5, 6])]
+    assert sorted(zip(df["ds"], df["courier_id"])) == sorted(zip(expected["ds"], expected["courier_id"]))
+
+    assert read_order_cache(cache, ds=[503])["ds"].unique().tolist() == [503]
+    assert read_order_cache(cache, ds=[999]).empty
+
+    # A single legacy file has no partitions: the same filters apply to its rows
+    legacy = str(tmp_path / "legacy.parquet")
+    full.to_parquet(legacy)
+    legacy_df = read_order_cache(files=[legacy], ds_range=(502, None), couriers=[1, 5, 6])
+    assert sorted(zip(legacy_df["ds"], legacy_df["courier_id"])) == sorted(zip(expected["ds"], expected["courier_id"]))
+
+def test_samples_are_distinct_rows_and_repeatable(tmp_path):
+    cache = _bucketed_cache(tmp_path)
+    keys = lambda df: list(zip(df["ds"], df["courier_id"]))
+    full = set(keys(read_order_cache(cache)))
+    # Unfiltered samples read row groups by position; filtered ones stream through a reservoir
+    for filters in ({}, {"ds_range": (502, 503)}, {"couriers": list(range(6))}):
+        sample = read_order_cache(cache, sample_size=10, random_state=7, **filters)
+        assert len(sample) == 10
+        assert len(set(keys(sample))) == 10
+        assert set(keys(sample)) <= full
+        assert keys(sample) == keys(read_order_cache(cache, sample_size=10, random_state=7, **filters))
+    assert len(read_order_cache(cache, sample_size=1000)) == 36
+
+def test_default_load_is_bounded(tmp_path, monkeypatch):
+    import data_loader
+    calls = []
+    def fake_update(source, split, dataset_dir, max_points=None, courier_buckets=0):
+        calls.append(max_points)
+        return load_manifest(dataset_dir)
+    monkeypatch.setattr(data_loader, "update_order_cache", fake_update)
+    cache = str(tmp_path / "orders")
+    # No cache yet: built from a bounded number of raw points
+    load_lade_data(cache_path=str(tmp_path / "missing.parquet"), dataset_dir=cache)
+    assert calls == [data_loader.DEFAULT_MAX_POINTS]
+
+    # With a cache, the default reads it without streaming the source again
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    _write_raw(raw / "day1.parquet", 501)
+    update_order_cache(str(raw), dataset_dir=cache)
+    assert len(load_lade_data(cache_path=str(tmp_path / "missing.parquet"), dataset_dir=cache)) == 5
+    assert calls == [data_loader.DEFAULT_MAX_POINTS]
+
+def _batches(df, size):
+    return (df.iloc[i:i + size] for i in range(0, len(df), size))
+
+def test_route_chunks_keep_routes_whole(tmp_path):
+    _write_raw(tmp_path / "raw.parquet", 501, n_couriers=6, n_points=7)
+    raw = pd.read_parquet(tmp_path / "raw.parquet")
+    chunks = list(iter_route_chunks(_batches(raw, 10)))
+    assert sum(len(c) for c in chunks) == len(raw)
+    seen = [set(c["postman_id"]) for c in chunks]
+    for i, couriers in enumerate(seen):
+        assert not any(couriers & later for later in seen[i + 1:])
+
+def test_route_chunks_reject_interleaved_input(tmp_path):
+    _write_raw(tmp_path / "raw.parquet", 501, n_couriers=6, n_points=7)
+    raw = pd.read_parquet(tmp_path / "raw.parquet")
+    # Courier 0's route resumes after other couriers' routes were closed
+    interleaved = pd.concat([raw[raw["postman_id"] == 0].iloc[:3], raw[raw["postman_id"] > 0],
+                             raw[raw["postman_id"] == 0].iloc[3:]])
+    with pytest.raises(ValueError, match="not grouped"):
+        list(iter_route_chunks(_batches(interleaved, 10)))
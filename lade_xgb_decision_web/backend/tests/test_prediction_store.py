@@ -0,0 +1,80 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from model_registry import publish
+from prediction_store import PredictionStore, convert_csv
+
+def _predictions(n=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    y_true = rng.integers(0, 2, n)
+    y_prob = rng.uniform(0, 1, n)
+    segments = {
+        "weather": rng.choice(["Sunny", "Rainy", "Cloudy"], n),
+        "hour_of_day": rng.integers(0, 24, n),
+        "courier_id": rng.integers(0, 50, n)
+    }
+    return y_true, y_prob, segments
+
+def _decoded(store, name):
+    codes, labels = store.segments[name]
+    return np.asarray(labels, dtype=object)[codes]
+
+def _assert_same(store, other):
+    assert store.n == other.n
+    np.testing.assert_array_equal(store.y_true, other.y_true)
+    np.testing.assert_array_equal(store.y_prob, other.y_prob)
+    assert set(store.segments) == set(other.segments)
+    for name in store.segments:
+        np.testing.assert_array_equal(_decoded(store, name), _decoded(other, name))
+
+def test_save_and_load_round_trip(tmp_path):
+    y_true, y_prob, segments = _predictions()
+    store = PredictionStore.from_arrays(y_true, y_prob, segments)
+    store.save(str(tmp_path / "preds"))
+    assert PredictionStore.exists(str(tmp_path / "preds"))
+
+    loaded = PredictionStore.load(str(tmp_path / "preds"))
+    _assert_same(loaded, store)
+    np.testing.assert_array_equal(loaded.y_prob, y_prob.astype(np.float32))
+    for name, values in segments.items():
+        np.testing.assert_array_equal(_decoded(loaded, name), values.astype(str))
+    # Columns are read-only maps of the files, not copies
+    assert not loaded.y_prob.flags.writeable
+    assert not loaded.segments["weather"][0].flags.writeable
+
+def test_empty_store_round_trip(tmp_path):
+    PredictionStore.from_arrays([], [], {"weather": []}).save(str(tmp_path / "preds"))
+    loaded = PredictionStore.load(str(tmp_path / "preds"))
+    assert loaded.n == 0 and len(loaded.segments["weather"][0]) == 0
+
+def test_csv_conversion_matches_arrays(tmp_path):
+    y_true, y_prob, segments = _predictions(seed=1)
+    csv_path = str(tmp_path / "validation_preds.csv")
+    pd.DataFrame({"y_true": y_true, "y_prob": y_prob, **segments}).to_csv(csv_path, index=False)
+
+    converted = convert_csv(csv_path, str(tmp_path / "preds"))
+    expected = PredictionStore.from_arrays(y_true, y_prob, segments)
+    _assert_same(converted, expected)
+    _assert_same(PredictionStore.load(str(tmp_path / "preds")), expected)
+
+def test_load_from_published_version_is_read_only(tmp_path):
+    source = tmp_path / "run"
+    source.mkdir()
+    (source / "model_meta.json").write_text(json.dumps({"name": "run"}))
+    y_true, y_prob, segments = _predictions(seed=2)
+    store = PredictionStore.from_arrays(y_true, y_prob, segments)
+    store.save(str(source / "validation_preds"))
+
+    registry = str(tmp_path / "artifacts")
+    publish(str(source), registry, version="v1")
+    version_dir = os.path.join(registry, "v1", "validation_preds")
+    before = {name: os.path.getmtime(os.path.join(version_dir, name)) for name in os.listdir(version_dir)}
+
+    loaded = PredictionStore.load(version_dir)
+    _assert_same(loaded, store)
+    with pytest.raises(ValueError):
+        loaded.y_prob[0] = 1.0
+    # Loading never writes into the published version
+    assert {name: os.path.getmtime(os.path.join(version_dir, name)) for name in os.listdir(version_dir)} == before
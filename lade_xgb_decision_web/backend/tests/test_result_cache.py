@@ -0,0 +1,46 @@
+import os
+from result_cache import ResultCache, artifact_version
+
+def _counter():
+    calls = []
+    def compute(value):
+        calls.append(value)
+        return value
+    return calls, compute
+
+def test_hits_and_lru_eviction():
+    calls, compute = _counter()
+    cache = ResultCache(max_entries=2)
+    for key in ("a", "b", "a", "c", "a", "b"):
+        assert cache.get_or_compute(key, lambda: compute(key), version="v1") == key
+    # "b" was least recently used when "c" arrived
+    assert calls == ["a", "b", "c", "b"]
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["evictions"] == 2
+
+def test_new_version_drops_everything():
+    calls, compute = _counter()
+    cache = ResultCache()
+    cache.get_or_compute("a", lambda: compute(1), version="v1")
+    assert cache.get_or_compute("a", lambda: compute(2), version="v2") == 2
+    assert cache.get_or_compute("a", lambda: compute(3), version="v2") == 2
+    assert calls == [1, 2]
+    assert cache.stats()["invalidations"] == 1
+
+def test_expired_entries_are_recomputed():
+    calls, compute = _counter()
+    cache = ResultCache(ttl_seconds=0)
+    cache.get_or_compute("a", lambda: compute(1))
+    cache.get_or_compute("a", lambda: compute(2))
+    assert calls == [1, 2]
+
+def test_artifact_version_tracks_rewrites(tmp_path):
+    path = tmp_path / "preds"
+    path.mkdir()
+    (path / "y_prob.bin").write_bytes(b"\x00" * 8)
+    before = artifact_version([str(path), str(tmp_path / "missing.json")])
+    assert artifact_version([str(path), str(tmp_path / "missing.json")]) == before
+    (path / "y_prob.bin").write_bytes(b"\x00" * 16)
+    assert artifact_version([str(path), str(tmp_path / "missing.json")]) != before
+    os.remove(path / "y_prob.bin")
+    assert artifact_version([str(path)]) != before
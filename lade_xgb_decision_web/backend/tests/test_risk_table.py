@@ -0,0 +1,27 @@
+
+import numpy as np
+from feature_engineering import FeaturePipeline
+from risk_table import RiskLookupTable
+
+def _pipeline():
+    pipeline = FeaturePipeline()
+    pipeline.categories = {"weather": np.array(["Cloudy", "Rainy"]), "vehicle_type": np.array(["Motorcycle"])}
+    pipeline.feature_names = pipeline.feature_names + ["weather", "vehicle_type"]
+    return pipeline
+
+def _score(X):
+    # Smooth in log_distance, so interpolation error stays small
+    return 1 / (1 + np.exp(-(X[:, 3] - 2.0 + 0.05 * X[:, 0] + 0.3 * X[:, 4])))
+
+def test_lookup_matches_model_inside_grid():
+    table = RiskLookupTable.build(_score, _pipeline(), max_distance=50.0, grid_points=512)
+    report = table.accuracy_report(_score, n_rows=5000)
+    assert report["max_abs_error"] < 1e-3
+
+def test_distances_past_grid_are_left_to_model():
+    table = RiskLookupTable.build(_score, _pipeline(), max_distance=50.0, grid_points=64)
+    X = table.sample_inputs(4)
+    X[:, 3] = np.log1p([10.0, 50.0, 80.0, 500.0])
+    probs, missing = table.lookup(X)
+    assert missing.tolist() == [False, False, True, True]
+    assert np.isnan(probs[2:]).all()
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from prediction_store import PredictionStore
+from shared_artifacts import attach_data_sample, attach_forest, export_shared_artifacts
+from tree_scorer import CompiledForest, random_feature_matrix
+from what_if import SimulationEngine
+
+def _simulation_engine(tmp_path, n=4000):
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 2, n)
+    y_prob = np.clip(0.3 * y_true + rng.uniform(0, 0.7, n), 0, 1)
+    hours = rng.integers(0, 24, n)
+    PredictionStore.from_arrays(y_true, y_prob, {"hour": hours}).save(str(tmp_path / "preds"))
+    return SimulationEngine(validation_data_path=str(tmp_path / "preds"), legacy_csv_path=str(tmp_path / "none.csv"))
+
+def test_workers_see_the_parents_validation_data(tmp_path):
+    parent = _simulation_engine(tmp_path)
+    shared = str(tmp_path / "shared")
+    export_shared_artifacts(shared, simulation_engine=parent)
+
+    worker = SimulationEngine(shared_dir=shared)
+    worker.load_data()
+    assert not worker.y_prob.flags.writeable # Read-only map, not a private copy
+    np.testing.assert_array_equal(worker.y_prob, parent.y_prob)
+    assert worker.run_simulation(0.4, 50000, 10000, bootstrap_resamples=100) == \
+        parent.run_simulation(0.4, 50000, 10000, bootstrap_resamples=100)
+    assert worker.simulate_segments("hour", 50000, 10000) == parent.simulate_segments("hour", 50000, 10000)
+    assert attach_data_sample(shared) is None
+
+def test_attached_forest_scores_like_the_original(tmp_path):
+    X = random_feature_matrix(1000, 6, seed=0)
+    y = (X[:, 3] > 2.5).astype(int)
+    forest = CompiledForest.from_sklearn(RandomForestClassifier(n_estimators=5, max_depth=6, random_state=0).fit(X, y))
+    shared = str(tmp_path / "shared")
+    export_shared_artifacts(shared, model_engine=SimpleNamespace(forest=forest, lookup_table=None))
+
+    attached = attach_forest(shared)
+    X = random_feature_matrix(2000, 6, seed=1)
+    np.testing.assert_array_equal(attached.predict_proba(X), forest.predict_proba(X))
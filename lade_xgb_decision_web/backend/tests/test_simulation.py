@@ -0,0 +1,47 @@
+
+import numpy as np
+from cost_evaluation import calculate_financial_impact
+from prediction_store import PredictionStore
+from what_if import SimulationEngine
+
+def _engine(tmp_path, n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    y_true = rng.integers(0, 2, n)
+    y_prob = np.clip(0.35 * y_true + rng.uniform(0, 0.65, n), 0, 1)
+    PredictionStore.from_arrays(y_true, y_prob).save(str(tmp_path / "preds"))
+    return SimulationEngine(validation_data_path=str(tmp_path / "preds"), legacy_csv_path=str(tmp_path / "none.csv"))
+
+def test_savings_against_no_intervention(tmp_path):
+    engine = _engine(tmp_path)
+    impact = engine.run_simulation(0.5, 50000, 10000, bootstrap_resamples=500, baseline_threshold=1.01)
+    # No intervention: every breach is missed
+    no_action = engine.y_true.sum() * 50000
+    assert impact["savings_vs_baseline"] == no_action - impact["total_cost"]
+    interval = impact["intervals"]["savings_vs_baseline"]
+    assert interval["low"] < impact["savings_vs_baseline"] < interval["high"]
+    assert interval["std"] > 0
+
+def test_default_baseline_is_static_threshold(tmp_path):
+    impact = _engine(tmp_path).run_simulation(0.5, 50000, 10000, bootstrap_resamples=100)
+    assert impact["baseline_threshold"] == 0.5
+    assert impact["savings_vs_baseline"] == 0
+
+def test_segment_curves_match_per_segment_simulation(tmp_path):
+    rng = np.random.default_rng(4)
+    n = 3000
+    y_true = rng.integers(0, 2, n)
+    y_prob = np.clip(0.35 * y_true + rng.uniform(0, 0.65, n), 0, 1)
+    weather = rng.choice(["Cloudy", "Rainy", "Sunny", "Storm"], n, p=[0.4, 0.3, 0.29, 0.01])
+    PredictionStore.from_arrays(y_true, y_prob, {"weather": weather}).save(str(tmp_path / "preds"))
+    engine = SimulationEngine(validation_data_path=str(tmp_path / "preds"), legacy_csv_path=str(tmp_path / "none.csv"))
+
+    result = engine.simulate_segments("weather", 50000, 10000, points=15, min_count=50)
+    assert "Storm" not in result["labels"]
+    for i, label in enumerate(result["labels"]):
+        rows = weather == label
+        costs = [calculate_financial_impact(y_true[rows], y_prob[rows], t, 50000, 10000)["total_cost"]
+                 for t in result["thresholds"]]
+        assert result["count"][i] == rows.sum()
+        assert result["total_cost"][i] == costs
+        assert result["best_cost"][i] == min(costs)
+        assert result["best_threshold"][i] == result["thresholds"][int(np.argmin(costs))]
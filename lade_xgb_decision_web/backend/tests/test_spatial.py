@@ -0,0 +1,92 @@
+import os
+import numpy as np
+import pytest
+
+os.environ.setdefault("WARMUP_ON_STARTUP", "0")
+os.environ.setdefault("MODEL_RELOAD_POLL_SECONDS", "0")
+
+from fastapi.testclient import TestClient
+import app
+from lazy import LazyResource
+from prediction_store import PredictionStore
+from result_cache import ResultCache
+from spatial import GRID_DEG, RegionIndex, grid_cell
+from what_if import SimulationEngine
+
+def _routes(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(30.0, 30.5, n)
+    lng = rng.uniform(120.0, 120.5, n)
+    y_true = rng.integers(0, 2, n)
+    y_prob = rng.uniform(0, 1, n)
+    return lat, lng, y_true, y_prob
+
+def test_bbox_query_matches_brute_force():
+    lat, lng, y_true, y_prob = _routes()
+    index = RegionIndex.from_cells(grid_cell(lat, lng), y_true, y_prob)
+    bbox = (30.105, 120.213, 30.321, 120.405)
+    for resolution in (1, 3):
+        result = index.query(bbox=bbox, resolution=resolution, cost_fn=2.0)
+
+        # A route counts when its cell overlaps the box
+        cell_lat = np.floor(lat / GRID_DEG) * GRID_DEG
+        cell_lng = np.floor(lng / GRID_DEG) * GRID_DEG
+        inside = ((cell_lat + GRID_DEG > bbox[0] + 1e-9) & (cell_lat <= bbox[2])
+                  & (cell_lng + GRID_DEG > bbox[1] + 1e-9) & (cell_lng <= bbox[3]))
+        assert result["totals"]["count"] == inside.sum()
+        assert result["totals"]["breaches"] == y_true[inside].sum()
+        assert result["totals"]["exposure"] == pytest.approx(2.0 * y_prob[inside].sum())
+
+        # Per region: every route in the region's bounds, highest exposure first
+        assert sum(result["count"]) == inside.sum()
+        assert result["exposure"] == sorted(result["exposure"], reverse=True)
+        for i in range(len(result["region"])):
+            in_region = (inside & (lat >= result["lat_min"][i] - 1e-9) & (lat < result["lat_max"][i] - 1e-9)
+                         & (lng >= result["lng_min"][i] - 1e-9) & (lng < result["lng_max"][i] - 1e-9))
+            assert result["count"][i] == in_region.sum()
+            assert result["expected_breaches"][i] == pytest.approx(y_prob[in_region].sum())
+
+def test_top_and_min_count():
+    lat, lng, y_true, y_prob = _routes(n=2000)
+    index = RegionIndex.from_cells(grid_cell(lat, lng), y_true, y_prob)
+    full = index.query()
+    assert index.query(top=5)["region"] == full["region"][:5]
+    trimmed = index.query(min_count=3)
+    assert min(trimmed["count"]) >= 3
+    assert trimmed["totals"] == full["totals"]
+
+def test_from_segment_skips_missing_labels():
+    cells = grid_cell([30.0, 30.0, np.nan, 31.0], [120.0, 120.0, 120.0, 121.0]).astype(np.float64)
+    cells[cells < 0] = np.nan # How a float cell column with gaps reaches the store
+    store = PredictionStore.from_arrays([1, 0, 1, 1], [0.9, 0.2, 0.8, 0.7], {"start_cell": cells})
+    codes, labels = store.segments["start_cell"]
+    assert "nan" in labels
+    index = RegionIndex.from_segment(codes, labels, store.y_true, store.y_prob)
+    assert index.n_routes == 3
+    assert sorted(index.count.tolist()) == [1, 2]
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    def use_predictions(segments=None):
+        lat, lng, y_true, y_prob = _routes(n=500)
+        PredictionStore.from_arrays(y_true, y_prob, segments and segments(lat, lng)).save(str(tmp_path / "preds"))
+        engine = SimulationEngine(validation_data_path=str(tmp_path / "preds"),
+                                  legacy_csv_path=str(tmp_path / "none.csv"))
+        monkeypatch.setattr(app, "simulation_engine", LazyResource("simulation", lambda: engine))
+        monkeypatch.setattr(app, "simulation_cache", ResultCache())
+        return TestClient(app.app)
+    return use_predictions
+
+def test_regions_endpoint(client):
+    http = client(lambda lat, lng: {"start_cell": grid_cell(lat, lng), "end_cell": grid_cell(lng - 90, lat)})
+    response = http.get("/api/stats/regions", params={"bbox": "30,120,30.5,120.5", "top": 10})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["totals"]["count"] == 500
+    assert len(body["region"]) == 10
+    assert http.get("/api/stats/regions", params={"cell": "weather"}).status_code == 422
+
+def test_regions_endpoint_without_cell_segments(client):
+    response = client().get("/api/stats/regions")
+    assert response.status_code == 400
+    assert "Retrain" in response.json()["detail"]
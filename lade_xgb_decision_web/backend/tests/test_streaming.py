@@ -0,0 +1,109 @@
+
+import numpy as np
+import pandas as pd
+from data_loader import process_gps_to_orders
+from streaming import CourierStateStore
+
+def _points(n_couriers=20, n_points=3000, seed=0):
+    # Random walks over two days, interleaved across couriers
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "postman_id": rng.integers(0, n_couriers, n_points),
+        "gps_time": rng.uniform(1_600_000_000, 1_600_000_000 + 2 * 86400, n_points),
+        "lat": 30.0 + rng.normal(0, 0.01, n_points),
+        "lng": 120.0 + rng.normal(0, 0.01, n_points)
+    })
+
+def test_update_matches_batch_transform():
+    points = _points()
+    store = CourierStateStore(capacity=4)
+    # Time-ordered messages, so nothing is a late arrival
+    ordered = points.sort_values("gps_time")
+    for start in range(0, len(ordered), 173):
+        chunk = ordered.iloc[start:start + 173]
+        store.update(chunk["postman_id"].to_numpy(), chunk["gps_time"].to_numpy(),
+                     chunk["lat"].to_numpy(), chunk["lng"].to_numpy())
+
+    # Last route (day) of each courier, from the batch transform
+    orders = process_gps_to_orders(points.assign(ds=(points["gps_time"] // 86400).astype(int)))
+    last_routes = orders.sort_values("ds").groupby("courier_id").last()
+    slots = store.slots(list(last_routes.index), create=False)
+    np.testing.assert_allclose(store.distance_km[slots], last_routes["distance"].to_numpy(), rtol=1e-9)
+    np.testing.assert_allclose(store.start_time[slots],
+                               last_routes["accept_time"].to_numpy().astype("datetime64[ns]").astype(np.int64) / 1e9,
+                               rtol=0, atol=1e-3)
+
+def test_update_is_order_independent():
+    points = _points(seed=1)
+    a, b = CourierStateStore(), CourierStateStore()
+    a.update(*(points[c].to_numpy() for c in ("postman_id", "gps_time", "lat", "lng")))
+    shuffled = points.sample(frac=1, random_state=3)
+    b.update(*(shuffled[c].to_numpy() for c in ("postman_id", "gps_time", "lat", "lng")))
+    ids = sorted(points["postman_id"].unique())
+    np.testing.assert_allclose(a.distance_km[a.slots(ids)], b.distance_km[b.slots(ids)], rtol=1e-12)
+
+def test_late_and_null_points_are_dropped():
+    store = CourierStateStore()
+    slots, dropped = store.update([1, 1], [100.0, 200.0], [30.0, 30.01], [120.0, 120.0])
+    assert dropped == 0 and store.points[slots].tolist() == [2]
+    # Older than the stored last fix
+    _, dropped = store.update([1], [150.0], [30.0], [120.0])
+    assert dropped == 1
+    # Every id null
+    slots, dropped = store.update([None, None], [300.0, 301.0], [30.0, 30.0], [120.0, 120.0])
+    assert len(slots) == 0 and dropped == 2
+
+def test_queue_refuses_points_past_limit():
+    import asyncio
+    import pytest
+    from streaming import GpsQueueFull, StreamScorer
+
+    async def submit_until_full():
+        scorer = StreamScorer(engine_fn=None, queue_max_pending_points=5)
+        queue = scorer.queue
+        message = {"postman_id": [1, 2, 3], "gps_time": [1.0] * 3, "lat": [30.0] * 3, "lng": [120.0] * 3}
+        queue.submit(message)
+        with pytest.raises(GpsQueueFull):
+            queue.submit(message)
+        queue.worker.cancel()
+        return queue
+
+    queue = asyncio.run(submit_until_full())
+    assert queue.queued_points == 3
+    assert queue.rejected_points == 3
+
+BAD_PAYLOADS = [
+    {"postman_id": [1, 2], "gps_time": 1.0, "lat": [30.0, 30.0], "lng": [120.0, 120.0]},
+    {"postman_id": 1, "gps_time": [1.0, 2.0], "lat": 30.0, "lng": 120.0},
+    {"postman_id": 1, "gps_time": "noon", "lat": 30.0, "lng": 120.0},
+    {"points": [{"postman_id": [1], "gps_time": 1.0, "lat": 30.0, "lng": 120.0}]},
+    {"points": 5}
+]
+
+def test_points_to_columns_rejects_malformed_payloads():
+    import pytest
+    from streaming import points_to_columns
+
+    columns = points_to_columns({"points": [{"postman_id": "a", "gps_time": 1, "lat": 30, "lng": None}]})
+    assert columns["postman_id"] == ["a"] and columns["gps_time"].dtype == np.float64
+    assert np.isnan(columns["lng"][0])
+    for payload in BAD_PAYLOADS:
+        with pytest.raises(ValueError):
+            points_to_columns(payload)
+
+def test_gps_endpoints_answer_malformed_payloads():
+    import json
+    import os
+    os.environ.setdefault("WARMUP_ON_STARTUP", "0")
+    os.environ.setdefault("MODEL_RELOAD_POLL_SECONDS", "0")
+    from fastapi.testclient import TestClient
+    import app
+
+    client = TestClient(app.app)
+    for payload in BAD_PAYLOADS:
+        assert client.post("/api/stream/gps", json=payload).status_code == 400
+    # Each bad message gets an error reply and the socket stays open
+    with client.websocket_connect("/ws/gps") as ws:
+        for payload in BAD_PAYLOADS:
+            ws.send_text(json.dumps(payload))
+            assert "error" in ws.receive_json()
@@ -0,0 +1,94 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from data_loader import update_order_cache
+from training import StageTimer, build_feature_store, time_split, train_full
+
+def _order_cache(tmp_path, n_days=6, n_couriers=40):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    rng = np.random.default_rng(0)
+    for day in range(n_days):
+        rows = []
+        for courier in range(n_couriers):
+            n_points = int(rng.integers(5, 30))
+            # Some couriers dawdle, so both sides of the SLA are present
+            gps_time = 1_600_000_000 + day * 86400 + np.sort(rng.uniform(0, rng.uniform(1, 4) * 3600, n_points))
+            rows.append(pd.DataFrame({
+                "ds": 500 + day,
+                "postman_id": courier,
+                "gps_time": gps_time,
+                "lat": 30.0 + rng.normal(0, 0.003, n_points).cumsum(),
+                "lng": 120.0 + rng.normal(0, 0.003, n_points).cumsum()
+            }))
+        pd.concat(rows).to_parquet(raw / f"day{day}.parquet")
+    update_order_cache(str(raw), dataset_dir=str(tmp_path / "orders"))
+    return str(tmp_path / "orders")
+
+def test_feature_store_reads_epoch_seconds(tmp_path):
+    # Caches written from raw LaDe can hold accept_time as epoch seconds
+    rng = np.random.default_rng(0)
+    accept = rng.integers(1_600_000_000, 1_700_000_000, 300)
+    pd.DataFrame({
+        "courier_id": rng.integers(0, 10, 300),
+        "accept_time": accept,
+        "promise_time": accept + 3600,
+        "finish_time": accept + rng.integers(600, 7200, 300),
+        "distance": rng.uniform(0.1, 20, 300),
+        "weather": "Sunny"
+    }).to_parquet(tmp_path / "orders.parquet")
+    pipeline, n = build_feature_store([str(tmp_path / "orders.parquet")], str(tmp_path / "features"), batch_rows=64)
+    assert n == 300
+    t = np.load(tmp_path / "features" / "t.npy")[:n]
+    np.testing.assert_array_equal(t, accept * 10**9)
+    # The split and the time features agree on when each order happened
+    X = np.load(tmp_path / "features" / "X.npy")[:n]
+    np.testing.assert_array_equal(X[:, 0], pd.to_datetime(accept, unit="s").hour)
+
+def test_time_split_orders_windows():
+    t = np.random.default_rng(0).permutation(1000)
+    train, tune, test = time_split(t)
+    assert len(train) + len(tune) + len(test) == 1000
+    assert t[train].max() < t[tune].min() and t[tune].max() < t[test].min()
+    assert abs(len(train) - 700) <= 1 and abs(len(tune) - 100) <= 1
+
+def test_stage_timer_traces_only_when_asked():
+    timer = StageTimer()
+    with timer.stage("untraced"):
+        pass
+    traced = StageTimer(trace_memory=True)
+    with traced.stage("traced"):
+        np.ones(1_000_000)
+    traced.close()
+    assert timer.stages[0]["traced_peak_mb"] is None
+    assert traced.stages[0]["traced_peak_mb"] >= 7
+
+@pytest.mark.parametrize("backend, params", [
+    ("sklearn", {"max_depth": 4, "min_samples_leaf": 5, "max_features": None}),
+    ("xgboost", {"max_depth": 3, "min_child_weight": 5})
+])
+def test_train_full_end_to_end(tmp_path, monkeypatch, backend, params):
+    if backend == "xgboost":
+        pytest.importorskip("xgboost")
+    dataset_dir = _order_cache(tmp_path)
+    monkeypatch.chdir(tmp_path) # model_meta.json is written relative to the working directory
+    report = train_full(dataset_dir=dataset_dir, store_dir=str(tmp_path / "features"), backend=backend, n_jobs=1,
+                        grid=[params], pipeline_path=str(tmp_path / "pipeline.pkl"),
+                        forest_path=str(tmp_path / "forest.npz"), predictions_dir=str(tmp_path / "preds"),
+                        report_path=str(tmp_path / "report.json"))
+
+    assert report["rows"] == 240
+    assert sum(report["split"].values()) == report["rows"]
+    assert [s["stage"] for s in report["stages"]] == ["features", "split", "search", "final_fit", "evaluate", "save"]
+    assert json.load(open(tmp_path / "report.json"))["best"] == report["best"]
+
+    # Saved in the backend's native format; only forests get a compiled scorer
+    from model_backend import load_model
+    assert load_model(str(tmp_path / "model_meta.json")).name == backend
+    assert (tmp_path / "forest.npz").exists() == (backend == "sklearn")
+
+    from prediction_store import PredictionStore
+    store = PredictionStore.load(str(tmp_path / "preds"))
+    assert store.n == report["split"]["test"]
+    assert {"start_cell", "end_cell", "courier_id"} <= set(store.segments)
@@ -0,0 +1,25 @@
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from tree_scorer import CompiledForest, export_forest, random_feature_matrix
+
+def _fitted_forest(n_features=6):
+    X = random_feature_matrix(2000, n_features, seed=0)
+    y = ((X[:, 3] > 2.5) ^ (X[:, 0] > 17)).astype(int)
+    # sklearn trees route NaN, so the training set keeps its missing values
+    return RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0).fit(X, y)
+
+def test_compiled_forest_matches_sklearn(tmp_path):
+    model = _fitted_forest()
+    path = str(tmp_path / "forest.npz")
+    export_forest(model, path, n_check=1000)
+    forest = CompiledForest.load(path)
+
+    X = random_feature_matrix(5000, model.n_features_in_, seed=1)
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(X)[:, 1], atol=1e-9)
+
+def test_compiled_forest_single_row():
+    model = _fitted_forest()
+    forest = CompiledForest.from_sklearn(model)
+    X = random_feature_matrix(1, model.n_features_in_, seed=2)
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(X)[:, 1], atol=1e-9)
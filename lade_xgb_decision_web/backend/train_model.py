@@ -1,51 +1,76 @@
 
-import xgboost as xgb
-import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, roc_auc_score, confusion_matrix
-import joblib
 import logging
-from data_loader import load_lade_data
-from feature_engineering import engineering_features
+from data_loader import load_lade_data, DEFAULT_MAX_POINTS
+from feature_engineering import engineering_features, INPUT_COLUMNS, ROUTE_KEY_COLUMNS
+from tree_scorer import export_forest
+from prediction_store import PredictionStore, PREDICTIONS_DIR
+from model_backend import make_classifier, save_model, MODEL_META_PATH
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 MODEL_PATH = "model.pkl"
-ENCODER_PATH = "encoders.pkl"
+XGB_MODEL_PATH = "model.ubj"
+PIPELINE_PATH = "pipeline.pkl"
+FOREST_PATH = "forest.npz"
 
-def train_pipeline():
+def validation_segments(X, pipeline):
+    """
+    Per-row segment labels stored with the validation predictions:
+    each categorical feature (decoded) and the hour of day.
+    """
+    segments = {"hour_of_day": X[:, pipeline.feature_names.index('hour_of_day')].astype(np.int64)}
+    for col, categories in pipeline.categories.items():
+        codes = X[:, pipeline.feature_names.index(col)].astype(np.int64)
+        # Code -1 (unseen label) indexes the trailing "Unknown"
+        labels = np.asarray(list(categories) + ["Unknown"], dtype=object)
+        segments[col] = labels[codes]
+    return segments
+
+def train_pipeline(backend="xgboost", max_points=DEFAULT_MAX_POINTS):
+    """
+    Args:
+        backend (str): "xgboost" (histogram boosting, saved as model.ubj) or
+            "sklearn" (RandomForest baseline, saved as model.pkl).
+        max_points (int): Raw points streamed to build the order cache if
+            there is none yet; an existing cache is sampled as is.
+    """
     # 1. Load Data
     logger.info("Loading Data...")
-    # Using small sample for quick dev, set higher for production
-    df = load_lade_data(sample_size=50000) 
+    # Small sample for quick dev; `--full` trains on the whole history
+    df = load_lade_data(sample_size=50000, columns=INPUT_COLUMNS + ROUTE_KEY_COLUMNS, max_points=max_points)
     
     # 2. FE
     logger.info("Feature Engineering...")
-    X, y, encoders = engineering_features(df)
+    X, y, pipeline, rows = engineering_features(df, return_rows=True)
     
-    # Save encoders
-    joblib.dump(encoders, ENCODER_PATH)
-    logger.info(f"Encoders saved to {ENCODER_PATH}")
+    # Save the fitted pipeline next to the model; serving reuses the same transform
+    pipeline.save(PIPELINE_PATH)
+    logger.info(f"Feature pipeline saved to {PIPELINE_PATH}")
     
     # 3. Slit
     # Time-based split is better, but random for now for simplicity
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    # Split the row positions too, to look up the test rows' route keys
+    X_train, X_test, y_train, y_test, _, test_rows = train_test_split(
+        X, y, rows, test_size=0.2, random_state=42, stratify=y
+    )
     
-    # 4. Train XGBoost
-    logger.info("Training XGBoost...")
+    # 4. Train
+    logger.info(f"Training ({backend})...")
     # Calculate scale weight safely
     neg_count = len(y_train[y_train==0])
     pos_count = len(y_train[y_train==1])
     scale_weight = neg_count / pos_count if pos_count > 0 else 1.0
 
-    # model = xgb.XGBClassifier(...) # XGBoost causing persistent TypeErrors in this env
-    from sklearn.ensemble import RandomForestClassifier
-    model = RandomForestClassifier(n_estimators=100, max_depth=6, random_state=42)
-    
+    model = make_classifier(backend, scale_pos_weight=scale_weight)
     model.fit(X_train, y_train)
+    if backend == "sklearn":
+        # Serve single-threaded: tiny batches don't benefit from a thread pool
+        model.n_jobs = None
     
     # 5. Evaluate
     logger.info("Evaluating...")
@@ -62,19 +87,60 @@ def train_pipeline():
     print(f"Confusion Matrix:\n{cm}")
     
     # Save Validation Predictions for What-If Simulation
-    val_df = pd.DataFrame({
-        'y_true': y_test,
-        'y_prob': y_prob
-    })
-    val_preds_path = "validation_preds.csv"
-    val_df.to_csv(val_preds_path, index=False)
-    logger.info(f"Validation predictions saved to {val_preds_path}")
+    # Binary columns (uint8 labels, float32 probs) plus segment labels per row
+    segments = validation_segments(X_test, pipeline)
+    for col in ROUTE_KEY_COLUMNS:
+        # -1 when the cache predates the column (e.g. no start/end cells)
+        segments[col] = df[col].to_numpy()[test_rows] if col in df.columns else np.full(len(test_rows), -1)
+    store = PredictionStore.from_arrays(y_test, y_prob, segments)
+    store.save(PREDICTIONS_DIR)
+    logger.info(f"Validation predictions saved to {PREDICTIONS_DIR}")
+    
+    # 6. Save Model (native format + metadata naming the backend for InferenceEngine)
+    save_model(
+        model, MODEL_META_PATH,
+        model_path=XGB_MODEL_PATH if backend == "xgboost" else MODEL_PATH,
+        feature_names=pipeline.feature_names,
+        extra={"scale_pos_weight": scale_weight, "auc": float(auc)}
+    )
     
-    # 6. Save Model
-    # model.save_model(MODEL_PATH)
-    # Joblib is already imported globally
-    joblib.dump(model, MODEL_PATH)
-    logger.info(f"Model saved to {MODEL_PATH}")
+    # 7. Export packed node arrays for the compiled scorer (forests only)
+    if backend == "sklearn":
+        export_forest(model, FOREST_PATH)
 
 if __name__ == "__main__":
-    train_pipeline()
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["xgboost", "sklearn"], default="xgboost",
+                        help="Model backend (sklearn = RandomForest baseline); applies to --full too")
+    parser.add_argument("--publish", action="store_true",
+                        help="Copy the new artifacts into the versioned registry and activate them")
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS,
+                        help="Quick run: raw points streamed to build the order cache when there is none")
+    parser.add_argument("--full", action="store_true",
+                        help="Ingest all of --source into the order cache, then train on it "
+                             "(streamed features, time split, parallel search)")
+    parser.add_argument("--source", default="huggingface",
+                        help="With --full: huggingface, or a local raw .parquet/.csv file or directory")
+    parser.add_argument("--n-jobs", type=int, default=None, help="Worker processes for the search (default: all cores)")
+    parser.add_argument("--search-rows", type=int, default=1_000_000, help="Training rows per search candidate")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="With --full, record tracemalloc peaks per stage (slows training)")
+    args = parser.parse_args()
+
+    if args.full:
+        from data_loader import update_order_cache
+        from training import train_full
+        # Full ingestion: every raw point; unchanged sources are skipped
+        update_order_cache(args.source, max_points=None)
+        train_full(backend=args.backend, n_jobs=args.n_jobs, search_rows=args.search_rows,
+                   model_path=XGB_MODEL_PATH if args.backend == "xgboost" else MODEL_PATH,
+                   pipeline_path=PIPELINE_PATH, forest_path=FOREST_PATH,
+                   trace_memory=args.trace_memory)
+    else:
+        train_pipeline(backend=args.backend, max_points=args.max_points)
+
+    if args.publish:
+        # Serving workers watching the registry load, warm and swap to it
+        from model_registry import publish
+        publish(".")
@@ -0,0 +1,389 @@
+
+import json
+import logging
+import os
+import resource
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as pads
+from data_loader import order_cache_files, ORDERS_DIR
+from feature_engineering import FeaturePipeline, build_target, _to_datetime, CAT_FEATS, ROUTE_KEY_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+FEATURES_DIR = "data_cache/features"
+REPORT_PATH = "training_report.json"
+
+# Columns the feature pass needs from the order cache
+SOURCE_COLUMNS = ROUTE_KEY_COLUMNS + ['accept_time', 'order_time', 'finish_time', 'delivery_time',
+                  'promise_time', 'distance'] + CAT_FEATS
+
+# Candidate hyperparameters for the search, per model backend; tree count
+# is found by early stopping
+DEFAULT_GRIDS = {
+    "sklearn": [
+        {"max_depth": depth, "min_samples_leaf": leaf, "max_features": features}
+        for depth in (6, 10, 14)
+        for leaf in (1, 50)
+        for features in ("sqrt", None)
+    ],
+    "xgboost": [
+        {"max_depth": depth, "min_child_weight": weight, "colsample_bytree": colsample}
+        for depth in (4, 6, 8)
+        for weight in (1, 50)
+        for colsample in (0.8, 1.0)
+    ]
+}
+
+class StageTimer:
+    """
+    Logs wall-clock time and memory for each named stage of a run: the
+    peak resident size so far of this process and its pool workers and,
+    with `trace_memory`, peak traced allocations during the stage (NumPy
+    and Python objects). Tracing slows allocation-heavy code, so it is off
+    by default.
+    """
+    def __init__(self, trace_memory=False):
+        self.stages = []
+        self.trace_memory = trace_memory
+        self._started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    def close(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+class _Stage:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        logger.info(f"[{self.name}] started")
+        if self.timer.trace_memory:
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        traced_peak = tracemalloc.get_traced_memory()[1] if self.timer.trace_memory else None
+        # ru_maxrss is in KiB on Linux
+        record = {
+            "stage": self.name,
+            "seconds": round(elapsed, 3),
+            "traced_peak_mb": round(traced_peak / 2**20, 1) if traced_peak is not None else None,
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "workers_max_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+        }
+        self.timer.stages.append(record)
+        traced = f", traced peak {record['traced_peak_mb']} MB" if traced_peak is not None else ""
+        logger.info(f"[{self.name}] {record['seconds']:.2f}s{traced}, "
+                    f"max RSS {record['max_rss_mb']} MB (workers {record['workers_max_rss_mb']} MB)")
+        return False
+
+def _open_array(out_dir, name):
+    return np.load(os.path.join(out_dir, name + ".npy"), mmap_mode="r")
+
+def build_feature_store(files, out_dir=FEATURES_DIR, batch_rows=262_144):
+    """
+    Streams the order cache into on-disk feature arrays without ever holding
+    the dataset in memory.
+
+    Pass 1 reads only the categorical columns to learn the vocabularies;
+    pass 2 transforms one record batch at a time and appends the valid rows
+    to memory-mapped .npy files: X (float32), y (uint8), accept time (int64
+    ns, for the time split) and the route keys (courier id, start/end cell).
+
+    Returns:
+        tuple: (fitted FeaturePipeline, number of rows written)
+    """
+    dataset = pads.dataset(files, format="parquet")
+    columns = [c for c in SOURCE_COLUMNS if c in dataset.schema.names]
+    if 'accept_time' not in columns and 'order_time' in columns:
+        columns.append('order_time')
+
+    cat_cols = [c for c in CAT_FEATS if c in columns]
+    vocab = {col: set() for col in cat_cols}
+    if cat_cols:
+        for batch in dataset.to_batches(columns=cat_cols, batch_size=batch_rows):
+            for col in cat_cols:
+                vocab[col].update(batch.column(col).unique().to_pylist())
+    pipeline = FeaturePipeline()
+    pipeline.categories = {col: pd.Index(np.unique(np.array([str(v) for v in values]))) for col, values in vocab.items()}
+    pipeline.feature_names = pipeline.feature_names + cat_cols
+
+    os.makedirs(out_dir, exist_ok=True)
+    capacity = dataset.count_rows()
+    open_memmap = np.lib.format.open_memmap
+    X_out = open_memmap(os.path.join(out_dir, "X.npy"), mode="w+", dtype=np.float32,
+                        shape=(capacity, len(pipeline.feature_names)))
+    y_out = open_memmap(os.path.join(out_dir, "y.npy"), mode="w+", dtype=np.uint8, shape=(capacity,))
+    t_out = open_memmap(os.path.join(out_dir, "t.npy"), mode="w+", dtype=np.int64, shape=(capacity,))
+    key_out = {col: open_memmap(os.path.join(out_dir, col + ".npy"), mode="w+", dtype=np.int64, shape=(capacity,))
+               for col in ROUTE_KEY_COLUMNS}
+
+    n = 0
+    for batch in dataset.to_batches(columns=columns, batch_size=batch_rows):
+        df = batch.to_pandas()
+        if 'accept_time' not in df.columns and 'order_time' in df.columns:
+            df = df.rename(columns={'order_time': 'accept_time'})
+        X = pipeline.transform(df)
+        y = build_target(df)
+        keep = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+        k = int(keep.sum())
+
+        X_out[n:n + k] = X[keep]
+        y_out[n:n + k] = y[keep]
+        # Same parsing as the time features (numbers are epoch seconds)
+        t_out[n:n + k] = _to_datetime(df['accept_time'].to_numpy()).astype(np.int64)[keep]
+        for col, out in key_out.items():
+            out[n:n + k] = df[col].to_numpy()[keep] if col in df.columns else -1
+        n += k
+
+    for arr in (X_out, y_out, t_out, *key_out.values()):
+        arr.flush()
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump({"rows": n, "capacity": capacity, "feature_names": pipeline.feature_names}, f)
+    logger.info(f"Feature store: {n:,} of {capacity:,} rows usable, written to {out_dir}")
+    return pipeline, n
+
+def time_split(t, fractions=(0.7, 0.1)):
+    """
+    Splits rows by accept time: the earliest `fractions[0]` for training,
+    the next `fractions[1]` for tuning, the most recent remainder for test.
+    Returns sorted row index arrays (train, tune, test).
+    """
+    cuts = np.quantile(t, [fractions[0], fractions[0] + fractions[1]])
+    train = np.flatnonzero(t < cuts[0])
+    tune = np.flatnonzero((t >= cuts[0]) & (t < cuts[1]))
+    test = np.flatnonzero(t >= cuts[1])
+    return train, tune, test
+
+def _log_loss(y, p):
+    p = np.clip(p, 1e-7, 1 - 1e-7)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+def _scale_pos_weight(y):
+    # Negatives / positives, as in `train_model.train_pipeline`
+    pos = int(np.count_nonzero(y))
+    return (len(y) - pos) / pos if pos > 0 else 1.0
+
+def _grow_forest(task, X_train, y_train, X_tune, y_tune):
+    """
+    Grows a RandomForest `tree_step` trees at a time (warm start) until
+    tune log-loss fails to improve for `patience` steps. Returns
+    (tree count, log-loss, tune probabilities) at the best step.
+    """
+    from model_backend import make_classifier
+
+    model = make_classifier("sklearn", n_jobs=1, n_estimators=0, warm_start=True, **task["params"])
+    best_loss, best_trees, best_prob, stale = np.inf, 0, None, 0
+    while model.n_estimators < task["max_trees"]:
+        model.n_estimators += task["tree_step"]
+        model.fit(X_train, y_train)
+        prob = model.predict_proba(X_tune)[:, 1]
+        loss = _log_loss(y_tune, prob)
+        if loss < best_loss - 1e-5:
+            best_loss, best_trees, best_prob, stale = loss, model.n_estimators, prob, 0
+        else:
+            stale += 1
+            if stale >= task["patience"]:
+                break
+    return best_trees, best_loss, best_prob
+
+def _boost(task, X_train, y_train, X_tune, y_tune):
+    """
+    Boosts up to `max_trees` rounds with XGBoost's own early stopping on
+    tune log-loss (`tree_step * patience` rounds without improvement).
+    Returns (tree count, log-loss, tune probabilities) at the best round.
+    """
+    from model_backend import make_classifier
+
+    model = make_classifier("xgboost", scale_pos_weight=_scale_pos_weight(y_train), n_jobs=1,
+                            n_estimators=task["max_trees"],
+                            early_stopping_rounds=task["tree_step"] * task["patience"], **task["params"])
+    model.fit(X_train, y_train, eval_set=[(X_tune, y_tune)], verbose=False)
+    best_trees = model.best_iteration + 1
+    prob = model.predict_proba(X_tune, iteration_range=(0, best_trees))[:, 1]
+    return best_trees, _log_loss(y_tune, prob), prob
+
+def _fit_candidate(task):
+    """
+    Pool worker: fits one parameter set of the task's backend, finding its
+    tree count by early stopping on the tuning window. Reads the feature
+    store through memory maps, so workers share the page cache rather than
+    pickled copies of the data.
+    """
+    from cost_evaluation import ThresholdIndex
+
+    start = time.perf_counter()
+    X = _open_array(task["store_dir"], "X")
+    y = _open_array(task["store_dir"], "y")
+    train_idx = np.load(task["train_idx_path"])
+    tune_idx = np.load(task["tune_idx_path"])
+    X_train, y_train = X[train_idx], y[train_idx]
+    X_tune, y_tune = X[tune_idx], y[tune_idx].astype(np.int64)
+
+    fit = _boost if task["backend"] == "xgboost" else _grow_forest
+    best_trees, best_loss, best_prob = fit(task, X_train, y_train, X_tune, y_tune)
+
+    # Cost-optimal threshold on the tuning window at the best tree count
+    index = ThresholdIndex(y_tune, best_prob)
+    threshold = float(index.optimal_thresholds(task["cost_fn"], task["cost_fp"])[0])
+    impact = index.impact(threshold, task["cost_fn"], task["cost_fp"])
+    return {
+        "params": task["params"],
+        "n_estimators": best_trees,
+        "tune_log_loss": best_loss,
+        "threshold": threshold,
+        "tune_cost": float(impact["total_cost"]),
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+
+def search_hyperparameters(store_dir, train_idx, tune_idx, backend="xgboost", grid=None, n_jobs=None,
+                           search_rows=1_000_000, tree_step=25, max_trees=300, patience=2,
+                           cost_fn=50000, cost_fp=10000, seed=42):
+    """
+    Evaluates every parameter set in `grid` (default: the backend's entry
+    in DEFAULT_GRIDS) across a process pool.
+
+    Candidates train on at most `search_rows` training rows (a uniform
+    subsample keeps the search affordable on the full history) and are
+    ranked by expected cost on the tuning window at their own cost-optimal
+    threshold.
+
+    Returns:
+        list: Result dicts, best first.
+    """
+    if backend not in DEFAULT_GRIDS:
+        raise ValueError(f"Unknown model backend: {backend}")
+    rng = np.random.default_rng(seed)
+    if len(train_idx) > search_rows:
+        train_idx = np.sort(rng.choice(train_idx, size=search_rows, replace=False))
+    train_idx_path = os.path.join(store_dir, "search_train_idx.npy")
+    tune_idx_path = os.path.join(store_dir, "search_tune_idx.npy")
+    np.save(train_idx_path, train_idx)
+    np.save(tune_idx_path, tune_idx)
+
+    tasks = [{
+        "store_dir": store_dir, "train_idx_path": train_idx_path, "tune_idx_path": tune_idx_path,
+        "backend": backend, "params": params, "tree_step": tree_step, "max_trees": max_trees, "patience": patience,
+        "cost_fn": cost_fn, "cost_fp": cost_fp
+    } for params in (grid or DEFAULT_GRIDS[backend])]
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs == 1:
+        results = [_fit_candidate(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+            results = list(pool.map(_fit_candidate, tasks))
+
+    results.sort(key=lambda r: (r["tune_cost"], r["tune_log_loss"]))
+    for r in results:
+        logger.info(f"  {r['params']} trees={r['n_estimators']} log_loss={r['tune_log_loss']:.4f} "
+                    f"cost={r['tune_cost']:,.0f} @ {r['threshold']:.3f} ({r['seconds']}s)")
+    return results
+
+def train_full(dataset_dir=ORDERS_DIR, store_dir=FEATURES_DIR, backend="xgboost", n_jobs=None, grid=None,
+               search_rows=1_000_000, cost_fn=50000, cost_fp=10000,
+               model_path=None, pipeline_path="pipeline.pkl", forest_path="forest.npz",
+               predictions_dir=None, report_path=REPORT_PATH, trace_memory=False):
+    """
+    Full-history training: streamed features, time-based split, parallel
+    hyperparameter/threshold search, final multi-core fit on train+tune,
+    evaluation on the most recent window. Writes the same artifacts as
+    `train_model.train_pipeline` plus a JSON report with per-stage timings.
+
+    Features are built without holding the dataset in memory, and each
+    search candidate reads at most `search_rows`. The final fit is the
+    exception: both backends need the train+tune rows of X in RAM (4 bytes per
+    feature per row, ~24 MB per million rows with the 6 current features), and the
+    test window is likewise loaded for evaluation.
+
+    Args:
+        backend (str): "xgboost" (saved as model.ubj) or "sklearn"
+            (RandomForest baseline, saved as model.pkl plus the compiled
+            forest at `forest_path`), as in `train_model.train_pipeline`.
+        grid (list): Parameter sets to search; defaults to DEFAULT_GRIDS[backend].
+        model_path (str): Defaults to the backend's native file name.
+        trace_memory (bool): Also record tracemalloc peaks per stage (slower).
+    """
+    from sklearn.metrics import roc_auc_score
+    from prediction_store import PredictionStore, PREDICTIONS_DIR
+    from tree_scorer import export_forest
+    from model_backend import make_classifier, save_model, MODEL_META_PATH
+    from train_model import validation_segments
+
+    timer = StageTimer(trace_memory=trace_memory)
+    files = order_cache_files(dataset_dir)
+    if not files:
+        raise ValueError(f"No order cache found in {dataset_dir}; build it with update_order_cache first.")
+
+    with timer.stage("features"):
+        pipeline, n = build_feature_store(files, store_dir)
+        pipeline.save(pipeline_path)
+
+    with timer.stage("split"):
+        t = _open_array(store_dir, "t")[:n]
+        train_idx, tune_idx, test_idx = time_split(t)
+        logger.info(f"Time split: train {len(train_idx):,} / tune {len(tune_idx):,} / test {len(test_idx):,}")
+
+    with timer.stage("search"):
+        results = search_hyperparameters(store_dir, train_idx, tune_idx, backend=backend, grid=grid, n_jobs=n_jobs,
+                                         search_rows=search_rows, cost_fn=cost_fn, cost_fp=cost_fp)
+        best = results[0]
+
+    X = _open_array(store_dir, "X")
+    y = _open_array(store_dir, "y")
+    with timer.stage("final_fit"):
+        fit_idx = np.sort(np.r_[train_idx, tune_idx])
+        y_fit = y[fit_idx]
+        scale_weight = _scale_pos_weight(y_fit)
+        model = make_classifier(backend, scale_pos_weight=scale_weight, n_jobs=n_jobs or -1,
+                                n_estimators=max(best["n_estimators"], 1), **best["params"])
+        # The one stage that holds the train+tune rows in memory
+        model.fit(X[fit_idx], y_fit)
+        if backend == "sklearn":
+            # Serve single-threaded: tiny batches don't benefit from a thread pool
+            model.n_jobs = None
+
+    with timer.stage("evaluate"):
+        X_test, y_test = X[test_idx], y[test_idx].astype(np.int64)
+        y_prob = model.predict_proba(X_test)[:, 1]
+        auc = float(roc_auc_score(y_test, y_prob)) if len(np.unique(y_test)) > 1 else None
+        logger.info(f"Test AUC (most recent window): {auc}")
+
+    with timer.stage("save"):
+        segments = validation_segments(X_test, pipeline)
+        for col in ROUTE_KEY_COLUMNS:
+            segments[col] = _open_array(store_dir, col)[test_idx]
+        PredictionStore.from_arrays(y_test, y_prob, segments).save(predictions_dir or PREDICTIONS_DIR)
+        save_model(model, MODEL_META_PATH, model_path=model_path, feature_names=pipeline.feature_names,
+                   extra={"scale_pos_weight": scale_weight, "test_auc": auc})
+        # Packed node arrays for the compiled scorer (forests only)
+        if backend == "sklearn":
+            export_forest(model, forest_path)
+
+    report = {
+        "backend": backend,
+        "rows": int(n),
+        "split": {"train": len(train_idx), "tune": len(tune_idx), "test": len(test_idx)},
+        "best": best,
+        "candidates": results,
+        "test_auc": auc,
+        "stages": timer.stages
+    }
+    timer.close()
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Training report written to {report_path}")
+    return report
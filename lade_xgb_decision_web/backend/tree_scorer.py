@@ -0,0 +1,174 @@
+
+import numpy as np
+import joblib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = "model.pkl"
+FOREST_PATH = "forest.npz"
+
+class CompiledForest:
+    """
+    Tree ensemble flattened into packed NumPy node arrays.
+
+    All trees share one set of arrays; `roots[k]` is the first node of tree k
+    and child indices are absolute. Leaves point to themselves, so a batch
+    can walk every tree in lock-step for `max_depth` levels without
+    branching on leaf status. `value` holds the positive-class probability
+    of each node.
+    """
+    ARRAYS = ("feature", "threshold", "left", "right", "missing_left", "value", "roots")
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots, max_depth, children=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        # Interleaved (left, right) so each level is a single gather; may be
+        # passed in prebuilt (e.g. memory-mapped) to avoid a per-process copy
+        if children is None:
+            children = np.ascontiguousarray(np.stack([left, right], axis=1).ravel())
+        self.children = children
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Flattens a fitted sklearn forest (or single decision tree) classifier.
+        """
+        estimators = getattr(model, "estimators_", [model])
+        pos_col = list(model.classes_).index(1)
+
+        parts = {name: [] for name in ("feature", "threshold", "left", "right", "missing_left", "value")}
+        roots = []
+        offset = 0
+        max_depth = 0
+        for est in estimators:
+            tree = est.tree_
+            n = tree.node_count
+            ids = np.arange(n, dtype=np.int32) + offset
+            is_leaf = tree.children_left == -1
+
+            parts["feature"].append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            parts["threshold"].append(np.where(is_leaf, 0.0, tree.threshold))
+            parts["left"].append(np.where(is_leaf, ids, tree.children_left + offset).astype(np.int32))
+            parts["right"].append(np.where(is_leaf, ids, tree.children_right + offset).astype(np.int32))
+            # Older sklearn trees have no missing-value routing: NaN fails `<=` and goes right
+            missing = getattr(tree, "missing_go_to_left", np.zeros(n, dtype=np.uint8))
+            parts["missing_left"].append(np.asarray(missing, dtype=bool))
+
+            # Normalize per node, as DecisionTreeClassifier.predict_proba does
+            counts = tree.value[:, 0, :]
+            parts["value"].append(counts[:, pos_col] / counts.sum(axis=1))
+
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        arrays = {name: np.ascontiguousarray(np.concatenate(vals)) for name, vals in parts.items()}
+        return cls(roots=np.array(roots, dtype=np.int32), max_depth=max_depth, **arrays)
+
+    def predict_proba(self, X, chunk_rows=4096):
+        """
+        Positive-class probability, averaged over trees.
+        Args:
+            X (np.ndarray): float32 feature matrix, columns in training order.
+            chunk_rows (int): Rows walked at once; keeps the working set in cache.
+        Returns:
+            np.ndarray: float64 probabilities, shape (n_rows,).
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), chunk_rows):
+            out[start:start + chunk_rows] = self._walk(X[start:start + chunk_rows])
+        return out
+
+    def _walk(self, X):
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        flat_x = X.ravel()
+        has_nan = np.isnan(flat_x).any()
+        # Offset of each (row, tree) pair's row inside the flattened X
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, n_trees)
+
+        # One node per (row, tree); every tree advances one level per step
+        node = np.tile(self.roots, n_rows)
+        for _ in range(self.max_depth):
+            x = flat_x[row_offset + self.feature[node]]
+            # float32 inputs against float64 thresholds, same comparison as sklearn
+            go_right = ~(x <= self.threshold[node])
+            if has_nan:
+                go_right &= ~(np.isnan(x) & self.missing_left[node])
+            node = self.children[2 * node + go_right]
+
+        return self.value[node].reshape(n_rows, n_trees).mean(axis=1)
+
+    def save(self, path=FOREST_PATH):
+        np.savez(path, max_depth=self.max_depth, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path=FOREST_PATH):
+        with np.load(path) as data:
+            return cls(max_depth=int(data["max_depth"]), **{name: data[name] for name in cls.ARRAYS})
+
+def random_feature_matrix(n_rows, n_features, seed=0):
+    """
+    Inputs spanning the model's feature ranges, with a few unseen (-1)
+    categoricals and missing values mixed in.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_rows, n_features), dtype=np.float32)
+    X[:, 0] = rng.integers(0, 24, n_rows)
+    X[:, 1] = rng.integers(0, 7, n_rows)
+    X[:, 2] = X[:, 1] >= 5
+    X[:, 3] = np.log1p(rng.uniform(0, 60, n_rows))
+    if n_features > 4:
+        X[:, 4:] = rng.integers(-1, 4, (n_rows, n_features - 4))
+    X[rng.random((n_rows, n_features)) < 0.01] = np.nan
+    return X
+
+def check_parity(forest, model, X, atol=1e-9):
+    """
+    Max absolute difference between the compiled forest and sklearn's
+    predict_proba on `X`. Raises ValueError if it exceeds `atol`.
+    """
+    expected = model.predict_proba(X)[:, 1]
+    diff = float(np.max(np.abs(forest.predict_proba(X) - expected))) if len(X) else 0.0
+    if diff > atol:
+        raise ValueError(f"Compiled forest diverges from sklearn (max abs diff {diff:.3g})")
+    return diff
+
+def export_forest(model, path=FOREST_PATH, n_check=10_000):
+    """
+    Export step: flattens `model`, verifies parity against sklearn and
+    writes the packed node arrays to `path`.
+    """
+    forest = CompiledForest.from_sklearn(model)
+    diff = check_parity(forest, model, random_feature_matrix(n_check, model.n_features_in_))
+    forest.save(path)
+    logger.info(f"Compiled forest saved to {path} ({len(forest.value)} nodes, parity max diff {diff:.2g})")
+    return forest
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    model = joblib.load(MODEL_PATH)
+    forest = export_forest(model)
+
+    # Parity on a larger batch, then latency/throughput vs sklearn
+    X = random_feature_matrix(100_000, model.n_features_in_, seed=1)
+    print(f"Parity max abs diff: {check_parity(forest, model, X):.3g}")
+
+    for n_rows in (1, 100, 100_000):
+        batch = X[:n_rows]
+        reps = max(1, 1000 // n_rows)
+        for name, fn in (("sklearn", lambda b: model.predict_proba(b)[:, 1]), ("compiled", forest.predict_proba)):
+            start = time.perf_counter()
+            for _ in range(reps):
+                fn(batch)
+            elapsed = (time.perf_counter() - start) / reps
+            print(f"{name:>8} | {n_rows:>7,} rows | {elapsed * 1e6:>12,.0f} us/call | {n_rows / elapsed:>12,.0f} rows/s")
@@ -1,56 +1,210 @@
 
-import pandas as pd
 import numpy as np
-from cost_evaluation import calculate_financial_impact, estimate_risk_exposure
+import os
+from cost_evaluation import ThresholdIndex, segment_counts
+from prediction_store import PredictionStore, PREDICTIONS_DIR, LEGACY_CSV_PATH
+from result_cache import artifact_version
+from spatial import RegionIndex
 import logging
 
 logger = logging.getLogger(__name__)
 
 class SimulationEngine:
-    def __init__(self, validation_data_path="validation_preds.csv"):
-        # We assume validation data (X, y_true, y_prob) is saved after training
+    def __init__(self, validation_data_path=PREDICTIONS_DIR, legacy_csv_path=LEGACY_CSV_PATH, shared_dir=None,
+                 model_path="model.pkl"):
+        # We assume validation data (y_true, y_prob, segments) is saved after training
         # If not, we might need to load valid set and predict once.
         self.data_path = validation_data_path
-        self.df = None
+        self.legacy_csv_path = legacy_csv_path
+        self.store = None
+        self.y_true = None
+        self.y_prob = None
+        # Segment name -> (per-row int codes, labels), e.g. courier_id, hour_of_day
+        self.segments = {}
+        # Segment name -> RegionIndex, built on first regional query
+        self.regions = {}
+        self.index = None
+        self.model_path = model_path
+        # Stamp of the loaded predictions and model; keys result caches
+        self.version = None
+        # Directory written by shared_artifacts.export_shared_artifacts (multi-worker serving)
+        self.shared_dir = shared_dir
         
     def load_data(self):
-        if self.df is None:
-            # For now, we mock or load. Real impl should save validation probs during training.
-            # Let's assume train_model.py saves a 'validation_preds.csv' with columns: [true_label, prob]
-            try:
-                self.df = pd.read_csv(self.data_path)
-            except:
-                logger.warning("Validation predictions not found. Using mock data for simulation test.")
-                self.df = pd.DataFrame({
-                    'y_true': np.random.randint(0, 2, 1000),
-                    'y_prob': np.random.uniform(0, 1, 1000)
-                })
-
-    def run_simulation(self, threshold, cost_fn, cost_fp):
+        if self.index is not None:
+            return
+        if self.shared_dir:
+            # Memory-mapped arrays and a prebuilt index, exported by the parent process
+            from shared_artifacts import attach_validation
+            attached = attach_validation(self.shared_dir)
+            if attached is None:
+                raise ValueError(f"No validation predictions in {self.shared_dir}")
+            self.y_true, self.y_prob, self.index, self.segments = attached
+            self.version = artifact_version([self.shared_dir])
+            return
+
+        if PredictionStore.exists(self.data_path):
+            self.store = PredictionStore.load(self.data_path)
+            self.version = artifact_version([self.data_path, self.model_path])
+        elif os.path.exists(self.legacy_csv_path):
+            # Older training runs wrote CSV. Read it in memory only: artifact
+            # directories may be memory-mapped by other workers or be an
+            # immutable registry version, so conversion happens at publish
+            # or server start (see prediction_store.convert_csv)
+            logger.info(f"Reading legacy {self.legacy_csv_path}")
+            self.store = PredictionStore.from_csv(self.legacy_csv_path)
+            self.version = artifact_version([self.legacy_csv_path, self.model_path])
+        else:
+            logger.warning("Validation predictions not found. Using mock data for simulation test.")
+            self.store = PredictionStore.from_arrays(
+                np.random.randint(0, 2, 1000),
+                np.random.uniform(0, 1, 1000)
+            )
+            self.version = f"mock-{id(self):x}"
+        self.y_true = self.store.y_true
+        self.y_prob = self.store.y_prob
+        self.segments = self.store.segments
+        # Sort once so every threshold query is a binary search
+        self.index = ThresholdIndex(self.y_true, self.y_prob)
+
+    def run_simulation(self, threshold, cost_fn, cost_fp, bootstrap_resamples=0, confidence=0.95,
+                       baseline_threshold=0.5):
+        """
+        Args:
+            bootstrap_resamples (int): If > 0, adds Poisson bootstrap confidence
+                intervals for cost, savings and counts under "intervals".
+            confidence (float): Interval coverage.
+            baseline_threshold (float): Policy the savings are measured against;
+                0.5 is the static model threshold, anything above 1 is no
+                intervention at all.
+        """
         self.load_data()
         
-        y_true = self.df['y_true'].values
-        y_prob = self.df['y_prob'].values
-        
-        impact = calculate_financial_impact(y_true, y_prob, threshold, cost_fn, cost_fp)
+        impact = self.index.impact(threshold, cost_fn, cost_fp)
         
-        # Calculate Baseline (Static Threshold 0.5 like standard model)
-        baseline = calculate_financial_impact(y_true, y_prob, 0.5, cost_fn, cost_fp)
+        # Calculate Baseline (Static Threshold 0.5 like standard model, unless given)
+        baseline = self.index.impact(baseline_threshold, cost_fn, cost_fp)
         
         impact['savings_vs_baseline'] = baseline['total_cost'] - impact['total_cost']
+        impact['baseline_threshold'] = baseline_threshold
+        
+        if bootstrap_resamples > 0:
+            impact['intervals'] = self.index.bootstrap_impact(
+                threshold, cost_fn, cost_fp, baseline_threshold=baseline_threshold,
+                n_resamples=bootstrap_resamples, confidence=confidence
+            )
         
         return impact
 
     def generate_curves(self, cost_fn, cost_fp, points=20):
+        """
+        Cost and intervention-rate curves, downsampled to `points` evenly
+        spaced thresholds.
+        Returns:
+            dict: Parallel lists `threshold`, `total_cost`, `intervention_rate`.
+        """
         self.load_data()
         thresholds = np.linspace(0.01, 0.99, points)
+        
+        # All thresholds in one vectorized lookup against the sorted index
+        tp, fp, tn, fn = self.index.counts(thresholds)
+        total_cost = fn * cost_fn + fp * cost_fp
+        intervention_rate = (tp + fp) / self.index.n
+        
+        return {
+            "threshold": thresholds.tolist(),
+            "total_cost": total_cost.astype(np.float64).tolist(),
+            "intervention_rate": intervention_rate.tolist()
+        }
+
+    def find_optimal(self, cost_pairs):
+        """
+        Finds the exact cost-minimizing threshold for each (cost_fn, cost_fp) pair.
+        Args:
+            cost_pairs (list of tuple): (cost_fn, cost_fp) pairs.
+        Returns:
+            list: Impact dicts at each optimal threshold, with savings vs the 0.5 baseline.
+        """
+        self.load_data()
+        cost_fn = [c[0] for c in cost_pairs]
+        cost_fp = [c[1] for c in cost_pairs]
+        thresholds = self.index.optimal_thresholds(cost_fn, cost_fp)
+        
         results = []
-        for t in thresholds:
-            res = calculate_financial_impact(self.df['y_true'].values, self.df['y_prob'].values, t, cost_fn, cost_fp)
-            results.append({
-                "threshold": t,
-                "total_cost": res['total_cost'],
-                "intervention_rate": res['intervention_count'] / len(self.df)
-            })
+        for t, c_fn, c_fp in zip(thresholds, cost_fn, cost_fp):
+            impact = self.index.impact(float(t), c_fn, c_fp)
+            baseline = self.index.impact(0.5, c_fn, c_fp)
+            impact['savings_vs_baseline'] = baseline['total_cost'] - impact['total_cost']
+            impact['cost_fn'] = c_fn
+            impact['cost_fp'] = c_fp
+            results.append(impact)
         return results
 
+    def segment_names(self):
+        self.load_data()
+        return {name: len(labels) for name, (_, labels) in self.segments.items()}
+
+    def simulate_segments(self, segment, cost_fn, cost_fp, thresholds=None, points=20, min_count=1):
+        """
+        Cost curves for every value of a segment key (courier, hour, vehicle...)
+        in one vectorized pass over the validation predictions.
+        Args:
+            segment (str): Segment key stored with the predictions.
+            cost_fn (float): Cost of a False Negative.
+            cost_fp (float): Cost of a False Positive.
+            thresholds (list, optional): Thresholds to evaluate; `points` evenly spaced ones if None.
+            points (int): Number of default thresholds.
+            min_count (int): Skip segments with fewer validation rows.
+        Returns:
+            dict: Columnar result. `thresholds` is shared; every other list has
+            one entry per segment, the curve lists one value per threshold.
+        """
+        self.load_data()
+        if segment not in self.segments:
+            raise KeyError(f"Unknown segment '{segment}'. Available: {sorted(self.segments)}")
+        codes, labels = self.segments[segment]
+
+        if thresholds is None:
+            thresholds = np.linspace(0.01, 0.99, points)
+        thresholds = np.unique(np.asarray(thresholds, dtype=np.float64))
+        if len(thresholds) == 0:
+            raise ValueError("At least one threshold is required.")
+
+        tp, fp, tn, fn = segment_counts(codes, len(labels), self.y_true, self.y_prob, thresholds)
+        count = tp[:, 0] + fp[:, 0] + tn[:, 0] + fn[:, 0]
+        keep = np.flatnonzero(count >= max(min_count, 1))
+        tp, fp, fn, count = tp[keep], fp[keep], fn[keep], count[keep]
+
+        total_cost = fn * cost_fn + fp * cost_fp
+        best = np.argmin(total_cost, axis=1)
+        rows = np.arange(len(keep))
+        return {
+            "segment": segment,
+            "thresholds": thresholds.tolist(),
+            "labels": [labels[i] for i in keep],
+            "count": count.tolist(),
+            "positives": (tp[:, 0] + fn[:, 0]).tolist(),
+            "total_cost": total_cost.tolist(),
+            "intervention_rate": ((tp + fp) / count[:, None]).tolist(),
+            "best_threshold": thresholds[best].tolist(),
+            "best_cost": total_cost[rows, best].tolist()
+        }
+
+    def region_index(self, segment="start_cell"):
+        """
+        Validation routes indexed by grid cell (a cell segment such as
+        start_cell or end_cell), built once with bincount and then reused
+        for every bounding-box query.
+        """
+        self.load_data()
+        if segment not in self.regions:
+            if segment not in self.segments:
+                # Predictions published before the location columns existed
+                # carry no cell segments; only a retrain adds them
+                raise KeyError(f"Validation predictions have no '{segment}' segment. "
+                               f"Retrain (python train_model.py) to add start_cell/end_cell. "
+                               f"Available: {sorted(self.segments)}")
+            codes, labels = self.segments[segment]
+            self.regions[segment] = RegionIndex.from_segment(codes, labels, self.y_true, self.y_prob)
+            logger.info(f"Region index over {segment}: {self.regions[segment].stats()}")
+        return self.regions[segment]
@@ -2,42 +2,70 @@
 document.addEventListener('DOMContentLoaded', async () => {
     const tableHead = document.querySelector('#data-table thead');
     const tableBody = document.querySelector('#data-table tbody');
+    const moreBtn = document.getElementById('btn-more');
 
-    try {
-        const response = await fetch('/api/data/sample');
+    const PAGE_SIZE = 100;
+    let columns = null;
+    let nextCursor = null;
+
+    // Fetches one page from the cursor-paginated /api/data and appends it
+    const loadPage = async () => {
+        const params = new URLSearchParams({ limit: PAGE_SIZE });
+        if (nextCursor) params.set('cursor', nextCursor);
+
+        const response = await fetch('/api/data?' + params.toString());
         const data = await response.json();
 
-        if (data.error) {
-            tableBody.innerHTML = `<tr><td colspan="5">Error: ${data.error}</td></tr>`;
+        if (data.detail || data.error) {
+            tableBody.innerHTML = `<tr><td colspan="5">Error: ${data.detail || data.error}</td></tr>`;
+            moreBtn.style.display = 'none';
             return;
         }
 
-        if (data.length === 0) {
-            tableBody.innerHTML = '<tr><td colspan="5">No data available.</td></tr>';
-            return;
+        if (columns === null) {
+            if (data.rows === 0) {
+                tableBody.innerHTML = '<tr><td colspan="5">No data available.</td></tr>';
+                return;
+            }
+
+            // Headers
+            columns = data.columns;
+            const headerRow = document.createElement('tr');
+            columns.forEach(col => {
+                const th = document.createElement('th');
+                th.textContent = col;
+                headerRow.appendChild(th);
+            });
+            tableHead.appendChild(headerRow);
         }
 
-        // Headers
-        const columns = Object.keys(data[0]); // Take keys from first object
-        const headerRow = document.createElement('tr');
-        columns.forEach(col => {
-            const th = document.createElement('th');
-            th.textContent = col;
-            headerRow.appendChild(th);
-        });
-        tableHead.appendChild(headerRow);
-
-        // Body
-        data.forEach(row => {
+        // Body: columnar payload {columns: [...], data: {column: [values]}}
+        for (let i = 0; i < data.rows; i++) {
             const tr = document.createElement('tr');
             columns.forEach(col => {
                 const td = document.createElement('td');
-                td.textContent = row[col];
+                td.textContent = data.data[col][i];
                 tr.appendChild(td);
             });
             tableBody.appendChild(tr);
-        });
+        }
+
+        nextCursor = data.next_cursor;
+        moreBtn.style.display = nextCursor ? 'inline-block' : 'none';
+    };
 
+    moreBtn.addEventListener('click', async () => {
+        moreBtn.disabled = true;
+        try {
+            await loadPage();
+        } catch (err) {
+            console.error("Failed to load more data:", err);
+        }
+        moreBtn.disabled = false;
+    });
+
+    try {
+        await loadPage();
     } catch (err) {
         console.error("Failed to load dataset:", err);
         tableBody.innerHTML = `<tr><td colspan="5">Failed to load data.</td></tr>`;
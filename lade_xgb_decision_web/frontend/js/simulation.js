@@ -57,9 +57,10 @@ document.addEventListener('DOMContentLoaded', () => {
     };
 
     const updateCharts = (curves, currentThreshold) => {
-        const labels = curves.map(c => c.threshold.toFixed(2));
-        const costs = curves.map(c => c.total_cost);
-        const interventions = curves.map(c => c.intervention_rate * 100);
+        // Curves arrive as parallel arrays
+        const labels = curves.threshold.map(t => t.toFixed(2));
+        const costs = curves.total_cost;
+        const interventions = curves.intervention_rate.map(r => r * 100);
 
         // Chart 1: Cost Curve
         const ctx1 = document.getElementById('costCurveChart').getContext('2d');